@@ -0,0 +1,115 @@
+"""
+Unit tests for the asynchronous front-end, served by a local HTTP stand-in.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from trafilatura.aio import ConcurrencyLimiter, extract_async, fetch_and_extract, fetch_async
+from trafilatura.settings import Extractor
+
+PAGE = "<html><body><article><p>" + "Asynchronous content for page {0}. " * 20 + "</p></article></body></html>"
+# only decoded correctly with the charset of the headers
+LATIN_PAGE = "<html><body><article><p>" + "Ça coûte très cher, déjà vu à l'époque. " * 10 + "</p></article></body></html>"
+
+
+class StandInServer:
+    "Minimal HTTP/1.1 server answering /page/N and /latin with a slow response and /missing with a 404."
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.server = None
+
+    async def handle(self, reader, writer):
+        request = await reader.readuntil(b"\r\n\r\n")
+        path = request.split(b" ")[1].decode()
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(self.delay)
+        self.active -= 1
+        content_type = "text/html"
+        if path.startswith("/page/"):
+            status, body = "200 OK", PAGE.format(path.rsplit("/", 1)[-1]).encode()
+        elif path == "/latin":
+            status, body, content_type = "200 OK", LATIN_PAGE.encode("iso-8859-1"), "text/html; charset=iso-8859-1"
+        else:
+            status, body = "404 Not Found", b"not found"
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode()
+            + body
+        )
+        await writer.drain()
+        writer.close()
+
+    async def __aenter__(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        return f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def __aexit__(self, *args):
+        self.server.close()
+        await self.server.wait_closed()
+
+
+def test_fetch_and_extract_async():
+    "Single coroutines: download and extraction off the event loop."
+
+    async def main():
+        async with StandInServer() as base:
+            response = await fetch_async(f"{base}/page/1", decode=True)
+            assert response.status == 200
+            assert "page 1." in response.html
+            missing = await fetch_async(f"{base}/missing")
+            assert missing.status == 404
+            result = await extract_async(response.data, f"{base}/page/1")
+            assert "Asynchronous content for page 1." in result
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                options = Extractor(output_format="json", with_metadata=True)
+                result = await extract_async(response.data, f"{base}/page/1", options=options, executor=executor)
+            assert f'"source": "{base}/page/1"' in result
+            assert options.url is None
+
+    asyncio.run(main())
+
+
+def test_bounded_pipeline():
+    "fetch_and_extract streams results and honors the per-host and overall bounds."
+
+    async def main():
+        server = StandInServer()
+        async with server as base:
+            urls = [f"{base}/page/{i}" for i in range(8)] + [f"{base}/missing"]
+            results = dict([item async for item in fetch_and_extract(urls, concurrency=4, per_host=2)])
+        assert server.max_active == 2
+        assert results.pop(f"{base}/missing") is None
+        assert len(results) == 8
+        assert all(f"content for page {url.rsplit('/', 1)[-1]}." in text for url, text in results.items())
+
+        # the charset declared in the headers is used to decode the page
+        async with StandInServer() as base:
+            results = [item async for item in fetch_and_extract([f"{base}/latin"])]
+        assert "Ça coûte très cher" in results[0][1]
+
+        # overall bound across hosts: two hosts, three slots in total
+        server = StandInServer()
+        async with server as base:
+            other_base = base.replace("127.0.0.1", "localhost")
+            urls = [f"{b}/page/{i}" for i in range(4) for b in (base, other_base)]
+            results = [item async for item in fetch_and_extract(urls, concurrency=3, per_host=3)]
+        assert server.max_active == 3
+        assert all(text is not None for _, text in results)
+
+    asyncio.run(main())
+
+
+def test_limiter_prunes_hosts():
+    "Per-host semaphores are dropped once unused."
+
+    async def main():
+        limiter = ConcurrencyLimiter(total=2, per_host=1)
+        async with limiter.slot("https://example.org/a"):
+            assert list(limiter._hosts) == ["example.org"]
+        assert not limiter._hosts
+
+    asyncio.run(main())
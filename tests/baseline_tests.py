@@ -3,7 +3,6 @@ Unit tests for baseline functions of the trafilatura library.
 """
 
 import json
-import sys
 from html import escape
 
 import pytest
@@ -384,22 +383,19 @@ def test_baseline_discourse_preload_malformed():
         assert para in result
 
 
-def test_build_body_dedupe_cap(monkeypatch):
-    "past DEDUPE_SCAN_CAP the paragraph strategy skips the substring scan and keeps potential repeats (cf. recover_wild_text)."
+def test_build_body_dedupe():
+    "the paragraph strategy drops long repeats of a paragraph however much text precedes them (cf. recover_wild_text)."
     from trafilatura.baseline import _build_body
 
-    # the package re-exports the baseline() function, shadowing the submodule attribute
-    bl_module = sys.modules["trafilatura.baseline"]
-    filler = "Opening paragraph content long enough to push the accumulated text past a tiny cap."
+    fillers = [f"Opening paragraph number {i} with content long enough to count for the scan." for i in range(5000)]
     dup = "This exact paragraph repeats and is well above the duplicate length gate for sure."
-
-    monkeypatch.setattr(bl_module, "DEDUPE_SCAN_CAP", 50)
-    _, text = _build_body([filler, dup, dup], dedupe=True)
-    assert text.count(dup) == 2  # past the cap: scan skipped, repeat kept
-
-    monkeypatch.setattr(bl_module, "DEDUPE_SCAN_CAP", 200_000)
-    _, text = _build_body([filler, dup, dup], dedupe=True)
-    assert text.count(dup) == 1  # under the cap: substring dedup fires
+    _, text = _build_body([*fillers, dup, dup, dup[5:]], dedupe=True)
+    assert len(text) > 200_000
+    assert text.count(dup[5:]) == 1
+    # short paragraphs are kept, and without dedupe everything
+    _, text = _build_body(["Short one.", "Short one.", dup, dup])
+    assert text.count("Short one.") == 2
+    assert text.count(dup) == 2
 
 
 def test_baseline_howto():
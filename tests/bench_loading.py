@@ -0,0 +1,71 @@
+"""Measure the time and peak memory needed to load HTML documents with
+utils.load_html(): on the whole own benchmark, then on its largest page
+and on a synthetic page of several MB made of copies of its body.
+
+Peak memory is traced by tracemalloc and only covers allocations made
+by Python, not the tree built by libxml2. Run it after changing the
+decoding or the repairs performed before parsing in trafilatura/utils.py.
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from eval_common import load_evaldata, read_corpus
+
+from trafilatura.utils import load_html
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+MB = 2**20
+
+
+def synthetic_page(htmlbinary: bytes, size: int) -> bytes:
+    "Repeat the body of the page until the document reaches the given size."
+    start, end = htmlbinary.find(b"<body"), htmlbinary.rfind(b"</body>")
+    body = htmlbinary[start:end]
+    return htmlbinary[:end] + body * (size // len(body)) + htmlbinary[end:]
+
+
+def measure(htmlbinary: bytes) -> tuple[float, float]:
+    "Return the time in seconds and the peak of traced memory in bytes for a single document."
+    tracemalloc.start()
+    start = time.perf_counter()
+    load_html(htmlbinary)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark HTML loading")
+    parser.add_argument("--size", type=int, default=8, help="size of the synthetic page in MB")
+    args = parser.parse_args()
+
+    evaldata = load_evaldata(HERE)
+    docs = read_corpus(HERE, evaldata)
+    inputs = [htmlbinary for _, htmlbinary in docs.values()]
+
+    total = sum(len(htmlbinary) for htmlbinary in inputs) / MB
+    start = time.perf_counter()
+    for htmlbinary in inputs:
+        load_html(htmlbinary)
+    elapsed = time.perf_counter() - start
+    print(f"corpus: {len(inputs)} documents, {total:.1f} MB, {elapsed:.2f}s, {elapsed * 1000 / total:.1f} ms/MB")
+
+    largest = max(inputs, key=len)
+    for name, htmlbinary in (("largest", largest), ("synthetic", synthetic_page(largest, args.size * MB))):
+        elapsed, peak = measure(htmlbinary)
+        size = len(htmlbinary) / MB
+        print(
+            f"{name:>9}: {size:.1f} MB, {elapsed * 1000 / size:.1f} ms/MB, peak memory {peak / MB:.1f} MB ({peak / len(htmlbinary):.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
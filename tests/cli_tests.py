@@ -3,6 +3,7 @@ Unit tests for the command-line interface.
 """
 
 import io
+import json
 import logging
 import os
 import re
@@ -19,6 +20,8 @@ from courlan import UrlStore
 
 from trafilatura import cli, cli_utils, settings, spider
 from trafilatura.downloads import add_to_compressed_dict, fetch_url
+from trafilatura.profiles import SiteProfiles
+from trafilatura.simhash_index import SimhashIndex
 from trafilatura.utils import LANGID_FLAG
 
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
@@ -69,6 +72,8 @@ def test_parser():
     args = cli.parse_args(testargs[1:])
     args = cli.map_args(args)
     assert args.only_with_metadata is True
+    args = cli.map_args(cli.parse_args(["--metadata-only", "--xml"]))
+    assert args.output_format == "json"
     # process_args
     args.input_dir = "/dev/null"
     args.verbose = 1
@@ -141,6 +146,10 @@ def test_args_to_extractor_kwargs():
     assert options.links is True
     assert options.comments is False
     assert options.tables is False
+    options = settings.args_to_extractor(cli.parse_args(["--auto-fast"]))
+    assert options.auto_fast is True
+    assert options.fast is False
+    assert settings.args_to_extractor(cli.parse_args(["--fast", "--auto-fast"])).auto_fast is False
 
 
 def test_climain(capfd):
@@ -220,6 +229,16 @@ def test_cli_examine_error(monkeypatch, capsys):
     assert "kaboom" in capsys.readouterr().err
 
 
+def test_cli_metadata_only():
+    "--metadata-only outputs the metadata found in the document head as JSON."
+    args = cli.map_args(cli.parse_args(["--metadata-only"]))
+    html = "<html><head><title>Page title</title></head><body>" + "<p>Some text here.</p>" * 10 + "</body></html>"
+    result = json.loads(cli.examine(html, args, url="https://example.org/page"))
+    assert result["title"] == "Page title"
+    assert result["source-hostname"] == "example.org"
+    assert result["text"] == ""
+
+
 def test_sysoutput():
     """test command-line output with respect to CLI arguments"""
     testargs = ["", "--csv", "-o", "/root/forbidden/"]
@@ -396,6 +415,107 @@ def test_cli_pipeline():
     assert result.endswith("</html>")
 
 
+def test_cli_trace(tmp_path):
+    "--trace appends one JSON line per extracted document."
+    tracefile = tmp_path / "trace.jsonl"
+    args = cli.parse_args(["--trace", str(tracefile)])
+    assert settings.args_to_extractor(args).trace is True
+    html = "<html><body><article><p>" + "Some traced content. " * 20 + "</p></article></body></html>"
+    result = cli.examine(html, args, url="https://example.org/traced")
+    assert "Some traced content." in result
+    cli.examine(html, args)
+    lines = tracefile.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 2
+    record = json.loads(lines[0])
+    assert record["source"] == "https://example.org/traced"
+    assert record["branch"] == "main"
+    assert [s["stage"] for s in record["stages"]][:2] == ["load", "cleaning"]
+    assert all(s["wall_time"] >= 0 and s["cpu_time"] >= 0 for s in record["stages"])
+
+
+def test_cli_cache(tmp_path):
+    "--cache-dir stores results on disk and reuses them in later runs."
+    args = cli.parse_args(["--cache-dir", str(tmp_path), "--json"])
+    options = settings.args_to_extractor(args)
+    assert options.cache.directory == str(tmp_path)
+    html = "<html><body><article><p>" + "Some cached content. " * 20 + "</p></article></body></html>"
+    result = cli.examine(html, args, options=options)
+    assert (tmp_path / "results.sqlite").is_file()
+    options = settings.args_to_extractor(args)
+    assert cli.examine(html, args, options=options) == result
+    assert options.cache.hits == 1
+
+
+def test_cli_site_profiles(tmp_path):
+    "--site-profiles loads the profiles learned in previous runs."
+    path = tmp_path / "profiles.json"
+    path.write_text('{"example.org": {"date": {"fast": 3}}}', encoding="utf-8")
+    options = settings.args_to_extractor(cli.parse_args(["--site-profiles", str(path)]))
+    assert options.profiles.path == str(path)
+    assert options.profiles.get("https://example.org/page").learned("date") == "fast"
+
+
+def test_cli_dedup_store(tmp_path):
+    "--dedup-store counts the sections in a file shared by the worker processes, --simhash-index keeps the documents' hashes."
+    path = str(tmp_path / "segments.sqlite")
+    options = settings.args_to_extractor(cli.parse_args(["--deduplicate", "--dedup-store", path]))
+    assert options.dedup
+    assert options.dedup_store.path == path
+    assert settings.args_to_extractor(cli.parse_args(["--deduplicate"])).dedup_store is None
+    path = str(tmp_path / "simhashes.bin")
+    assert settings.args_to_extractor(cli.parse_args(["--simhash-index", path])).simhash_index.path == path
+
+
+def test_file_processing_simhash_index(tmp_path):
+    "--simhash-index with --input-dir: near-duplicates are discarded across the whole run and the index is saved."
+    with pytest.raises(SystemExit):
+        cli.parse_args(["--input-dir", str(tmp_path), "--simhash-index", "index.bin", "--parallel", "2"])
+    inputdir, outputdir = tmp_path / "input", tmp_path / "output"
+    inputdir.mkdir()
+    text = "<p>" + "Text of a document which is stored twice in the directory, with the same content. " * 5 + "</p>"
+    for name in ("first.html", "second.html"):
+        (inputdir / name).write_text(f"<html><body><article>{text}</article></body></html>", encoding="utf-8")
+    path = str(tmp_path / "simhashes.bin")
+    args = cli.parse_args(
+        ["--input-dir", str(inputdir), "--output-dir", str(outputdir), "--simhash-index", path, "--parallel", "1"]
+    )
+    cli_utils.file_processing_pipeline(args)
+    assert len(list(outputdir.iterdir())) == 1
+    assert len(SimhashIndex(path)) == 1
+    # standard input: the index is saved too
+    path = str(tmp_path / "stdin.bin")
+    stdin = io.TextIOWrapper(io.BytesIO((inputdir / "first.html").read_bytes()))
+    with patch("sys.stdin", stdin), redirect_stdout(io.StringIO()):
+        cli.process_args(cli.parse_args(["--simhash-index", path]))
+    assert len(SimhashIndex(path)) == 1
+
+
+def test_file_processing_site_profiles(tmp_path):
+    "--site-profiles with --input-dir: what the worker processes learn is added up and saved."
+    inputdir = tmp_path / "input"
+    inputdir.mkdir()
+    paragraphs = "".join(f"<p>Paragraph {i} of the article is about topic number {i * 7}.</p>" for i in range(12))
+    for i in range(3):
+        (inputdir / f"{i}.html").write_text(
+            f"<html><head><link rel='canonical' href='https://example.org/{i}'/></head>"
+            f"<body><article>{paragraphs}</article></body></html>",
+            encoding="utf-8",
+        )
+    path = str(tmp_path / "profiles.json")
+    outputdir = str(tmp_path / "output")
+    args = cli.parse_args(
+        ["--input-dir", str(inputdir), "-o", outputdir, "--with-metadata", "--site-profiles", path, "--parallel", "2"]
+    )
+    cli_utils.file_processing_pipeline(args)
+    assert SiteProfiles(path).as_dict()["example.org"]["body"] == {"1": 3}
+    # standard input: the profiles are saved too
+    path = str(tmp_path / "stdin.json")
+    stdin = io.TextIOWrapper(io.BytesIO((inputdir / "0.html").read_bytes()))
+    with patch("sys.stdin", stdin), redirect_stdout(io.StringIO()):
+        cli.process_args(cli.parse_args(["--with-metadata", "--site-profiles", path]))
+    assert SiteProfiles(path).as_dict()["example.org"]["body"] == {"1": 1}
+
+
 def test_file_processing():
     "Test file processing pipeline on actual directories."
     backup = settings.MAX_FILES_PER_DIRECTORY
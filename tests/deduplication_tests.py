@@ -3,15 +3,33 @@
 Unit tests for the trafilatura's text hashing and cache.
 """
 
+import pickle
+import random
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from hashlib import blake2b
+
 import pytest
 from lxml import etree, html
 
 import trafilatura.deduplication
+import trafilatura.settings
 from trafilatura import extract
+from trafilatura.cache import SegmentStore
 from trafilatura.cli_utils import generate_hash_filename
 from trafilatura.core import Extractor
-from trafilatura.deduplication import LRUCache, Simhash, content_fingerprint, duplicate_test
+from trafilatura.deduplication import (
+    SEGMENT_ENTRY_SIZE,
+    LRUCache,
+    SegmentCache,
+    Simhash,
+    TextIndex,
+    content_fingerprint,
+    duplicate_test,
+    fingerprint_many,
+    sample_tokens,
+)
 from trafilatura.meta import reset_caches
+from trafilatura.simhash_index import SimhashIndex
 
 DEFAULT_OPTIONS = Extractor()
 
@@ -32,6 +50,26 @@ def test_hashes():
     assert generate_hash_filename(content) == "42LNugG3Sc95646i"
 
 
+def test_fingerprint_many():
+    "Same hashes as the sum of +1/-1 vectors per token, the reference implementation."
+
+    def reference(text, length=64):
+        vector = [0] * length
+        for token in sample_tokens(text, length):
+            token_hash = int.from_bytes(blake2b(token.encode(), digest_size=8).digest(), "big")
+            vector = [value + (1 if token_hash & (1 << i) else -1) for i, value in enumerate(vector)]
+        return sum(1 << i for i in range(length) if vector[i] >= 0)
+
+    rng = random.Random(2)
+    words = ["".join(rng.choice("abcdefghijklmnop") for _ in range(rng.randint(3, 9))) for _ in range(500)]
+    texts = [" ".join(rng.choice(words) for _ in range(rng.randint(1, 400))) for _ in range(50)]
+    texts += ["", "a b", "word " * 10, "tie tied " * 3, "这是一个测试。我们在测试中文，这是第二个句子。"]
+    assert fingerprint_many(texts) == [f"{reference(text):x}" for text in texts]
+    assert fingerprint_many(texts) == [content_fingerprint(text) for text in texts]
+    for length in (8, 63, 100):
+        assert [Simhash(text, length=length).hash for text in texts[:20]] == [reference(text, length) for text in texts[:20]]
+
+
 def test_content_fingerprint():
     "Test content fingerprint generation for different types of text"
     # Test regular Latin text
@@ -129,6 +167,101 @@ def test_lrucache():
     assert lru_test.get("tralala") == -1
 
 
+def test_segment_cache():
+    "Digests as keys, size limit in bytes, counters and concurrent threads."
+    cache = SegmentCache(maxbytes=10 * SEGMENT_ENTRY_SIZE)
+    segment = "A long paragraph of text " * 20
+    assert cache.increment(segment) == 0
+    assert cache.increment(segment) == 1
+    assert cache.get(segment) == 2
+    assert cache.get("unknown") == -1
+    assert all(len(key) == 16 for key in cache.cache)
+    assert (cache.hits, cache.misses, cache.evictions) == (2, 2, 0)
+    for i in range(20):
+        cache.put(f"segment {i}", 1)
+    assert len(cache) == 10
+    assert cache.evictions == 11
+    assert cache.get(segment) == -1
+    # no occurrence is lost
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(cache.increment, ["shared"] * 1000))
+    assert cache.get("shared") == 1000
+    cache.clear()
+    assert not cache
+    assert (cache.hits, cache.misses, cache.evictions) == (0, 0, 0)
+    # former limit in number of entries
+    with pytest.warns(DeprecationWarning, match="DEDUP_CACHE_SIZE"):
+        assert trafilatura.settings.LRU_SIZE == 4096
+    with pytest.raises(AttributeError):
+        _ = trafilatura.settings.NO_SUCH_SETTING
+
+
+def test_segment_store(tmp_path):
+    "The stores give the same results as the LRU cache, on disk across processes and runs."
+    elements = [
+        html.fromstring("<p>" + " ".join([letters] * 30) + "</p>") for letters in ("AAAA BBBB", "CCCC DDDD", "EEEE FFFF")
+    ]
+    sequence = [0, 0, 0, 0, 1, 1, 2, 0, 1, 1, 1, 2, 2, 2, 2, 0, 0]
+    path = str(tmp_path / "segments.sqlite")
+    results = []
+    for store in (LRUCache(maxsize=2), SegmentCache(maxbytes=2 * SEGMENT_ENTRY_SIZE), SegmentStore(path, maxsize=2)):
+        options = Extractor(dedup=True, dedup_store=store)
+        results.append([duplicate_test(elements[i], options) for i in sequence])
+    assert results[0] == results[1] == results[2]
+    assert any(results[0])
+    # the store is sent to worker processes and kept between runs
+    store = pickle.loads(pickle.dumps(SegmentStore(path)))
+    store.clear()
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        list(executor.map(store.increment, ["key"] * 20))
+    assert SegmentStore(path).increment("key") == 20
+    store.clear()
+    assert store.increment("key") == 0
+    store.close()
+
+
+def test_simhash_index(tmp_path):
+    "Same near-duplicates as a comparison with all hashes, in memory and in a file."
+    rng = random.Random(1)
+    hashes = [rng.getrandbits(64) for _ in range(2000)]
+    queries = []
+    for value in hashes[:200]:
+        for bit in rng.sample(range(64), rng.randint(0, 5)):
+            value ^= 1 << bit
+        queries.append(value)
+    expected = [sorted(h for h in hashes if (h ^ query).bit_count() <= 3) for query in queries]
+    assert sum(map(len, expected)) > 100
+
+    index = SimhashIndex(str(tmp_path / "simhashes.bin"))
+    for value in hashes[:1000]:
+        index.add(value)
+    index.save()
+    for value in hashes[1000:]:
+        index.add(value)
+    assert len(index) == 2000
+    assert [index.query(query) for query in queries] == expected
+    index.save()
+    for copy in (SimhashIndex(index.path, distance=3), pickle.loads(pickle.dumps(index))):
+        assert len(copy) == 2000
+        assert [copy.query(query) for query in queries] == expected
+        copy.close()
+    # stored only if new
+    assert index.add_if_new(hashes[0] ^ 0b11) is False
+    assert index.add_if_new(hashes[0] ^ 0b1111) is True
+    assert len(index) == 2001
+    index.close()
+    with pytest.raises(ValueError):
+        SimhashIndex(distance=64)
+
+    # near-duplicate documents are discarded during extraction
+    text = " ".join(f"Sentence {i} mentions topic{i} and subject{i * 7}." for i in range(60))
+    options = Extractor(simhash_index=SimhashIndex())
+    assert extract(f"<html><body><article><p>{text}</p></article></body></html>", options=options) is not None
+    assert extract(f"<html><body><article><p>{text} Another ending.</p></article></body></html>", options=options) is None
+    other = " ".join(f"Paragraph {i} deals with recipe{i} and cooking{i * 3}." for i in range(60))
+    assert extract(f"<html><body><article><p>{other}</p></article></body></html>", options=options) is not None
+
+
 def test_dedup():
     "Test paragraph-level deduplication."
     my_p = "<p>abc</p>"
@@ -150,6 +283,37 @@ def test_dedup():
     assert trafilatura.htmlprocessing.process_node(my_p, options) is None
 
 
+def test_text_index():
+    "Containment in one of the indexed texts, as a substring search in each of them."
+    texts = [
+        "The quick brown fox jumps over the lazy dog while the sun was setting slowly.",
+        "这是一个测试。我们在测试中文，这是第二个句子。",
+        "short",
+    ]
+    index = TextIndex(texts)
+    for query in (
+        "quick brown fox jumps over the lazy dog",
+        "he quick brown fox jumps over the lazy dog while the sun",
+        "我们在测试中文，这是第二个句子",
+        "short",
+        "fox",
+    ):
+        assert query in index
+    for query in (
+        "quick brown fox jumps over the lazy cat",
+        "slowly.这是一个测试",  # no match across two texts
+        "short, but",
+        "我们在测试中文，这是第三个句子",
+    ):
+        assert query not in index
+    assert "short" not in TextIndex()
+    index.add("A text added later, with a long enough sentence to carry anchors.")
+    assert "added later, with a long enough sentence" in index
+    # former size limit of the scans
+    with pytest.warns(DeprecationWarning, match="not capped"):
+        assert trafilatura.settings.DEDUPE_SCAN_CAP == 200_000
+
+
 def test_dedup_reset_caches():
     "Repeated identical extractions accumulate in LRU_TEST; reset_caches() clears it (#778)."
     reset_caches()
@@ -47,10 +47,12 @@ from trafilatura.downloads import (
     _send_urllib_request,
     _urllib3_is_live_page,
     add_to_compressed_dict,
+    fetch_response,
     fetch_url,
     is_live_page,
     load_download_buffer,
 )
+from trafilatura.meta import reset_caches
 from trafilatura.settings import DEFAULT_CONFIG, args_to_extractor, use_config
 from trafilatura.utils import decode_file, handle_compressed_file, load_html
 
@@ -93,6 +95,48 @@ def test_urllib_request_releases_conn_on_oversize():
     resp.release_conn.assert_called_once()
 
 
+def test_urllib_request_parses_stream():
+    "The chunks are parsed as they arrive, announced oversized responses are not downloaded."
+    from lxml.html import tostring
+
+    html = "<!DOCTYPE html>\n<html>\n<head><title>Test</title></head>\n<body>\n<p>Ärger \x00im Büro</p></body></html>".encode()
+    resp = MagicMock(status=200, headers={"content-type": "text/html; charset=utf-8"})
+    resp.stream.return_value = iter([html[i : i + 7] for i in range(0, len(html), 7)])
+    resp.geturl.return_value = "https://example.org"
+    pool = MagicMock(request=MagicMock(return_value=resp))
+    with patch.object(dl, "_initiate_pool", return_value=pool):
+        result = _send_urllib_request("https://example.org", False, False, DEFAULT_CONFIG, True)
+    assert result.data == html
+    assert tostring(result.tree) == tostring(load_html(html))
+    assert load_html(result) is result.tree
+
+    resp = MagicMock(status=200, headers={"content-length": str(10**9)})
+    pool = MagicMock(request=MagicMock(return_value=resp))
+    with patch.object(dl, "_initiate_pool", return_value=pool):
+        assert _send_urllib_request("https://example.org", False, False, DEFAULT_CONFIG, True) is None
+    resp.stream.assert_not_called()
+    resp.release_conn.assert_called_once()
+
+
+@pytest.mark.usefixtures("mock_network")
+def test_fetch_response_parse():
+    "A tree is always provided and left untouched by the extraction."
+    from lxml.html import tostring
+
+    response = fetch_response("https://example.com/plain", parse=True)
+    assert response.tree is not None
+    assert response.tree.findtext(".//title") == "Plain"
+    assert extract(response, config=ZERO_CONFIG) == "nothing"
+    assert fetch_response("https://example.com/plain").tree is None
+
+    data = b"<html><body><article><p>Main text</p></article><div id='comments'><p>Reader comment</p></div></body></html>"
+    response = Response(data, 200, "https://example.org")
+    response.tree = load_html(data)
+    before = tostring(response.tree)
+    assert extract(response, include_comments=False, config=ZERO_CONFIG) == "Main text"
+    assert tostring(response.tree) == before
+
+
 @pytest.mark.parametrize(
     "geturl_result, expected",
     [
@@ -124,7 +168,7 @@ def test_response_object():
     resp.decode_data(True)
     assert my_html.decode("utf-8") == resp.html == str(resp)
     my_dict = resp.as_dict()
-    assert sorted(my_dict) == ["data", "headers", "html", "status", "url"]
+    assert sorted(my_dict) == ["data", "headers", "html", "status", "tree", "url"]
 
     # response object: data, status, url
     response = Response("", 200, "https://httpbin.org/encoding/utf8")
@@ -243,7 +287,8 @@ def test_pycurl_ssl_retry(monkeypatch):
 
     curl = MagicMock()  # one handle reused for both attempts
     curl.perform_rb.side_effect = [pycurl.error(35, "SSL error"), b"<html>ok</html>"]  # 35 ∈ CURL_SSL_ERRORS
-    curl.getinfo.side_effect = [200, "https://ssl.example/"]  # consumed only by the retry's Response()
+    # consumed only by the retry's Response() and content type
+    curl.getinfo.side_effect = [200, "https://ssl.example/", "text/html; charset=utf-8"]
     monkeypatch.setattr(pycurl, "Curl", lambda: curl)
 
     assert _send_pycurl_request("https://ssl.example/", False, False, DEFAULT_CONFIG) is not None
@@ -316,6 +361,48 @@ def test_decode():
         assert handle_compressed_file(bad_file) == bad_file
 
 
+def test_decode_hints(monkeypatch):
+    "Declared encodings spare the detection if they fit the data."
+    import trafilatura.utils as utils_module
+
+    reset_caches()
+    monkeypatch.setattr(utils_module, "_guess_encodings", MagicMock(side_effect=utils_module._guess_encodings))
+    text = "<html><body><p>Преступление и наказание, роман Достоевского</p></body></html>"
+    data = text.encode("cp1251")
+    # given, as in the HTTP headers
+    assert decode_file(data, "windows-1251") == text
+    resp = Response(data, 200, "https://example.org/page")
+    resp.store_headers({"Content-Type": "text/html; charset=windows-1251"})
+    assert resp.charset() == "windows-1251"
+    resp.decode_data(True)
+    assert resp.html == text
+    assert "наказание" in load_html(resp).text_content()
+    # declared in the document
+    declared = b'<html><head><meta http-equiv="Content-Type" content="text/html; charset=windows-1251"></head>' + data[6:]
+    assert "Преступление" in decode_file(declared)
+    assert utils_module._guess_encodings.call_count == 0
+    # valid UTF-8 despite the label, unknown labels
+    assert decode_file(text.encode("utf-8"), "iso-8859-1") == text
+    assert decode_file(b'<meta charset="utf-16"><p>abc</p>') == '<meta charset="utf-16"><p>abc</p>'
+    assert decode_file(data, "no-such-charset") is not None
+    assert utils_module._guess_encodings.call_count == 1
+    # a hint which does not fit: detection
+    assert decode_file(data, "utf-8") is not None
+    assert utils_module._guess_encodings.call_count == 2
+
+    # per host: the encoding which worked last for the host, kept in a memo given by the caller
+    memo = {}
+    assert decode_file(data, "windows-1251", "https://example.org/page", memo) == text
+    assert memo == {"example.org": "cp1251"}
+    assert decode_file(data, url="https://example.org/other", memo=memo) == text
+    assert decode_file(data, url="https://example.org/other", memo=memo) == text
+    assert utils_module._guess_encodings.call_count == 2
+    # no memo: the result does not depend on the pages decoded before
+    decode_file(data, url="https://example.org/other")
+    assert utils_module._guess_encodings.call_count == 3
+    reset_caches()
+
+
 @pytest.mark.usefixtures("mock_network")
 def test_queue():
     "Test creation, modification and download of URL queues."
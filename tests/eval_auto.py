@@ -0,0 +1,64 @@
+"""Measure the auto fast mode against the full cascade on the own benchmark:
+how often the comparison with external extractors is bypassed, how often the
+output is identical, and the scores and execution times of both.
+
+Run it after changing the AUTO_* thresholds in trafilatura/external.py.
+"""
+
+import os
+import sys
+import time
+from functools import partial
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from eval_common import EXTRACT_OPTS, ConfusionMatrix, load_evaldata, read_corpus, run_and_count, validate
+
+from trafilatura import bare_extraction, extract
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+RUNNERS = {
+    "fallback": partial(extract, fast=False, **EXTRACT_OPTS),
+    "auto": partial(extract, fast="auto", **EXTRACT_OPTS),
+}
+
+
+def main() -> None:
+    evaldata = load_evaldata(HERE)
+    validate(evaldata)
+    docs = read_corpus(HERE, evaldata)
+
+    matrices = {name: ConfusionMatrix() for name in RUNNERS}
+    timings = dict.fromkeys(RUNNERS, 0.0)
+    agreeing = differing_scores = 0
+    for url, item in evaldata.items():
+        _, htmlbinary = docs[url]
+        results, counts = {}, {}
+        for name, fn in RUNNERS.items():
+            start = time.perf_counter()
+            results[name], counts[name], _ = run_and_count(fn, htmlbinary, item)
+            timings[name] += time.perf_counter() - start
+            matrices[name].add(counts[name])
+        agreeing += results["auto"] == results["fallback"]
+        differing_scores += counts["auto"] != counts["fallback"]
+
+    # separate pass: the bookkeeping is only available on the Document
+    bypassed = 0
+    for _, htmlbinary in docs.values():
+        document = bare_extraction(htmlbinary, fast="auto", **EXTRACT_OPTS)
+        if document is not None and document.stats is not None and "external" in document.stats.bypassed:
+            bypassed += 1
+
+    total = len(evaldata)
+    print(f"documents: {total}")
+    print(f"external comparison bypassed: {bypassed} ({bypassed / total:.1%})")
+    print(f"identical output: {agreeing} ({agreeing / total:.1%}), different scores: {differing_scores}")
+    for name, cm in matrices.items():
+        precision, recall, _, f1 = cm.scores()
+        print(f"{name:>9}: precision={precision:.4f} recall={recall:.4f} F1={f1:.4f} time={timings[name]:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
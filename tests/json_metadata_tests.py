@@ -2,9 +2,11 @@
 Unit tests for JSON metadata extraction.
 """
 
+import json
 import logging
 import sys
 
+import pytest
 from lxml import html
 
 from trafilatura.json_metadata import (
@@ -12,6 +14,7 @@ from trafilatura.json_metadata import (
     JSON_AUTHOR_2,
     extract_json,
     extract_json_author,
+    load_json,
     normalize_json,
     process_parent,
 )
@@ -1114,6 +1117,32 @@ def test_normalize_json():
     assert normalize_json("Seán Federico O'Murchú") == "Seán Federico O'Murchú"
 
 
+def test_load_json(monkeypatch):
+    "JSON parsed with the optional backend or the standard library, control characters tolerated."
+    import trafilatura.json_metadata as jm
+
+    for has_orjson in (jm.HAS_ORJSON, False):
+        monkeypatch.setattr(jm, "HAS_ORJSON", has_orjson)
+        assert load_json('{"a": [1, "b"]}') == {"a": [1, "b"]}
+        assert load_json('{"a": "b\x02c"}') == {"a": "b\x02c"}
+        with pytest.raises(json.JSONDecodeError):
+            load_json('{"a": ')
+
+    # pretty-printed blocks are parsed without minification, the fallback still gets minified text
+    block = '{\n  "@context": "https://schema.org",\n  "@type": "NewsArticle",\n  "headline": "Tom &amp; <b>Jerry</b>",\n  "author": {"@type": "Person", "name": "Jane\\u0020Doe"}\n}'
+    metadata = extract_meta_json(
+        html.fromstring(f'<html><head><script type="application/ld+json">{block}</script></head></html>'), Document()
+    )
+    assert metadata.title == "Tom & Jerry"
+    assert metadata.author == "Jane Doe"
+    broken = '{\n  "@type": "NewsArticle",\n  "headline": "Broken",\n  "author": {"name": "Jane Doe"'
+    metadata = extract_meta_json(
+        html.fromstring(f'<html><head><script type="application/ld+json">{broken}</script></head></html>'), Document()
+    )
+    assert metadata.title == "Broken"
+    assert metadata.author == "Jane Doe"
+
+
 def test_extract_json_shapes():
     "JSON-LD container shapes and process_parent field-extraction branches."
     # @graph wrapper
@@ -12,7 +12,11 @@ from trafilatura.json_metadata import extract_json, extract_json_parse_error, pr
 from trafilatura.metadata import (
     JSON_MINIFY,
     Document,
+    MetaIndex,
     check_authors,
+    examine_meta,
+    extract_author,
+    extract_date,
     extract_meta_json,
     extract_metadata,
     extract_metainfo,
@@ -20,7 +24,7 @@ from trafilatura.metadata import (
     extract_url,
     normalize_tags,
 )
-from trafilatura.settings import Extractor, use_config
+from trafilatura.settings import ExtractionStats, Extractor, set_date_params, use_config
 
 logging.basicConfig(stream=sys.stdout, level=logging.DEBUG)
 
@@ -207,6 +211,42 @@ def test_author_from_markup():
         assert extract_metadata(doc).author == expected
 
 
+def test_meta_index():
+    "Elements of the head and JSON-LD scripts gathered at once, shared by the extractors."
+    tree = html.fromstring("""<html><head><title>First</title><title>Second</title>
+    <meta name="author" content="Jenny Smith"/><meta name="empty"/>
+    <noscript><meta property="og:title" content="Nested"/></noscript>
+    <link rel="canonical" href="/page"/><base href="https://example.org/"/>
+    <script type="application/ld+json">{"@type": "Article"}</script></head>
+    <body><meta itemprop="name" content="Body"/><script type="application/ld+json"></script>
+    <script type="application/settings+json">{}</script></body></html>""")
+    index = MetaIndex(tree)
+    assert index.title is not None
+    assert index.title.text == "First"
+    assert index.meta == [
+        ({"name": "author", "content": "Jenny Smith"}, True),
+        ({"property": "og:title", "content": "Nested"}, False),
+    ]
+    assert index.links == {"canonical": [{"rel": "canonical", "href": "/page"}]}
+    assert index.bases == [{"href": "https://example.org/"}]
+    assert index.scripts == ['{"@type": "Article"}', "{}"]
+    # only direct children of the head are examined, the nested meta elements serve the URL
+    assert examine_meta(tree, index).title is None
+    assert extract_url(tree, index=index) is None
+    tree = html.fromstring(
+        '<html><head><meta property="og:url" content="https://example.org/a"/><link rel="canonical" href="/b"/></head></html>'
+    )
+    assert extract_url(tree) == "https://example.org/b"
+
+    # sections discarded for the author are left out of the text, their tail is kept
+    tree = html.fromstring(
+        '<html><body><div class="comments"><p class="byline">Comment Author</p></div>'
+        '<span class="author">By<time>2020</time> John <figure>Image</figure>Doe</span></body></html>'
+    )
+    assert extract_author(tree) == "John Doe"
+    assert tree.find(".//time") is not None
+
+
 def test_url():
     """Test URL extraction"""
     expected = "https://example.org"
@@ -286,6 +326,40 @@ def test_dates():
         assert metadata.date == expected
 
 
+def test_date_candidates():
+    "Publication dates of the structured metadata are kept, used if htmldate finds none, and the source is recorded."
+    jsonld = """<script type="application/ld+json">{"@context": "https://schema.org", "@type": "NewsArticle",
+    "datePublished": "2018-01-02T10:00:00+01:00"}</script>"""
+    htmldoc = f"""<html><head><meta property="article:published_time" content="2017-09-01"/>{jsonld}</head>
+    <body><p>Text</p></body></html>"""
+    metadata = extract_metadata(htmldoc)
+    assert metadata.date_candidates == [("meta", "2017-09-01"), ("json-ld", "2018-01-02T10:00:00+01:00")]
+    assert metadata.date == "2017-09-01"
+    assert metadata.date_source == "meta"
+    assert "date_candidates" not in metadata.as_dict()
+    metadata = extract_metadata("<html><body><p>Published: 12 March 2021</p></body></html>")
+    assert metadata.date == "2021-03-12"
+    assert metadata.date_source == "htmldate"
+    assert extract_metadata("<html><body><p>Text</p></body></html>").date_source is None
+    # seed: no date found by htmldate
+    tree = html.fromstring("<html><body><p>Text</p></body></html>")
+    metadata = Document()
+    metadata.date_candidates = [("json-ld", "March 4, 2019"), ("meta", "2030-01-01")]
+    metadata = extract_date(tree, metadata, set_date_params())
+    assert metadata.date == "2019-03-04"
+    assert metadata.date_source == "json-ld"
+    metadata.date = metadata.date_source = None
+    assert extract_date(tree, metadata, {"original_date": False}).date is None
+    # time budget spent: the extensive search is skipped
+    htmldoc = "<html><body><p>Published: 12 March 2021</p></body></html>"
+    stats = ExtractionStats(deadline_ms=0)
+    assert extract_metadata(htmldoc, stats=stats).date is None
+    assert stats.skipped == ["date_search"]
+    stats = ExtractionStats(deadline_ms=60000)
+    assert extract_metadata(htmldoc, stats=stats).date == "2021-03-12"
+    assert not stats.skipped
+
+
 def test_sitename():
     """Test extraction of site name"""
     tests = [
@@ -597,3 +671,34 @@ def test_document_as_dict():
     assert dict_["categories"] == ["Cat1", "Cat2"]
     assert dict_["license"] == "CC BY-SA 4.0"
     assert dict_["image"] == "https://example.org/example.jpg"
+
+
+def test_metadata_scope():
+    "Head scope: same head fields, body JSON-LD kept, full parse when essential fields are missing."
+    head = """<html><head><title>Test Title</title>
+    <meta name="author" content="Jenny Smith" />
+    <meta property="og:url" content="https://example.org" />
+    <meta property="article:published_time" content="2017-09-01" />
+    </head>"""
+    footer = '<footer><a href="https://creativecommons.org/licenses/by-sa/4.0/">CC BY-SA</a></footer>'
+    htmldoc = head + "<body><p>Text</p>" + footer + "</body></html>"
+    full, partial = extract_metadata(htmldoc), extract_metadata(htmldoc, scope="head")
+    for field in ("title", "author", "url", "date", "hostname"):
+        assert getattr(full, field) == getattr(partial, field)
+    # body-only fields are not searched when the head suffices
+    assert full.license == "CC BY-SA 4.0"
+    assert partial.license is None
+    # JSON-LD blocks placed in the body
+    jsonld = """<script type="application/ld+json">{"@context": "https://schema.org", "@type": "NewsArticle",
+    "headline": "JSON Title", "author": {"@type": "Person", "name": "Jane Doe"}, "datePublished": "2020-01-02"}</script>"""
+    metadata = extract_metadata(f"<html><head></head><body><p>Text</p>{jsonld}</body></html>", scope="head")
+    assert metadata.title == "JSON Title"
+    assert metadata.author == "Jane Doe"
+    assert metadata.date == "2020-01-02"
+    # author only found in a body byline: fallback on the full document
+    htmldoc = head.replace('<meta name="author" content="Jenny Smith" />', "")
+    htmldoc += '<body><p class="byline">By John Doe</p></body></html>'
+    assert extract_metadata(htmldoc, scope="head").author == extract_metadata(htmldoc).author == "John Doe"
+    # no head element
+    metadata = extract_metadata("<html><body><h1>Title</h1></body></html>", scope="head")
+    assert metadata.title == "Title"
@@ -11,6 +11,7 @@ import pytest
 from courlan import UrlStore
 
 from trafilatura import spider  # for global variables
+from trafilatura.utils import Response
 
 # from trafilatura.utils import LANGID_FLAG
 
@@ -173,6 +174,14 @@ def test_crawl_logic():
     assert params.lang is None
     assert params.rules is None
 
+    # the encoding which worked is a hint for the other pages of the host during the crawl
+    data = "<html><body><p>Преступление и наказание</p></body></html>".encode("cp1251")
+    response = Response(data, 200, "https://example.org/page")
+    response.store_headers({"Content-Type": "text/html; charset=windows-1251"})
+    spider.process_response(response, params)
+    assert params.charsets == {"example.org": "cp1251"}
+    spider.URL_STORE = UrlStore(compressed=False, strict=False)
+
     # already visited
     params = spider.init_crawl(url, known=[url])
     assert params.base == "https://httpbun.com"
@@ -5,8 +5,10 @@ Unit tests for the trafilatura library.
 
 import json
 import logging
+import pickle
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy
 from os import path
 from unittest.mock import patch
@@ -20,7 +22,9 @@ except ImportError:
     from charset_normalizer import detect
 
 import trafilatura.htmlprocessing
+import trafilatura.metadata
 from trafilatura import bare_extraction, baseline, core, extract, extract_with_metadata, xml
+from trafilatura.cache import ResultCache, cache_key
 from trafilatura.deduplication import LRU_TEST
 from trafilatura.external import sanitize_tree, try_justext, try_readability
 from trafilatura.main_extractor import (
@@ -36,6 +40,7 @@ from trafilatura.main_extractor import (
 )
 from trafilatura.meta import reset_caches
 from trafilatura.metadata import Document
+from trafilatura.profiles import PROFILE_MAX_SAMPLES, SiteProfile, SiteProfiles, expression_order
 from trafilatura.readability_lxml import is_probably_readerable
 from trafilatura.settings import TAG_CATALOG, use_config
 from trafilatura.utils import (
@@ -47,6 +52,7 @@ from trafilatura.utils import (
     language_classifier,
     line_processing,
     load_html,
+    normalize_html,
     normalize_unicode,
     repair_faulty_html,
     return_printables_and_spaces,
@@ -198,6 +204,14 @@ def test_input(options):
     # XML-illegal chars are stripped pre-parse (see utils.INVALID_XML_CHARS)
     htmlstring = "<html><body><p>a\x00b\x1dc￾￿d</p>\t<p>keep\tme</p></body></html>"
     assert repair_faulty_html(htmlstring, htmlstring[:50].lower()) == "<html><body><p>abcd</p>\t<p>keep\tme</p></body></html>"
+    # same fixes on UTF-8 bytes before parsing
+    assert normalize_html(htmlstring) == (b"<html><body><p>abcd</p>\t<p>keep\tme</p></body></html>", False)
+    assert normalize_html(b"<!DOCTYPE html PUBLIC />\r\n<html/>\r\n<body/></html>") == (b"\r\n<html>\r\n<body/></html>", False)
+    assert normalize_html('<html lang="fr"/>\n<p>tête</p>'.encode("latin-1"), "iso-8859-1") == (
+        '<html lang="fr">\n<p>tête</p>'.encode(),
+        False,
+    )
+    assert normalize_html(b"This is a string.")[1] is True
     page = (
         "<html><body><article>"
         + "<p>Long enough article paragraph\x1d for baseline￿ to trigger.</p>" * 3
@@ -310,6 +324,310 @@ def test_python_output():
     assert len(dict_result) == 21
 
 
+def test_copy_accounting():
+    "The cascade reports its whole-tree copies, stays within budget and leaves caller trees untouched."
+    htmlstring = (
+        "<html><body><article><p>" + "Text paragraph here. " * 40 + "</p></article>"
+        '<div id="comments"><p>A reader comment that is here.</p></div></body></html>'
+    )
+    # fast mode: cleaning copy, wild-text backup (the page measure of the escalation gate copies nothing)
+    result = bare_extraction(htmlstring, fast=True, config=ZERO_CONFIG)
+    assert result.stats.copies <= 3
+    # the nodes are only counted when tracing
+    assert result.stats.copied_nodes == 0
+    traced = bare_extraction(htmlstring, options=core.Extractor(fast=True, trace=True, config=ZERO_CONFIG))
+    assert traced.stats.copies == result.stats.copies
+    assert traced.stats.copied_nodes > 0
+    full = bare_extraction(htmlstring, config=ZERO_CONFIG)
+    assert result.stats.copies < full.stats.copies <= 5
+    # bookkeeping only: not part of the output
+    assert "stats" not in full.as_dict()
+    assert '"stats"' not in extract(htmlstring, output_format="json", with_metadata=True, config=ZERO_CONFIG)
+
+    # a parsed tree is owned by the cascade, a caller's tree is pruned on a copy
+    tree = html.fromstring(htmlstring)
+    before = html.tostring(tree)
+    result = bare_extraction(tree, include_comments=False, config=ZERO_CONFIG)
+    assert html.tostring(tree) == before
+    owned = bare_extraction(htmlstring, include_comments=False, config=ZERO_CONFIG)
+    assert result.stats.copies == owned.stats.copies + 1
+    assert result.text == owned.text
+
+
+def test_extract_many(monkeypatch):
+    "Batch extraction: streamed or ordered results, per-item errors."
+    docs = [
+        (
+            "<html><body><article><p>" + f"Document number {i} text. " * 20 + "</p></article></body></html>",
+            f"https://example.org/{i}",
+        )
+        for i in range(12)
+    ]
+    docs.append(("<html><body></body></html>", None))
+    options = core.Extractor(output_format="json", with_metadata=True, config=ZERO_CONFIG)
+    results = list(trafilatura.extract_many(iter(docs), options, workers=2, chunksize=3))
+    assert sorted(r.index for r in results) == list(range(13))
+    for res in results:
+        assert res.error is None
+        if res.index < 12:
+            assert f"Document number {res.index} text." in res.result
+            assert json.loads(res.result)["source"] == f"https://example.org/{res.index}"
+        else:
+            assert json.loads(res.result)["source"] is None
+    assert options.url is None
+    ordered = list(trafilatura.extract_many(docs, options, workers=2, ordered=True))
+    assert [r.index for r in ordered] == list(range(13))
+    assert [r.result for r in ordered] == [r.result for r in sorted(results, key=lambda r: r.index)]
+
+    # an exception is reported on the item, the batch goes on
+    def _fail_on_second(htmlstring, options, context):
+        if context.url.endswith("/1"):
+            raise RuntimeError("kaboom")
+        return "ok"
+
+    monkeypatch.setattr(trafilatura.batch, "extract_document", _fail_on_second)
+    results = list(trafilatura.extract_many(docs[:3], workers=1))
+    assert [r.result for r in results] == ["ok", None, "ok"]
+    assert results[1].error == "RuntimeError: kaboom"
+
+
+def test_result_cache(tmp_path):
+    "Content-addressed result cache: hits without parsing, options fingerprint, size limits."
+    htmlstring = "<html><body><article><p>" + "Cached paragraph text. " * 20 + "</p></article></body></html>"
+    cache = ResultCache(str(tmp_path))
+    options = core.Extractor(output_format="json", with_metadata=True, url="https://example.org/a", cache=cache)
+    first = extract(htmlstring, options=options)
+    assert (cache.hits, cache.misses) == (0, 1)
+    with patch.object(core, "_bare_extraction", side_effect=AssertionError("parsed again")):
+        assert extract(htmlstring, options=options) == first
+    assert cache.hits == 1
+    # persisted: a new cache on the same directory (e.g. in another process)
+    reloaded = pickle.loads(pickle.dumps(cache))
+    assert reloaded.directory == cache.directory
+    assert not reloaded._memory
+    options.cache = reloaded
+    with patch.object(core, "_bare_extraction", side_effect=AssertionError("parsed again")):
+        assert extract(htmlstring, options=options) == first
+    # the key depends on the options, the URL and the input, but not on the source label
+    options.source = "label"
+    assert cache_key(htmlstring, options) == cache_key(htmlstring, copy(options))
+    assert cache_key(htmlstring, options) != cache_key(htmlstring, core.Extractor(output_format="json"))
+    assert cache_key(htmlstring, options) != cache_key(htmlstring + " ", options)
+    assert cache_key(htmlstring, options) != cache_key(htmlstring.encode("utf-8"), options)
+    assert cache_key(html.fromstring(htmlstring), options) is None
+    assert cache_key(htmlstring, core.Extractor(dedup=True)) is None
+
+    # bare extraction: documents and discarded inputs are stored
+    options = core.Extractor(cache=ResultCache(), config=ZERO_CONFIG)
+    document = bare_extraction(htmlstring, options=options)
+    cached = bare_extraction(htmlstring, options=options)
+    assert cached is not document
+    assert cached.text == document.text
+    assert etree.tostring(cached.body) == etree.tostring(document.body)
+    options = core.Extractor(cache=ResultCache(), config=use_config())
+    assert bare_extraction("<html><body></body></html>", options=options) is None
+    assert bare_extraction("<html><body></body></html>", options=options) is None
+    assert options.cache.hits == 1
+
+    # size-based eviction in both tiers
+    cache = ResultCache(str(tmp_path / "small"), memory_size=100, disk_size=1000)
+    for i in range(30):
+        cache.put(f"key{i}", bytes(40))
+    assert len(cache._memory) == 2
+    assert cache._memory_used <= 100
+    assert cache.get("key29") is not None
+    assert cache.get("key0") is None
+    (used,) = cache._connect().execute("SELECT SUM(size) FROM results").fetchone()
+    assert used <= 1000
+    cache.clear()
+    assert cache.get("key29") is None
+    cache.close()
+
+
+def test_site_profiles(tmp_path):
+    "Per-website profiles: sources learned along the way, shortcut for the date search, persistence."
+    profile = SiteProfile()
+    for _ in range(3):
+        assert profile.learned("date") is None
+        profile.record("date", "fast")
+    assert profile.learned("date") == "fast"
+    profile.record("date", "extensive")
+    assert profile.learned("date") is None
+    for _ in range(PROFILE_MAX_SAMPLES):
+        profile.record("date", "fast")
+    assert sum(profile.fields["date"].values()) <= PROFILE_MAX_SAMPLES
+    # shared by threads
+    profile = SiteProfile()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(lambda _: profile.record("date", "fast"), range(40)))
+    assert profile.fields["date"]["fast"] == 40
+    # learned while extracting, with a single date search per page
+    profiles = SiteProfiles(str(tmp_path / "profiles.json"))
+    assert profiles.get(None) is None
+    paragraphs = "".join(f"<p>Paragraph {i} of the article is about topic number {i * 7}.</p>" for i in range(12))
+    htmlstring = f"""<html><head><meta property="article:published_time" content="2017-09-01"/></head>
+    <body><article>{paragraphs}</article></body></html>"""
+    with patch.object(trafilatura.metadata, "find_date", wraps=trafilatura.metadata.find_date) as mocked:
+        for i in range(3):
+            options = core.Extractor(with_metadata=True, url=f"https://example.org/{i}", profiles=profiles, config=ZERO_CONFIG)
+            assert options.fingerprint() == core.Extractor(with_metadata=True, config=ZERO_CONFIG).fingerprint()
+            # the result depends on the pages seen before
+            assert cache_key(htmlstring, options) is None
+            bare_extraction(htmlstring, options=options)
+    assert mocked.call_count == 3
+    profile = profiles.get("https://example.org/other")
+    assert profile.learned("date") == "fast"
+    assert profiles.as_dict() == {"example.org": {"date": {"fast": 3}, "body": {"1": 3}}}
+    # the fast search is enough on this website
+    options = core.Extractor(with_metadata=True, url="https://example.org/3", profiles=profiles, config=ZERO_CONFIG)
+    with patch.object(trafilatura.metadata, "find_date", wraps=trafilatura.metadata.find_date) as mocked:
+        assert bare_extraction(htmlstring, options=options).date == "2017-09-01"
+    assert mocked.call_count == 1
+    assert mocked.call_args.kwargs["extensive_search"] is False
+    # stored between runs and sent to worker processes
+    profiles.save()
+    assert SiteProfiles(profiles.path).as_dict() == profiles.as_dict()
+    copy = pickle.loads(pickle.dumps(profiles))
+    assert copy.as_dict() == profiles.as_dict()
+    # what a worker process learns is sent back
+    copy.get("https://example.org/4").record("date", "extensive")
+    copy.get("https://example.net/").record("date", "fast")
+    recorded = copy.take_recorded()
+    assert recorded == {"example.org": {"date": {"extensive": 1}}, "example.net": {"date": {"fast": 1}}}
+    assert copy.take_recorded() == {}
+    profiles.merge(recorded)
+    assert profiles.as_dict()["example.org"]["date"] == {"fast": 4, "extensive": 1}
+    assert profiles.get("https://example.net/").fields == {"date": {"fast": 1}}
+
+
+def test_site_profiles_expressions():
+    "The expressions which found the title, the author and the main content of a website are tried first."
+    assert expression_order(4) == [0, 1, 2, 3]
+    assert expression_order(4, 2) == [2, 0, 1, 3]
+    profile = SiteProfile({"body": {"7": 5}, "title": {"json-ld": 5}, "author": {"1": 5}})
+    assert profile.learned_position("body", 5) is None
+    assert profile.learned_position("title", 3) is None
+    assert profile.learned_position("author", 3) == 1
+
+    paragraphs = "".join(f"<p>Paragraph {i} of the section is about topic number {i * 7}.</p>" for i in range(6))
+    htmlstring = f"""<html><body><h2 class="headline">Teaser headline</h2><h3 class="title">Real title</h3>
+    <p class="byline">John Smith</p><span class="author">Jane Doe</span>
+    <div class="post-content"><p>Teaser.</p>{paragraphs}</div><div id="story"><p>Story.</p>{paragraphs}</div></body></html>"""
+
+    def extraction(profiles, page=htmlstring):
+        options = core.Extractor(
+            with_metadata=True, fast=True, url="https://example.org/page", profiles=profiles, config=ZERO_CONFIG
+        )
+        return bare_extraction(page, options=options)
+
+    # the sources are recorded along the way
+    profiles = SiteProfiles()
+    for _ in range(3):
+        result = extraction(profiles)
+    assert result.title == "Teaser headline"
+    assert result.author == "Jane Doe"
+    assert result.raw_text.startswith("Teaser.")
+    profile = profiles.get("https://example.org/")
+    assert profile.learned("title") == "0"
+    assert profile.learned("author") == "0"
+    assert profile.learned("body") == "0"
+    # the learned expressions come first
+    profiles = SiteProfiles()
+    profiles.get("https://example.org/").fields.update({"title": {"2": 5}, "author": {"1": 5}, "body": {"2": 5}})
+    result = extraction(profiles)
+    assert result.title == "Real title"
+    assert result.author == "John Smith"
+    assert result.raw_text.startswith("Story.")
+    assert result.stats.body_xpath == 2
+    # and the full cascade if they find nothing
+    result = extraction(profiles, htmlstring.replace('id="story"', 'id="other"'))
+    assert result.raw_text.startswith("Teaser.")
+    assert result.stats.body_xpath == 0
+
+
+def test_extraction_trace():
+    "Opt-in per-stage trace and the winning branch of the cascade."
+    htmlstring = "<html><body><article><p>" + "Text paragraph here. " * 40 + "</p></article></body></html>"
+    result = bare_extraction(htmlstring, config=ZERO_CONFIG)
+    assert result.stats.branch == "main"
+    assert result.stats.stages is None
+    result = bare_extraction(htmlstring, options=core.Extractor(trace=True, with_metadata=True, config=ZERO_CONFIG))
+    stages = {s["stage"]: s for s in result.stats.stages}
+    assert {"load", "metadata", "cleaning", "main", "external"} <= stages.keys()
+    assert stages["load"]["len_in"] == len(htmlstring)
+    assert stages["main"]["len_out"] == len(result.raw_text.strip())
+    assert stages["external"]["len_in"] == stages["main"]["len_out"]
+    assert json.dumps(result.stats.as_dict())
+    # source of the date
+    dated = htmlstring.replace("<html>", '<html><head><meta property="article:published_time" content="2017-09-01"/></head>')
+    assert bare_extraction(dated, with_metadata=True, config=ZERO_CONFIG).stats.date_source == "meta"
+    # no usable main content: the baseline takes over
+    htmlstring = "<html><body><div>" + "Loose text without paragraphs. " * 5 + "</div></body></html>"
+    assert bare_extraction(htmlstring, fast=True, config=use_config()).stats.branch == "baseline"
+
+
+def test_extraction_deadline():
+    "A spent time budget skips the fallbacks and marks the result as degraded."
+    htmlstring = "<html><body><p>A short paragraph.</p><div>" + "Loose text without paragraphs. " * 5 + "</div></body></html>"
+    config = use_config()
+    result = bare_extraction(htmlstring, options=core.Extractor(deadline_ms=60000, config=config))
+    assert result.stats.branch == "baseline"
+    assert not result.stats.degraded
+    options = core.Extractor(deadline_ms=0, config=config, cache=ResultCache())
+    result = bare_extraction(htmlstring, options=options)
+    assert result.stats.branch == "main"
+    assert result.raw_text == "A short paragraph."
+    assert result.stats.degraded
+    assert result.stats.skipped == ["external", "baseline", "escalation"]
+    assert result.stats.as_dict()["degraded"] is True
+    # degraded results are not cached
+    assert not options.cache._memory
+    # the main extractor always runs
+    htmlstring = "<html><body><article><p>" + "Text paragraph here. " * 40 + "</p></article></body></html>"
+    result = bare_extraction(htmlstring, options=core.Extractor(deadline_ms=0, fast=True, precision=True, config=config))
+    assert "Text paragraph here." in result.raw_text
+    assert not result.stats.degraded
+    # a document which would not escalate is not degraded by the spent budget, and it is cached
+    options = core.Extractor(deadline_ms=0, fast=True, config=config, cache=ResultCache())
+    result = bare_extraction(htmlstring, options=options)
+    assert result.stats.skipped == []
+    assert options.cache._memory
+    # default from the configuration, 0 meaning no limit
+    config["DEFAULT"]["EXTRACTION_DEADLINE_MS"] = "250"
+    assert core.Extractor(config=config).deadline_ms == 250
+    config["DEFAULT"]["EXTRACTION_DEADLINE_MS"] = "0"
+    assert core.Extractor(config=config).deadline_ms is None
+    assert core.Extractor().deadline_ms is None
+
+
+def test_auto_fast():
+    "The auto fast mode only bypasses the external comparison on well-structured results."
+    options = core.Extractor(fast="auto", config=use_config())
+    assert options.auto_fast is True
+    assert options.fast is False
+    assert core.Extractor(fast=True).auto_fast is False
+    paragraphs = "".join(f"<p>Paragraph number {i} of the article text goes on for a while.</p>" for i in range(30))
+    htmlstring = f"<html><body><nav><a href='/'>Home</a></nav><article>{paragraphs}</article></body></html>"
+    result = bare_extraction(htmlstring, options=options)
+    assert result.stats.bypassed == ["external"]
+    assert result.stats.body_xpath == 1
+    assert result.stats.branch == "main"
+    assert not result.stats.degraded
+    assert result.raw_text == bare_extraction(htmlstring, options=core.Extractor(config=use_config())).raw_text
+    # link-heavy page: the comparison runs
+    links = "".join(f"<li><a href='/{i}'>Another link to a page of the website</a></li>" for i in range(100))
+    result = bare_extraction(htmlstring.replace("<article>", f"<div><ul>{links}</ul></div><article>"), options=options)
+    assert not result.stats.bypassed
+    # no main content area found
+    result = bare_extraction(f"<html><body>{paragraphs}</body></html>", options=options)
+    assert result.stats.body_xpath is None
+    assert not result.stats.bypassed
+    # not in recall mode
+    result = bare_extraction(htmlstring, options=core.Extractor(fast="auto", recall=True, config=use_config()))
+    assert not result.stats.bypassed
+    assert extract(htmlstring, fast="auto", config=use_config()) == extract(htmlstring, config=use_config())
+
+
 def test_exotic_tags(options):
     options._add_config(ZERO_CONFIG)
     # cover some edge cases with a specially crafted file
@@ -1405,6 +1723,65 @@ def test_extraction_options():
     assert bare_extraction(my_html, config=NEW_CONFIG, with_metadata=False).date is None
 
 
+def test_frozen_options():
+    "Frozen and hashable options, fingerprint, derivation and per-document context."
+    options = core.Extractor(output_format="json", url_blacklist={"https://example.org/bad"})
+    frozen = options.freeze()
+    assert frozen.freeze() is frozen
+    assert frozen.fingerprint() == options.fingerprint()
+    with pytest.raises(AttributeError):
+        frozen.focus = "recall"
+    with pytest.raises(TypeError):
+        frozen.date_params["max_date"] = "2000-01-01"
+    assert isinstance(frozen.url_blacklist, frozenset)
+    assert frozen == core.Extractor(output_format="json", url_blacklist={"https://example.org/bad"}).freeze()
+    assert len({frozen, options.freeze(), frozen.with_(focus="recall")}) == 2
+    # copies and pickles stay frozen
+    for duplicate in (copy(frozen), pickle.loads(pickle.dumps(frozen))):
+        assert duplicate == frozen
+        assert hash(duplicate) == hash(frozen)
+        with pytest.raises(AttributeError):
+            duplicate.tables = False
+
+    # the fingerprint tracks what changes results, not per-document fields
+    recall = frozen.with_(focus="recall")
+    assert (recall.focus, frozen.focus) == ("recall", "balanced")
+    assert recall.fingerprint() != frozen.fingerprint()
+    assert (
+        recall.fingerprint()
+        == core.Extractor(output_format="json", recall=True, url_blacklist={"https://example.org/bad"}).fingerprint()
+    )
+    assert frozen.with_(url="https://example.org/", source="label").fingerprint() == frozen.fingerprint()
+    assert options.with_(tables=False).fingerprint() != options.fingerprint()
+    assert options.tables is True
+    assert core.Extractor(config=ZERO_CONFIG).fingerprint() != core.Extractor(config=use_config()).fingerprint()
+
+    # per-document information leaves the shared options untouched
+    context = core.DocumentContext(url="https://example.org/page", max_date="2020-01-01")
+    derived = frozen.with_context(context)
+    assert (derived.url, derived.source, derived.date_params["max_date"]) == (
+        "https://example.org/page",
+        "https://example.org/page",
+        "2020-01-01",
+    )
+    assert derived.fingerprint() == frozen.fingerprint()
+    assert frozen.url is None
+    assert frozen.date_params["max_date"] != "2020-01-01"
+    assert frozen.with_context(None) is frozen
+    htmlstring = "<html><body><article><p>" + "Some text in context. " * 20 + "</p></article></body></html>"
+    result = json.loads(extract(htmlstring, options=frozen, context=context))
+    assert result["source"] == "https://example.org/page"
+    assert extract(htmlstring, options=frozen, context=core.DocumentContext(url="https://example.org/bad")) is None
+    assert frozen.url is None
+    # declared encoding of the input
+    latin = frozen.with_context(core.DocumentContext(encoding="iso-8859-1"))
+    assert (latin.encoding, frozen.encoding) == ("iso-8859-1", None)
+    assert latin.fingerprint() == frozen.fingerprint()
+    assert cache_key(b"<html/>", latin) != cache_key(b"<html/>", frozen)
+    result = json.loads(extract(htmlstring.replace("text", "tête").encode("latin-1"), options=latin))
+    assert "tête" in result["text"]
+
+
 def test_precision_recall():
     """test precision- and recall-oriented settings"""
     # the test cases could be better
@@ -1542,6 +1919,30 @@ def test_link_density_whole_card_links_kept():
     assert trafilatura.htmlprocessing.link_density_test(element, text)[0] is False  # long links -> content, kept
 
 
+def test_subtree_stats():
+    "The statistics gathered in one pass match the per-element computation, also after deletions."
+    from trafilatura.utils import trim
+
+    def check(tree, stats):
+        for elem in tree.iter(tag=etree.Element):
+            links = elem.findall(".//ref")
+            assert stats.text_length(elem) == len(trim(elem.text_content()))
+            assert stats.refs(elem) == len(links)
+            assert stats.link_info(elem) == trafilatura.htmlprocessing.collect_link_info(links)[:3]
+            assert stats.has_graphic(elem) == (elem.find(".//graphic") is not None)
+
+    htmlstring = """<body><div> Some<hi>text</hi> with <ref>a short</ref> and <ref> <hi>a longer</hi>  link </ref>tail
+    <!-- comment --><p>Para graph <ref><ref>nested</ref> links</ref></p>  <list><item><ref> </ref></item>
+    <item><graphic src="a.jpg"/>image</item></list></div><div><p>Second block</p>\n<ref>link</ref>end</div></body>"""
+    tree = html.fromstring(htmlstring)
+    stats = trafilatura.htmlprocessing.SubtreeStats(tree)
+    check(tree, stats)
+    stats.delete([tree.find(".//p"), tree.find(".//item")])
+    check(tree, stats)
+    stats.delete([tree.find(".//list"), tree[1]], keep_tail=False)
+    check(tree, stats)
+
+
 def test_link_density_paragraph_listing_kept():
     "regression (#900): a document listing carries one short link per paragraph, which the #584 \
     branch read as a farm because the only exemption was on average link length. Pruning it \
@@ -1586,10 +1987,12 @@ def test_overall_discard_legacy_tokens():
     collisions -- a prior removal was reverted after a sign-error), 'xg1' was REMOVED (net-negative \
     -- it discarded the real content of a Chinese forum page to nothing)."
     import trafilatura.xpaths as xp
+    from trafilatura.htmlprocessing import AttributeIndex
 
     def matches(class_value):
         root = etree.fromstring(f'<html><body><div class="{class_value}"><p>content</p></div></body></html>')
-        return any(len(x(root)) > 0 for x in xp.OVERALL_DISCARD_XPATH)
+        index = AttributeIndex(root)
+        return any(index.select(alternatives) for alternatives in xp.OVERALL_DISCARD_MATCHERS)
 
     for cls in ("yin", "zlylin", "mol-factbox"):
         assert matches(cls), cls
@@ -1598,13 +2001,15 @@ def test_overall_discard_legacy_tokens():
 
 def test_overall_discard_matches_both_attributes():
     "regression: discard tokens must match whichever of id/class carries them, regardless of \
-    attribute order in the source (re:test(@id|@class,...) alone only tests the source-FIRST one). \
+    attribute order in the source ('id|class' alone only tests the source-FIRST one). \
     Exception: 'cookie' stays first-attribute-only -- pages about cookies carry it on real content."
     import trafilatura.xpaths as xp
+    from trafilatura.htmlprocessing import AttributeIndex
 
     def discarded(attrs):
         root = etree.fromstring(f"<html><body><div {attrs}><p>content</p></div></body></html>")
-        return any(len(x(root)) > 0 for x in xp.OVERALL_DISCARD_XPATH)
+        index = AttributeIndex(root)
+        return any(index.select(alternatives) for alternatives in xp.OVERALL_DISCARD_MATCHERS)
 
     assert discarded('class="x" id="author-box"')  # token in @id, class written first
     assert discarded('id="x" class="sidebar"')  # token in @class, id written first
@@ -1623,15 +2028,17 @@ def test_xpath_alt_rejects_empty_group():
 
 
 def test_precision_discard_link_token_only():
-    "regression: PRECISION_DISCARD_XPATH matches 'link' as a whole class TOKEN, not a bare \
+    "regression: PRECISION_DISCARD_MATCHERS matches 'link' as a whole class TOKEN, not a bare \
     substring (2026-07-11). class='link' is still dropped (intended, cf. test_precision_recall), \
     but compound classes containing 'link' (permalink/headline-link/featured-link) must NOT be \
     -- the bare substring discarded real content in precision mode. 'bottom'/'header' unchanged."
     import trafilatura.xpaths as xp
+    from trafilatura.htmlprocessing import AttributeIndex
 
     def discarded(attr, value, tag="div"):
         root = etree.fromstring(f'<html><body><{tag} {attr}="{value}"><p>content</p></{tag}></body></html>')
-        return any(len(x(root)) > 0 for x in xp.PRECISION_DISCARD_XPATH)
+        index = AttributeIndex(root)
+        return any(index.select(alternatives) for alternatives in xp.PRECISION_DISCARD_MATCHERS)
 
     assert discarded("class", "link")  # standalone token still dropped (intended)
     assert discarded("class", "nav link")  # token among others
@@ -1643,14 +2050,16 @@ def test_precision_discard_link_token_only():
 
 
 def test_precision_discard_bottom_token_boundary():
-    "regression: PRECISION_DISCARD_XPATH must match 'bottom' only where it starts or ends a \
+    "regression: PRECISION_DISCARD_MATCHERS must match 'bottom' only where it starts or ends a \
     class token. As a bare substring it also matched CSS spacing utilities -- alsumaria.tv wraps \
     the article column in 'Padding-bottom-lg-30', so precision mode discarded the whole article."
     import trafilatura.xpaths as xp
+    from trafilatura.htmlprocessing import AttributeIndex
 
     def discarded(attr, value, tag="div"):
         root = etree.fromstring(f'<html><body><{tag} {attr}="{value}"><p>content</p></{tag}></body></html>')
-        return any(len(x(root)) > 0 for x in xp.PRECISION_DISCARD_XPATH)
+        index = AttributeIndex(root)
+        return any(index.select(alternatives) for alternatives in xp.PRECISION_DISCARD_MATCHERS)
 
     # page-bottom chrome: still discarded, whichever end of the token 'bottom' sits at
     assert discarded("class", "bottom")
@@ -1721,18 +2130,20 @@ def test_no_duplicate_paragraph_from_lb_tail():
     assert not any(line and line.isspace() for line in result.split("\n"))
 
 
-def test_body_xpath_fulltext_class():
-    "GH#780: BODY_XPATH's fulltext-class rule (re:test(@class,'fulltext','i'), replacing an \
+def test_body_matchers_fulltext_class():
+    "GH#780: BODY_MATCHERS's fulltext-class rule ((?i:fulltext) on the class, replacing an \
     obscure translate()-based case-fold hack) must still match every capitalization of a \
     genuine 'fulltext' content class. #780's actual complaint -- the bare substring ALSO \
     matching a wrapper div ('FulltextWrapper') that isn't the content itself -- is NOT fixed \
     here: word-boundary anchoring can't separate that from a legitimate 'FullText' class, since \
     both are equally well-bounded tokens (documented limitation, not a regression)."
     import trafilatura.xpaths as xp
+    from trafilatura.htmlprocessing import AttributeIndex
 
     def matches(class_value):
         root = etree.fromstring(f'<html><body><div class="{class_value}"><p>content</p></div></body></html>')
-        return any(len(x(root)) > 0 for x in xp.BODY_XPATH)
+        index = AttributeIndex(root)
+        return any(index.select(alternatives) for alternatives in xp.BODY_MATCHERS)
 
     for cls in ("fulltext", "FullText", "fullText", "FULLTEXT", "article-fulltext"):
         assert matches(cls), cls
@@ -1740,8 +2151,158 @@ def test_body_xpath_fulltext_class():
     assert matches("FulltextWrapper")
 
 
+def test_body_candidates():
+    "The single tree walk finds the same first match as each expression of BODY_XPATH, the reference."
+    import trafilatura.xpaths as xp
+    from trafilatura.main_extractor import _is_body_candidate, find_body_candidates
+
+    attributes = [
+        'class="post"',
+        'class="post other"',
+        'itemprop="articleBody"',
+        'id="article-body"',
+        'class="FullText"',
+        'role="article"',
+        'id="story"',
+        'class="text\n"',
+        'id="content"',
+        'id="Main-Content"',
+        'id="MAIN-CONTENT"',
+        'class="Page-content"',
+        'class="main-wrapper"',
+        'role="mainbox"',
+        'class="single-post"',
+        "",
+    ]
+    for tag in ("div", "section", "article", "main", "span"):
+        for first, second in zip(attributes, reversed(attributes), strict=True):
+            root = html.fromstring(
+                f"<html><body><{tag} {first}><p>one</p></{tag}><div><{tag} {second}><p>two</p></{tag}></div></body></html>"
+            )
+            candidates = find_body_candidates(root)
+            for expression, found in zip(xp.BODY_XPATH, candidates, strict=True):
+                expected = expression(root)
+                assert (found[0] if found else None) is (expected[0] if expected else None), (tag, first, second)
+
+    # candidates are re-validated: a match moved out of the tree by a previous one is skipped
+    htmlstring = "<html><body><article><p>short</p></article><div class='post-content'><p>Main text.</p></div></body></html>"
+    root = html.fromstring(htmlstring)
+    candidates = find_body_candidates(root)
+    assert [len(found) for found in candidates] == [1, 1, 0, 0, 0]
+    root.find(".//body").remove(candidates[0][0])
+    assert not _is_body_candidate(candidates[0][0], root, 0)
+    assert _is_body_candidate(candidates[1][0], root, 1)
+
+
+def test_attribute_index():
+    "The matchers looked up in the attribute index select the same elements as the expressions, the reference."
+    import trafilatura.xpaths as xp
+    from trafilatura.htmlprocessing import AttributeIndex, prune_matching_nodes, prune_unwanted_nodes
+    from trafilatura.settings import BASIC_CLEAN_MATCHERS, BASIC_CLEAN_XPATH
+
+    pairs = [
+        (xp.COMMENTS_XPATH, xp.COMMENTS_MATCHERS),
+        (xp.REMOVE_COMMENTS_XPATH, xp.REMOVE_COMMENTS_MATCHERS),
+        (xp.REMOVE_APPENDED_ARTICLES_XPATH, xp.REMOVE_APPENDED_ARTICLES_MATCHERS),
+        (xp.OVERALL_DISCARD_XPATH, xp.OVERALL_DISCARD_MATCHERS),
+        (xp.TEASER_DISCARD_XPATH, xp.TEASER_DISCARD_MATCHERS),
+        (xp.PRECISION_DISCARD_XPATH, xp.PRECISION_DISCARD_MATCHERS),
+        (xp.DISCARD_IMAGE_ELEMENTS, xp.DISCARD_IMAGE_MATCHERS),
+        (xp.COMMENTS_DISCARD_XPATH, xp.COMMENTS_DISCARD_MATCHERS),
+        (xp.AUTHOR_DISCARD_XPATHS, xp.AUTHOR_DISCARD_MATCHERS),
+    ]
+    attributes = [
+        'class="comment-list"',
+        'id="comments" class="other"',
+        'class="other" id="comments"',
+        'id="reply-1" class="x"',
+        'class="x" id="reply-1"',
+        'style="color: red" id="hidden-box"',
+        'id="box" style="display: none"',
+        'aria-hidden="true"',
+        'role="Navigation"',
+        'data-lp-replacement-content=""',
+        'class="Teaser"',
+        'class="page bottom"',
+        'class="permalink"',
+        'class="link"',
+        'class="image-caption"',
+        'class="author-name"',
+        'class="byline"',
+        'itemprop="author"',
+        'class="cookie-notice"',
+        'class="entry-meta"',
+        'class="tags"',
+        'id="disqus_thread"',
+        'id="respond"',
+        'class="mvp-post-add-box"',
+        "",
+    ]
+    parts = [
+        f"<{tag} {attribute}><p>{tag} text <a href='/category/news/'>news</a></p></{tag}>"
+        for tag in ("div", "section", "span", "list", "p", "header", "footer", "a", "cite", "time", "author", "li")
+        for attribute in attributes
+    ]
+    htmlstring = (
+        f"<html><body><div id='wrapper'>{''.join(parts)}<div class='comments'>{''.join(parts[:9])}</div></div></body></html>"
+    )
+    for expressions, matchers in pairs:
+        root = html.fromstring(htmlstring)
+        index = AttributeIndex(root)
+        for expression, alternatives in zip(expressions, matchers, strict=True):
+            assert index.select(alternatives) == expression(root)
+    root = html.fromstring(htmlstring)
+    index = AttributeIndex(root)
+    for expression, alternatives in zip(xp.AUTHOR_XPATHS, xp.AUTHOR_MATCHERS, strict=True):
+        assert index.select(alternatives, include_root=True) == expression(root)
+    for expressions, matchers in ((xp.CATEGORIES_XPATHS, xp.CATEGORIES_MATCHERS), (xp.TAGS_XPATHS, xp.TAGS_MATCHERS)):
+        for expression, alternatives in zip(expressions, matchers, strict=True):
+            containers = index.select(alternatives, include_root=True)
+            links = list(dict.fromkeys(a for elem in containers for a in elem.iterdescendants("a") if a.get("href")))
+            assert links == expression(root)
+    titles = "".join(
+        f"<{tag} {attribute}>{tag} title</{tag}>"
+        for tag in ("h1", "h2", "h3", "div")
+        for attribute in (
+            'class="entry-title"',
+            'class="post-title x"',
+            'class="title"',
+            'id="headline"',
+            'itemprop="headline"',
+            "",
+        )
+    )
+    root = html.fromstring(f"<html><body>{titles}</body></html>")
+    index = AttributeIndex(root)
+    for expression, alternatives in zip(xp.TITLE_XPATHS, xp.TITLE_MATCHERS, strict=True):
+        assert index.select(alternatives, include_root=True) == expression(root)
+    cleaning = "".join(
+        f"<{tag} {attribute}><p>{tag} text</p></{tag}>"
+        for tag in ("div", "section", "aside", "footer", "template", "span")
+        for attribute in (
+            'class="site-footer"',
+            'id="footer" class="x"',
+            'class="x" id="footer"',
+            'class="Cookie-Banner"',
+            'id="onetrust-consent-sdk"',
+            'class="cookies-not-set"',
+            "",
+        )
+    )
+    root = html.fromstring(f"<html><body class='cookie-notice'>{cleaning}<script>var x;</script><svg/></body></html>")
+    assert AttributeIndex(root).select(BASIC_CLEAN_MATCHERS) == BASIC_CLEAN_XPATH(root)
+
+    # the index stays valid while elements are deleted: one pass prunes as much as the expressions in turn
+    reference = prune_unwanted_nodes(html.fromstring(htmlstring), xp.OVERALL_DISCARD_XPATH + xp.TEASER_DISCARD_XPATH)
+    index = AttributeIndex(html.fromstring(htmlstring))
+    prune_matching_nodes(index, xp.OVERALL_DISCARD_MATCHERS)
+    assert index.select(xp.OVERALL_DISCARD_MATCHERS[0]) == []
+    pruned = prune_matching_nodes(index, xp.TEASER_DISCARD_MATCHERS)
+    assert etree.tostring(pruned) == etree.tostring(reference)
+
+
 def test_basic_cleaning_cookie_banner_scope():
-    "regression: BASIC_CLEAN_XPATH's cookie/consent tokens are ANCHORED banner/CMP compounds, not \
+    "regression: BASIC_CLEAN_MATCHERS's cookie/consent tokens are ANCHORED banner/CMP compounds, not \
     bare substrings -- the substrings matched WP Cookie Notice BODY classes (cookies-not-set) and \
     topical content classes, deleting up to 97% of a page from baseline()/html2txt() and zeroing \
     the escalation-gate denominator. Banner containers (incl. CMP vendors) must still be pruned."
@@ -1765,6 +2326,25 @@ def test_basic_cleaning_cookie_banner_scope():
     assert "cookies" not in page_measure
 
 
+def test_html2txt_length():
+    "html2txt_length() measures the text returned by html2txt() without copying or modifying the tree."
+    from trafilatura.baseline import html2txt, html2txt_length
+    from trafilatura.htmlprocessing import AttributeIndex
+
+    for htmlstring in (
+        (
+            "<html><body class='cookie-banner'><div>First<script>var x;</script> tail of the script"
+            "<p>Para\x07graph</p>text after</div><footer>Footer</footer><span>in<aside>Aside</aside>line</span>"
+            "<!-- comment -->tail of the comment<div class='site-footer'>Footer <b>links</b></div>last</body></html>"
+        ),
+        "<div><style>p {}</style>Tail of the style<p>No body here</p><p>but<svg>text</svg>ok</p></div>",
+    ):
+        tree = html.fromstring(htmlstring)
+        before = html.tostring(tree)
+        assert html2txt_length(AttributeIndex(tree)) == len(html2txt(tree))
+        assert html.tostring(tree) == before
+
+
 def test_is_in_table_cell():
     "is_in_table_cell must check real ancestry, not 'a cell exists somewhere' (#767)."
     tree = etree.fromstring("<body><table><row><cell><p>inside</p></cell></row></table><p>outside</p></body>")
@@ -2415,10 +2995,9 @@ def test_recover_wild_text_inline_formatting_dedup():
     assert result.count("formatting inside") == 1
 
 
-def test_recover_wild_text_dedup_scan_cap(monkeypatch):
-    "regression: DEDUPE_SCAN_CAP gates the O(n) substring scan against `existing` -- a \
-    >MIN_DUPLICATE_LENGTH-char substring duplicate is caught while `existing` is under the \
-    cap, and kept (scan skipped, exact-match set is the only check left) once past it."
+def test_recover_wild_text_dedup_long_page():
+    "a >MIN_DUPLICATE_LENGTH-char substring duplicate is caught however much text was \
+    recovered before it (the scan used to be skipped past a cap on the accumulated text)."
     import trafilatura.main_extractor as me
 
     options = core.Extractor(config=use_config(), recall=True)
@@ -2426,20 +3005,17 @@ def test_recover_wild_text_dedup_scan_cap(monkeypatch):
     substring_dup = "quick brown fox jumps over the lazy dog while the sun was setting slowly"  # substring of container
     assert substring_dup in container
     assert len(substring_dup) > me.MIN_DUPLICATE_LENGTH
-    filler = "Zebra quokka platypus wallaby echidna kookaburra numbat bilby quoll dingo marsupial. " * 4
-
-    def run(cap):
-        monkeypatch.setattr(me, "DEDUPE_SCAN_CAP", cap)
-        htmlstring = f"<html><body><div>{filler}</div><div>{container}</div><div>{substring_dup}</div></body></html>"
-        tree = html.fromstring(htmlstring)
-        result_body = etree.Element("body")
-        me.recover_wild_text(tree, result_body, options)
-        return [trim("".join(el.itertext())) for el in result_body]
-
-    # cap comfortably covers filler+container: substring scan runs, duplicate dropped
-    assert substring_dup not in run(cap=len(filler) + len(container) + 100)
-    # cap smaller than filler alone: scan is skipped once `existing` passes it, duplicate kept
-    assert substring_dup in run(cap=len(filler) // 4)
+    fillers = "".join(
+        f"<div>Zebra quokka platypus wallaby echidna kookaburra numbat bilby quoll dingo number {i}.</div>"
+        for i in range(3000)
+    )
+    htmlstring = f"<html><body>{fillers}<div>{container}</div><div>{substring_dup}</div></body></html>"
+    result_body = etree.Element("body")
+    me.recover_wild_text(html.fromstring(htmlstring), result_body, options)
+    texts = [trim("".join(el.itertext())) for el in result_body]
+    assert sum(map(len, texts)) > 200_000
+    assert container in texts
+    assert substring_dup not in texts
 
 
 def test_prune_boilerplate_table_after_nested():
@@ -2501,7 +3077,7 @@ _ESCALATION_INTRO = (
 def test_recall_escalation_justext():
     "the recall escalation also tries justext, which reaches content the rule-based retry \
     cannot: 'sidebar'-classed divs are discarded by both the main extractor/recall retry \
-    (OVERALL_DISCARD_XPATH) and readability (unlikelyCandidatesRe), but justext classifies \
+    (OVERALL_DISCARD_MATCHERS) and readability (unlikelyCandidatesRe), but justext classifies \
     them on paragraph density alone and keeps them."
     real_config = use_config()
     messages = "".join(
@@ -2516,6 +3092,30 @@ def test_recall_escalation_justext():
     assert result.count("Message number") == 8
 
 
+def test_recall_escalation_reuses_external_results():
+    "the recall retry sees the same input as the comparison with external extractors: \
+    it reuses their results instead of running readability and justext again."
+    from trafilatura import external
+
+    real_config = use_config()
+    messages = "".join(
+        f"<div class='sidebar'>Message number {i} contains substantial discussion content with "
+        "plenty of genuine words and enough length to be recognized as real text by a paragraph "
+        f"density classifier, not boilerplate at all today, said the author.</div>"
+        for i in range(8)
+    )
+    doc = f"<html><body>{_ESCALATION_INTRO}{messages}</body></html>"
+    with (
+        patch.object(external, "try_readability", wraps=try_readability) as readability,
+        patch.object(external, "try_justext", wraps=try_justext) as justext,
+    ):
+        result = bare_extraction(doc, config=real_config)
+    assert result.stats.branch == "escalation_justext"
+    assert readability.call_count == 1
+    # the justext candidate of the escalation runs on the raw tree: nothing to reuse
+    assert justext.call_count == 1
+
+
 _DFP_JSONLD = (
     '<script type="application/ld+json">{"@context":"https://schema.org",'
     '"@type":"DiscussionForumPosting","headline":"Test thread"}</script>'
@@ -2598,7 +3198,7 @@ def test_dfp_long_opening_post_keeps_replies():
 
 
 def test_dfp_precision_keeps_posts():
-    "regression (review round 3): precision mode pruned REMOVE_COMMENTS_XPATH from the very \
+    "regression (review round 3): precision mode pruned REMOVE_COMMENTS_MATCHERS from the very \
     tree the forum re-route had just restored the posts into, and precision closes the \
     stage-3/4 rescues, so a DFP page returned no posts at all."
     real_config = use_config()
@@ -2622,8 +3222,8 @@ def test_recall_escalation_blog_comment_leak(fast):
 
 def test_escalation_retry_no_comment_capture():
     "regression (review round 3): the stage-4 retry re-ran extract_comments although the \
-    caller discards the retry's comments triple -- a container matching COMMENTS_XPATH but \
-    not REMOVE_COMMENTS_XPATH had its text captured and deleted inside the retry, so it \
+    caller discards the retry's comments triple -- a container matching COMMENTS_MATCHERS but \
+    not REMOVE_COMMENTS_MATCHERS had its text captured and deleted inside the retry, so it \
     vanished from both channels. The retry must not capture comments at all."
     real_config = use_config()
     intro = "".join(f"<li>Point number {i} of the short visible article summary text here.</li>" for i in range(4))
@@ -2665,7 +3265,7 @@ def test_main_pass_excludes_comments_when_disabled():
 
 def test_main_pass_excludes_details_wrapped_comments():  # 850
     "regression (#850): comment containers wrapped in <details> must also be pruned when \
-    include_comments=False -- REMOVE_COMMENTS_XPATH matched only div/list/section, so a \
+    include_comments=False -- REMOVE_COMMENTS_MATCHERS matched only div/list/section, so a \
     <details id='comments'> thread leaked into the body outside precision mode. A <details> \
     without a comment id/class must be kept (no over-pruning)."
     real_config = use_config()
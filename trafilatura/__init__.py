@@ -13,6 +13,7 @@ __version__ = "2.2.0"
 import logging
 
 from .baseline import baseline, html2txt
+from .batch import extract_many
 from .core import bare_extraction, extract, extract_with_metadata
 from .downloads import fetch_response, fetch_url
 from .metadata import extract_metadata
@@ -24,6 +25,7 @@ __all__ = [
     "bare_extraction",
     "baseline",
     "extract",
+    "extract_many",
     "extract_metadata",
     "extract_with_metadata",
     "fetch_response",
@@ -0,0 +1,162 @@
+"""
+Asynchronous front-end: coroutines to download and extract documents
+with bounded concurrency, for use in asyncio applications.
+"""
+
+import asyncio
+import logging
+from collections.abc import AsyncIterator, Iterable
+from concurrent.futures import Executor
+from configparser import ConfigParser
+from contextlib import asynccontextmanager
+from functools import partial
+from urllib.parse import urlsplit
+
+from .core import extract_document
+from .downloads import _is_suitable_response, fetch_response
+from .settings import DEFAULT_CONFIG, PARALLEL_CORES, DocumentContext, Extractor
+from .utils import HtmlInput, Response
+
+LOGGER = logging.getLogger(__name__)
+
+# default bounds on the requests in flight, overall and per host (politeness)
+MAX_CONCURRENCY = 4 * PARALLEL_CORES
+MAX_PER_HOST = 2
+
+
+class ConcurrencyLimiter:
+    "Bound the number of concurrent operations, overall and per host."
+
+    __slots__ = ["_hosts", "_total", "per_host"]
+
+    def __init__(self, total: int = MAX_CONCURRENCY, per_host: int = MAX_PER_HOST) -> None:
+        self._total = asyncio.Semaphore(total)
+        # host -> (semaphore, number of tasks holding or awaiting it), pruned when unused
+        self._hosts: dict[str, tuple[asyncio.Semaphore, int]] = {}
+        self.per_host: int = per_host
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        "Wait for a free slot for the host of the URL, then for a global one."
+        host = urlsplit(url).netloc
+        semaphore, users = self._hosts.get(host, (asyncio.Semaphore(self.per_host), 0))
+        self._hosts[host] = (semaphore, users + 1)
+        try:
+            # host first: a busy host should not hold global slots while waiting
+            async with semaphore, self._total:
+                yield
+        finally:
+            semaphore, users = self._hosts[host]
+            if users > 1:
+                self._hosts[host] = (semaphore, users - 1)
+            else:
+                del self._hosts[host]
+
+
+async def fetch_async(
+    url: str,
+    *,
+    decode: bool = False,
+    no_ssl: bool = False,
+    with_headers: bool = False,
+    config: ConfigParser = DEFAULT_CONFIG,
+    limiter: ConcurrencyLimiter | None = None,
+) -> Response | None:
+    """Download a web page without blocking the event loop, see fetch_response().
+
+    Args:
+        url: URL of the page to fetch.
+        decode: Use html attribute to decode the data (boolean).
+        no_ssl: Don't try to establish a secure connection (to prevent SSLError).
+        with_headers: Keep track of the response headers.
+        config: Pass configuration values for output control.
+        limiter: Share bounds on concurrent downloads between calls.
+
+    Returns:
+        Response object or None in case of failed downloads and invalid results.
+    """
+    fetch = partial(fetch_response, url, decode=decode, no_ssl=no_ssl, with_headers=with_headers, config=config)
+    if limiter is None:
+        return await asyncio.to_thread(fetch)
+    async with limiter.slot(url):
+        return await asyncio.to_thread(fetch)
+
+
+async def extract_async(
+    filecontent: HtmlInput,
+    url: str | None = None,
+    *,
+    options: Extractor | None = None,
+    context: DocumentContext | None = None,
+    executor: Executor | None = None,
+) -> str | None:
+    """Extract a document in an executor without blocking the event loop, see extract().
+
+    Args:
+        filecontent: HTML code as string or bytes, or a download response.
+        url: URL of the webpage.
+        options: Extraction options shared between documents, the URL being set per document.
+        context: Per-document information (URL, source, reference date, declared encoding),
+            replaces the url argument.
+        executor: Thread or process pool to run the extraction in,
+            the default executor of the event loop if None.
+
+    Returns:
+        A string in the desired format or None.
+    """
+    loop = asyncio.get_running_loop()
+    task = partial(extract_document, filecontent, options or Extractor(), context or DocumentContext(url=url))
+    return await loop.run_in_executor(executor, task)
+
+
+async def fetch_and_extract(
+    urls: Iterable[str],
+    options: Extractor | None = None,
+    *,
+    concurrency: int = MAX_CONCURRENCY,
+    per_host: int = MAX_PER_HOST,
+    executor: Executor | None = None,
+) -> AsyncIterator[tuple[str, str | None]]:
+    """Download and extract a series of web pages, yielding results as they are ready.
+
+    Args:
+        urls: URLs to process, consumed as processing capacity becomes available.
+        options: Extraction options shared between documents, the URL being set per document.
+        concurrency: Maximum number of downloads in flight.
+        per_host: Maximum number of downloads in flight for a given host.
+        executor: Thread or process pool for the extraction,
+            the default executor of the event loop if None.
+
+    Returns:
+        An asynchronous generator of (URL, extracted text or None) tuples.
+    """
+    options = (options or Extractor()).freeze()
+    limiter = ConcurrencyLimiter(concurrency, per_host)
+
+    async def process(url: str) -> tuple[str, str | None]:
+        try:
+            response = await fetch_async(url, config=options.config, limiter=limiter)
+            if response is None or not response.data or not _is_suitable_response(url, response, options):
+                return url, None
+            # the charset declared in the headers and the URL after redirects
+            context = DocumentContext(url=response.url, encoding=response.charset())
+            return url, await extract_async(response.data, options=options, context=context, executor=executor)
+        except Exception as err:
+            LOGGER.error("processing failed: %s %s", url, err)
+            return url, None
+
+    # backpressure: only a bounded number of URLs is taken from the input at a time
+    queue = iter(urls)
+    pending: set[asyncio.Task[tuple[str, str | None]]] = set()
+    try:
+        while True:
+            while len(pending) < 2 * concurrency and (url := next(queue, None)) is not None:
+                pending.add(asyncio.create_task(process(url)))
+            if not pending:
+                break
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
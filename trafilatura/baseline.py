@@ -5,7 +5,7 @@ Module regrouping baseline and basic extraction functions.
 
 import json
 import re
-from collections.abc import Iterable
+from collections.abc import Iterable, Iterator
 from copy import copy
 from html import unescape
 from typing import Any
@@ -13,7 +13,10 @@ from typing import Any
 from lxml.etree import Element, SubElement, _Element
 from lxml.html import HtmlElement, fragment_fromstring
 
-from .settings import BASIC_CLEAN_XPATH, DEDUPE_SCAN_CAP, MIN_DUPLICATE_LENGTH
+from .deduplication import TextIndex
+from .htmlprocessing import AttributeIndex
+from .json_metadata import load_json
+from .settings import BASIC_CLEAN_MATCHERS, MIN_DUPLICATE_LENGTH
 from .utils import HtmlInput, as_list, load_html, remove_control_characters, trim
 from .xml import delete_element
 
@@ -31,7 +34,7 @@ _HTML_MARKUP = re.compile(rf"</({_HTML_TAG_NAMES})>|<({_HTML_TAG_NAMES})(\s[^<>]
 
 def basic_cleaning(tree: HtmlElement) -> HtmlElement:
     "Remove a few section types from the document."
-    for elem in BASIC_CLEAN_XPATH(tree):
+    for elem in AttributeIndex(tree).select(BASIC_CLEAN_MATCHERS):
         delete_element(elem)
     return tree
 
@@ -129,17 +132,17 @@ def _build_body(texts: Iterable[str], dedupe: bool = False) -> tuple[_Element, s
     "Wrap one paragraph per text in a fresh body element, optionally dropping repeated content."
     postbody = Element("body")
     temp_text = ""
+    seen = TextIndex()
     for text in texts:
         # strip control chars lxml rejects in .text (element inputs skip load_html's cleaning)
         text = remove_control_characters(text)
         # keep short paragraphs (<= MIN_DUPLICATE_LENGTH) even if they recur -- only long substring
-        # repeats (e.g. a <p> nested in its <blockquote>) are artifacts. Scan capped at
-        # DEDUPE_SCAN_CAP; newline-joined (trimmed text has none) so no match spans two paragraphs
-        if text and (
-            not dedupe or len(text) <= MIN_DUPLICATE_LENGTH or len(temp_text) > DEDUPE_SCAN_CAP or text not in temp_text
-        ):
+        # repeats of one paragraph (e.g. a <p> nested in its <blockquote>) are artifacts
+        if text and (not dedupe or len(text) <= MIN_DUPLICATE_LENGTH or text not in seen):
             SubElement(postbody, "p").text = text
             temp_text += "\n" + text if temp_text else text
+            if dedupe:
+                seen.add(text)
     return postbody, temp_text
 
 
@@ -156,8 +159,8 @@ def _collect_json_content(tree: HtmlElement) -> tuple[list[str], list[str]]:
     for elem in tree.iterfind('.//script[@type="application/ld+json"]'):
         if elem.text and _JSON_HOOKS_RE.search(elem.text):
             try:
-                # strict=False: real pages carry raw newlines/tabs inside JSON strings
-                _walk_json(json.loads(elem.text, strict=False), bodies, teasers)
+                # control characters tolerated: real pages carry raw newlines/tabs inside JSON strings
+                _walk_json(load_json(elem.text), bodies, teasers)
             except Exception:  # JSONDecodeError
                 continue
     # Discourse forums render posts client-side but embed them as JSON in an attribute
@@ -277,6 +280,67 @@ _BLOCK_ELEMS = {
 }
 
 
+def _spaced_text(body: HtmlElement, deleted: set[HtmlElement]) -> Iterator[str]:
+    """Text of the element as html2txt() returns it before normalizing the whitespace,
+    without modifying the element: the deleted elements are skipped, their tail
+    joined to the previous element or parent (see delete_element()), and spaces
+    are put at the boundaries of block-level elements."""
+    # explicit stack instead of iterwalk(), which leaves out comments and their tail
+    yield from _opening_text(body)
+    stack = [(body, iter(body))]
+    while stack:
+        elem, children = stack[-1]
+        child = next(children, None)
+        if child is None:
+            stack.pop()
+            if elem is not body:
+                yield from _closing_text(elem)
+        elif child in deleted:
+            if child.tail:
+                host = next((e for e in child.itersiblings(preceding=True) if e not in deleted), elem)
+                yield remove_control_characters(child.tail) if host.tag in _BLOCK_ELEMS else child.tail
+        # comments and processing instructions only contribute their tail
+        elif not isinstance(child.tag, str):
+            if child.tail:
+                yield child.tail
+        else:
+            yield from _opening_text(child)
+            stack.append((child, iter(child)))
+
+
+def _opening_text(elem: HtmlElement) -> Iterator[str]:
+    "Text at the start of an element in html2txt(), see _spaced_text()."
+    if elem.tag in _BLOCK_ELEMS:
+        yield " "
+        if elem.text:
+            yield remove_control_characters(elem.text)
+    elif elem.text:
+        yield elem.text
+
+
+def _closing_text(elem: HtmlElement) -> Iterator[str]:
+    "Text after the end of an element in html2txt(), see _spaced_text()."
+    if elem.tag in _BLOCK_ELEMS:
+        yield " "
+        if elem.tail:
+            yield remove_control_characters(elem.tail)
+    elif elem.tail:
+        yield elem.tail
+
+
+def html2txt_length(index: AttributeIndex) -> int:
+    """Length of the text html2txt() returns for the tree of the attribute index,
+    which is left untouched (no copy needed)."""
+    body = index.tree.find(".//body")
+    if body is None:
+        body = index.tree
+    # the elements found outside of the body are never reached by the walk
+    deleted = set(index.select(BASIC_CLEAN_MATCHERS))
+    deleted.discard(body)
+    text = "".join(_spaced_text(body, deleted))
+    return len(" ".join(text.split()))
+
+
 def html2txt(content: HtmlInput, clean: bool = True) -> str:
     """Run basic html2txt on a document.
 
@@ -0,0 +1,146 @@
+"""
+Batch extraction on a pool of worker processes.
+"""
+
+import logging
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from .core import extract_document
+from .external import jt_stoplist_init
+from .settings import PARALLEL_CORES, DocumentContext, Extractor
+from .utils import HtmlInput
+
+LOGGER = logging.getLogger(__name__)
+
+# how many chunks each worker may have queued: enough to keep it busy, low enough to stream
+CHUNKS_PER_WORKER = 2
+
+# set once per worker process by _init_worker
+_WORKER_OPTIONS: Extractor | None = None
+
+
+class BatchResult:
+    "Outcome of the extraction of one item of a batch."
+
+    __slots__ = ["error", "index", "result", "url"]
+
+    def __init__(self, index: int, url: str | None, result: str | None = None, error: str | None = None) -> None:
+        self.index: int = index
+        self.url: str | None = url
+        self.result: str | None = result
+        self.error: str | None = error
+
+    def __repr__(self) -> str:
+        return f"BatchResult(index={self.index}, url={self.url!r}, error={self.error!r})"
+
+
+_Chunk = list[tuple[int, HtmlInput, str | None]]
+_Task = tuple[Future[list[BatchResult]], _Chunk, ProcessPoolExecutor]
+
+
+def _init_worker(options: Extractor) -> None:
+    "Keep the options in the worker process and load costly resources once."
+    global _WORKER_OPTIONS
+    _WORKER_OPTIONS = options
+    # justext stoplists are otherwise loaded by the first document needing a fallback
+    if not options.fast:
+        jt_stoplist_init()
+
+
+def _extract_item(options: Extractor, index: int, htmlstring: HtmlInput, url: str | None) -> BatchResult:
+    "Extract a single item, reporting errors instead of raising them."
+    try:
+        return BatchResult(index, url, result=extract_document(htmlstring, options, DocumentContext(url=url)))
+    except Exception as err:
+        LOGGER.warning("batch item %s failed: %s %s", index, err, url)
+        return BatchResult(index, url, error=f"{type(err).__name__}: {err}")
+
+
+def _extract_chunk(chunk: _Chunk) -> list[BatchResult]:
+    "Worker entry point: extract a chunk of items with the options of the process."
+    if _WORKER_OPTIONS is None:  # pragma: no cover
+        raise RuntimeError("worker not initialized")
+    return [_extract_item(_WORKER_OPTIONS, index, htmlstring, url) for index, htmlstring, url in chunk]
+
+
+def _chunk_failed(chunk: _Chunk, err: BaseException) -> list[BatchResult]:
+    "Report all items of a chunk as failed."
+    LOGGER.error("batch chunk failed: %s", err)
+    return [BatchResult(index, url, error=f"{type(err).__name__}: {err}") for index, _, url in chunk]
+
+
+def extract_many(
+    inputs: Iterable[tuple[HtmlInput, str | None]],
+    options: Extractor | None = None,
+    workers: int = PARALLEL_CORES,
+    ordered: bool = False,
+    chunksize: int = 1,
+) -> Iterator[BatchResult]:
+    """Extract a series of documents on a pool of warm worker processes.
+
+    Args:
+        inputs: Iterable of (HTML document, URL or None) tuples, consumed lazily.
+        options: Extractor object shared by all documents (frozen copy), the URL being set per document.
+        workers: Number of worker processes, 1 or less to run in the current process.
+        ordered: Yield results in input order instead of as soon as they are ready.
+        chunksize: Number of documents sent to a worker at once.
+
+    Returns:
+        A generator of BatchResult objects (index in the input, URL, extracted text
+        or None, error message if the extraction raised an exception).
+    """
+    # immutable: shared by the documents processed in this process, sent once to each worker
+    options = (options or Extractor()).freeze()
+    chunksize = max(chunksize, 1)
+    items = ((index, htmlstring, url) for index, (htmlstring, url) in enumerate(inputs))
+
+    if workers <= 1:
+        for index, htmlstring, url in items:
+            yield _extract_item(options, index, htmlstring, url)
+        return
+
+    def new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(options,))
+
+    # the options are sent once per process instead of once per task
+    executor = new_pool()
+    pending: deque[_Task] = deque()
+    max_pending = workers * CHUNKS_PER_WORKER
+
+    def fill() -> None:
+        while len(pending) < max_pending and (chunk := list(islice(items, chunksize))):
+            pending.append((executor.submit(_extract_chunk, chunk), chunk, executor))
+
+    def collect(task: _Task) -> list[BatchResult]:
+        nonlocal executor
+        future, chunk, pool = task
+        try:
+            return future.result()
+        except BrokenProcessPool as err:
+            # a worker died: the pool cannot be used anymore, start a fresh one for the rest
+            # (chunks still queued on the broken pool fail along with this one)
+            if pool is executor:
+                executor.shutdown(wait=False, cancel_futures=True)
+                executor = new_pool()
+            return _chunk_failed(chunk, err)
+        except Exception as err:
+            return _chunk_failed(chunk, err)
+
+    try:
+        fill()
+        while pending:
+            if ordered:
+                results = collect(pending.popleft())
+            else:
+                wait([task[0] for task in pending], return_when=FIRST_COMPLETED)
+                done = next(task for task in pending if task[0].done())
+                pending.remove(done)
+                results = collect(done)
+            fill()
+            yield from results
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,285 @@
+"""
+Content-addressed cache of extraction results: an in-memory LRU tier
+and an optional on-disk tier (SQLite), both bounded in size.
+Persistent store of the text segments seen by the deduplication.
+"""
+
+import logging
+import sqlite3
+from collections import OrderedDict
+from hashlib import blake2b
+from pathlib import Path
+from threading import RLock
+from time import time
+from typing import TYPE_CHECKING, Any, Protocol
+
+from . import __version__
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .settings import Extractor
+    from .utils import HtmlInput
+
+LOGGER = logging.getLogger(__name__)
+
+CACHE_MEMORY_SIZE = 2**26  # 64 MiB of serialized results
+CACHE_DISK_SIZE = 2**30  # 1 GiB
+CACHE_FILENAME = "results.sqlite"
+SEGMENT_STORE_SIZE = 2**20  # entries
+SEGMENT_DIGEST_SIZE = 16
+
+
+def segment_digest(segment: str) -> bytes:
+    "Fixed-size key standing for a text segment in the stores of the deduplication."
+    return blake2b(segment.encode("utf-8", "surrogatepass"), digest_size=SEGMENT_DIGEST_SIZE).digest()
+
+
+def cache_key(filecontent: "HtmlInput", options: "Extractor", *extra: Any) -> str | None:
+    """Derive a cache key from the raw input, the options and further parameters.
+    Returns None if the result cannot be cached: parsed trees or response objects
+    as input, deduplication or site profiles (depend on the documents seen before) or tracing."""
+    if options.dedup or options.simhash_index is not None or options.profiles is not None or options.trace:
+        return None
+    if isinstance(filecontent, bytes):
+        data, kind = filecontent, b"b"
+    elif isinstance(filecontent, str):
+        data, kind = filecontent.encode("utf-8", "surrogatepass"), b"s"
+    else:
+        return None
+    digest = blake2b(digest_size=20)
+    # per-document fields are not part of the options fingerprint
+    max_date = options.date_params.get("max_date") if options.with_metadata else None
+    digest.update(repr((__version__, options.fingerprint(), options.url, options.encoding, max_date, extra)).encode("utf-8"))
+    digest.update(kind)
+    digest.update(data)
+    return digest.hexdigest()
+
+
+class ResultCache:
+    """Store serialized extraction results under content-addressed keys.
+    Recently used entries are kept in memory, all entries are written to disk
+    if a directory is given; the least recently used ones are evicted
+    once a tier exceeds its size limit (in bytes)."""
+
+    __slots__ = [
+        "_db",
+        "_lock",
+        "_memory",
+        "_memory_used",
+        "_unchecked",
+        "directory",
+        "disk_size",
+        "hits",
+        "memory_size",
+        "misses",
+    ]
+
+    def __init__(
+        self, directory: str | None = None, memory_size: int = CACHE_MEMORY_SIZE, disk_size: int = CACHE_DISK_SIZE
+    ) -> None:
+        self.directory: str | None = directory
+        self.memory_size: int = memory_size
+        self.disk_size: int = disk_size
+        self.hits: int = 0
+        self.misses: int = 0
+        self._lock = RLock()
+        self._memory: OrderedDict[str, bytes] = OrderedDict()
+        self._memory_used: int = 0
+        # opened on first use, so that the cache can be sent to worker processes
+        self._db: sqlite3.Connection | None = None
+        # bytes written since the size of the disk tier was last checked, checked on first write
+        self._unchecked: int = disk_size
+
+    def __reduce__(self) -> tuple[type["ResultCache"], tuple[str | None, int, int]]:
+        # settings only: each process keeps its own memory tier and database connection
+        return (self.__class__, (self.directory, self.memory_size, self.disk_size))
+
+    def _connect(self) -> sqlite3.Connection | None:
+        "Open the database of the disk tier if there is one."
+        if self._db is None and self.directory is not None:
+            path = Path(self.directory).expanduser()
+            path.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path / CACHE_FILENAME, timeout=60, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, atime REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_atime ON results (atime)")
+        return self._db
+
+    def _remember(self, key: str, value: bytes) -> None:
+        "Put an entry in the memory tier and evict the least recently used ones if necessary."
+        previous = self._memory.pop(key, None)
+        if previous is not None:
+            self._memory_used -= len(previous)
+        if len(value) > self.memory_size:
+            return
+        self._memory[key] = value
+        self._memory_used += len(value)
+        while self._memory_used > self.memory_size:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_used -= len(evicted)
+
+    def _evict_disk(self, db: sqlite3.Connection) -> None:
+        "Delete the least recently used entries until the disk tier is 10% below its size limit."
+        (used,) = db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()
+        target = self.disk_size * 0.9
+        while used > target:
+            rows = db.execute("SELECT key, size FROM results ORDER BY atime LIMIT 256").fetchall()
+            if not rows:
+                break
+            db.executemany("DELETE FROM results WHERE key = ?", [(key,) for key, _ in rows])
+            used -= sum(size for _, size in rows)
+
+    def get(self, key: str) -> bytes | None:
+        "Return the value stored under the key or None."
+        with self._lock:
+            value = self._memory.get(key)
+            if value is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return value
+            db = self._connect()
+            if db is not None:
+                try:
+                    row = db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        db.execute("UPDATE results SET atime = ? WHERE key = ?", (time(), key))
+                except sqlite3.Error as err:
+                    LOGGER.warning("cache read failed: %s", err)
+                    row = None
+                if row is not None:
+                    value = bytes(row[0])
+                    self._remember(key, value)
+                    self.hits += 1
+                    return value
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: bytes) -> None:
+        "Store a value in both tiers."
+        with self._lock:
+            self._remember(key, value)
+            db = self._connect()
+            if db is not None:
+                try:
+                    db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, value, len(value), time()))
+                    # summing the sizes costs a table scan: only check every 1/16 of the limit
+                    self._unchecked += len(value)
+                    if self._unchecked > self.disk_size // 16:
+                        self._unchecked = 0
+                        self._evict_disk(db)
+                except sqlite3.Error as err:  # e.g. disk full or database locked for too long
+                    LOGGER.warning("cache write failed: %s", err)
+
+    def clear(self) -> None:
+        "Delete all entries, in memory and on disk."
+        with self._lock:
+            self._memory.clear()
+            self._memory_used = 0
+            db = self._connect()
+            if db is not None:
+                db.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        "Close the database connection, it is reopened if the cache is used again."
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+class SegmentCounter(Protocol):
+    "Interface of the stores used by the deduplication, see deduplication.LRUCache and SegmentStore."
+
+    def increment(self, key: str) -> int:
+        "Count one more occurrence of the key and return the number of previous ones."
+
+    def clear(self) -> None:
+        "Delete all entries."
+
+
+class SegmentStore:
+    """Count the text segments seen by the deduplication in a SQLite database,
+    so that processes working with the same file share them and that they are
+    kept between runs. Segments are stored as digests. As in memory, the least
+    recently seen ones are forgotten beyond maxsize entries."""
+
+    __slots__ = ["_db", "_lock", "maxsize", "path"]
+
+    def __init__(self, path: str, maxsize: int = SEGMENT_STORE_SIZE) -> None:
+        self.path: str = path
+        self.maxsize: int = maxsize
+        self._lock = RLock()
+        # opened on first use, so that the store can be sent to worker processes
+        self._db: sqlite3.Connection | None = None
+
+    def __reduce__(self) -> tuple[type["SegmentStore"], tuple[str, int]]:
+        # each process opens its own connection
+        return (self.__class__, (self.path, self.maxsize))
+
+    def _connect(self) -> sqlite3.Connection:
+        "Open the database and create the tables if necessary."
+        if self._db is None:
+            path = Path(self.path).expanduser()
+            path.parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS segments (key BLOB PRIMARY KEY, count INTEGER NOT NULL, used INTEGER NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS segments_used ON segments (used)")
+            # number of entries and logical clock, kept up to date to avoid counting rows
+            self._db.execute("CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._db.execute("INSERT OR IGNORE INTO state VALUES ('entries', 0), ('clock', 0)")
+        return self._db
+
+    def increment(self, key: str) -> int:
+        "Count one more occurrence of the key and return the number of previous ones."
+        digest = segment_digest(key)
+        with self._lock:
+            db = self._connect()
+            try:
+                # write lock from the start: the other processes wait instead of losing counts
+                db.execute("BEGIN IMMEDIATE")
+                clock = self._bump(db, "clock")
+                row = db.execute("SELECT count FROM segments WHERE key = ?", (digest,)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE segments SET count = count + 1, used = ? WHERE key = ?", (clock, digest))
+                else:
+                    db.execute("INSERT INTO segments VALUES (?, 1, ?)", (digest, clock))
+                    if self._bump(db, "entries") > self.maxsize:
+                        db.execute("DELETE FROM segments WHERE used = (SELECT MIN(used) FROM segments)")
+                        db.execute("UPDATE state SET value = value - 1 WHERE name = 'entries'")
+                db.execute("COMMIT")
+            except sqlite3.Error as err:  # e.g. disk full or database locked for too long
+                LOGGER.warning("segment store update failed: %s", err)
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                return 0
+            return int(row[0]) if row is not None else 0
+
+    @staticmethod
+    def _bump(db: sqlite3.Connection, name: str) -> int:
+        "Increment a state value within the current transaction and return it."
+        # no UPDATE ... RETURNING: it requires SQLite 3.35
+        db.execute("UPDATE state SET value = value + 1 WHERE name = ?", (name,))
+        (value,) = db.execute("SELECT value FROM state WHERE name = ?", (name,)).fetchone()
+        return int(value)
+
+    def clear(self) -> None:
+        "Delete all entries."
+        with self._lock:
+            db = self._connect()
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("DELETE FROM segments")
+            db.execute("UPDATE state SET value = 0")
+            db.execute("COMMIT")
+
+    def close(self) -> None:
+        "Close the database connection, it is reopened if the store is used again."
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
@@ -19,11 +19,12 @@ from .cli_utils import (
     url_processing_pipeline,
     write_result,
 )
-from .settings import PARALLEL_CORES, SUPPORTED_FMT_CLI
+from .settings import PARALLEL_CORES, SUPPORTED_FMT_CLI, args_to_extractor
 
 # options that --list neither downloads nor extracts, hence ignores
 _LIST_IGNORED_OPTS = {
     "fast",
+    "auto_fast",
     "formatting",
     "precision",
     "recall",
@@ -31,12 +32,18 @@ _LIST_IGNORED_OPTS = {
     "links",
     "with_metadata",
     "only_with_metadata",
+    "metadata_only",
     "comments",
     "tables",
     "deduplicate",
+    "dedup_store",
+    "simhash_index",
     "output_format",
     "archived",
     "backup_dir",
+    "trace",
+    "cache_dir",
+    "site_profiles",
 }
 
 # fix output encoding on some systems
@@ -74,6 +81,15 @@ def add_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
     group2.add_argument("-o", "--output-dir", help="write results in a specified directory (relative path)", type=str)
     group2.add_argument("--backup-dir", help="preserve a copy of downloaded files in a backup directory", type=str)
     group2.add_argument("--keep-dirs", help="keep input directory structure and file names", action="store_true")
+    group2.add_argument("--trace", help="append per-document extraction traces to a file (JSON lines)", type=str)
+    group2.add_argument(
+        "--cache-dir", help="reuse extraction results stored in a directory for identical inputs and settings", type=str
+    )
+    group2.add_argument(
+        "--site-profiles",
+        help="learn how the content and metadata are found on each website to find them faster, kept in a file",
+        type=str,
+    )
 
     group3_ex.add_argument(
         "--feed",
@@ -126,6 +142,9 @@ def add_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
     #                    action="store_true")
 
     group4.add_argument("-f", "--fast", help="fast (without fallback detection)", action="store_true")
+    group4.add_argument(
+        "--auto-fast", help="skip fallback detection where it is unlikely to change the result", action="store_true"
+    )
     group4.add_argument("--formatting", help="include text formatting (bold, italic, etc.)", action="store_true", default=None)
     group4.add_argument("--links", help="include links along with their targets", action="store_true")
     group4.add_argument("--images", help="include image sources in output", action="store_true")
@@ -137,8 +156,19 @@ def add_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser:
         action="store_true",
     )
     group4.add_argument("--with-metadata", help="extract and add metadata to the output", action="store_true")
+    group4.add_argument(
+        "--metadata-only",
+        help="only extract metadata, parsing the document head where possible (JSON output)",
+        action="store_true",
+    )
     group4.add_argument("--target-language", help="select a target language (ISO 639-1 codes)", type=str)
     group4.add_argument("--deduplicate", help="filter out duplicate documents and sections", action="store_true")
+    group4.add_argument(
+        "--dedup-store", help="count the sections seen by --deduplicate in a file, shared by processes and runs", type=str
+    )
+    group4.add_argument(
+        "--simhash-index", help="discard documents nearly identical to one seen before, kept in a file", type=str
+    )
     group4.add_argument("--config-file", help="override standard extraction parameters with a custom config file", type=str)
     group4.add_argument("--precision", help="favor extraction precision (less noise, possibly less text)", action="store_true")
     group4.add_argument("--recall", help="favor extraction recall (more text, possibly more noise)", action="store_true")
@@ -174,6 +204,9 @@ def _validate_args(parser: argparse.ArgumentParser, args: argparse.Namespace) ->
     "Catch cross-group incompatibilities that argparse cannot express."
     if args.keep_dirs and not args.output_dir:
         parser.error("--keep-dirs requires an output directory (-o/--output-dir)")
+    # worker processes would each get a copy of the index: near-duplicates across them go unnoticed
+    if args.simhash_index and args.input_dir and args.parallel > 1:
+        parser.error("--simhash-index requires --parallel 1 with --input-dir")
     if args.list:
         ignored = sorted(o for o in _LIST_IGNORED_OPTS if getattr(args, o) != parser.get_default(o))
         if ignored:
@@ -197,6 +230,8 @@ def map_args(args: argparse.Namespace) -> argparse.Namespace:
         if getattr(args, otype):
             args.output_format = otype
             break
+    if args.metadata_only:
+        args.output_format = "json"
     return args
 
 
@@ -241,8 +276,13 @@ def process_args(args: argparse.Namespace) -> None:
 
     # read input on STDIN directly
     else:
-        result = examine(sys.stdin.buffer.read(), args, url=args.URL)
+        options = args_to_extractor(args, args.URL)
+        result = examine(sys.stdin.buffer.read(), args, url=args.URL, options=options)
         write_result(result, args)
+        if options.profiles is not None:
+            options.profiles.save()
+        if options.simhash_index is not None:
+            options.simhash_index.save()
 
     # change exit code if there are errors
     if exit_code != 0:
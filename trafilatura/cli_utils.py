@@ -10,6 +10,7 @@ except ImportError:
     HAS_GZIP = False
 
 import argparse
+import json
 import logging
 import os
 import random
@@ -23,6 +24,7 @@ from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_compl
 from datetime import datetime
 from functools import partial
 from pathlib import Path
+from tempfile import TemporaryDirectory
 from threading import RLock
 
 from courlan import UrlStore, extract_domain, get_base_url  # validate_url
@@ -30,14 +32,18 @@ from courlan import UrlStore, extract_domain, get_base_url  # validate_url
 from trafilatura import spider
 
 from .baseline import html2txt
-from .core import extract
+from .cache import SegmentStore
+from .core import _internal_extraction, extract
 from .deduplication import generate_bow_hash
 from .downloads import add_to_compressed_dict, buffered_downloads, buffered_response_downloads, load_download_buffer
 from .feeds import find_feed_urls
 from .meta import reset_caches
+from .metadata import extract_metadata
 from .settings import (
     FILENAME_LEN,
     MAX_FILES_PER_DIRECTORY,
+    Document,
+    DocumentContext,
     Extractor,
     args_to_extractor,
 )
@@ -50,6 +56,7 @@ from .utils import (
     language_classifier,
     make_chunks,
 )
+from .xml import build_json_output
 
 LOGGER = logging.getLogger(__name__)
 
@@ -208,6 +215,16 @@ def write_result(
                 outputfile.write(result)
 
 
+def write_trace(document: Document | None, options: Extractor, filename: str) -> None:
+    "Append the extraction trace of a document to a file (one JSON object per line)."
+    if document is None or document.stats is None:
+        return
+    record = {"source": options.source, **document.stats.as_dict()}
+    # a single append per line so that parallel workers can share the file
+    with Path(filename).open(mode="a", encoding="utf-8") as tracefile:
+        tracefile.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
 def generate_filelist(inputdir: str) -> Generator[str, None, None]:
     "Walk the directory tree and output all file names."
     # os.walk does not follow directory symlinks, unlike rglob on Python < 3.13
@@ -216,29 +233,40 @@ def generate_filelist(inputdir: str) -> Generator[str, None, None]:
             yield os.path.join(root, filename)
 
 
-def file_processing(filename: str, args: argparse.Namespace, counter: int = -1, options: Extractor | None = None) -> None:
-    "Aggregated functions to process a file in a list."
+def file_processing(
+    filename: str, args: argparse.Namespace, counter: int = -1, options: Extractor | None = None
+) -> dict[str, dict[str, dict[str, int]]] | None:
+    """Aggregated functions to process a file in a list.
+    Return what the site profiles learned on the way, if any, to send it back from a worker process."""
     if not options:
-        options = args_to_extractor(args)
-    options.source = filename
+        options = args_to_extractor(args).freeze()
 
     with Path(filename).open("rb") as inputf:
         htmlstring = inputf.read()
 
     file_stat = Path(filename).stat()
     ref_timestamp = min(file_stat.st_ctime, file_stat.st_mtime)
-    options.date_params["max_date"] = datetime.fromtimestamp(ref_timestamp).astimezone().strftime("%Y-%m-%d")
+    context = DocumentContext(
+        source=filename, max_date=datetime.fromtimestamp(ref_timestamp).astimezone().strftime("%Y-%m-%d")
+    )
 
-    result = examine(htmlstring, args, options=options)
+    result = examine(htmlstring, args, options=options, context=context)
     write_result(result, args, filename, counter, new_filename=None)
+    return options.profiles.take_recorded() if options.profiles is not None else None
 
 
-def process_result(htmlstring: str, args: argparse.Namespace, counter: int, options: Extractor | None) -> int:
+def process_result(
+    htmlstring: str,
+    args: argparse.Namespace,
+    counter: int,
+    options: Extractor | None,
+    context: DocumentContext | None = None,
+) -> int:
     "Extract text and metadata from a download webpage and eventually write out the result."
     # backup option
     fileslug = archive_html(htmlstring, args, counter) if args.backup_dir else ""
     # process
-    result = examine(htmlstring, args, options=options)
+    result = examine(htmlstring, args, options=options, context=context)
     write_result(result, args, orig_filename=fileslug, counter=counter, new_filename=fileslug)
     # increment written file counter
     if counter >= 0 and result:
@@ -262,8 +290,7 @@ def download_queue_processing(
         for url, result in buffered_downloads(bufferlist, args.parallel, options=options):
             # handle result
             if result and isinstance(result, str):
-                options.url = url
-                counter = process_result(result, args, counter, options)
+                counter = process_result(result, args, counter, options, DocumentContext(url=url))
             else:
                 LOGGER.warning("No result for URL: %s", url)
                 errors.append(url)
@@ -399,13 +426,14 @@ def url_processing_pipeline(args: argparse.Namespace, url_store: UrlStore) -> in
         url_store.print_unvisited_urls()  # and not write_result()
         return 0  # and not sys.exit(0)
 
-    options = args_to_extractor(args)
+    options = args_to_extractor(args).freeze()
     url_count = url_store.total_url_number()
     counter = 0 if url_count > MAX_FILES_PER_DIRECTORY else -1
 
     # download strategy
     errors, counter = download_queue_processing(url_store, args, counter, options)
     LOGGER.debug("%s / %s URLs could not be found", len(errors), url_count)
+    exit_code = _define_exit_code(errors, url_count)
 
     if args.archived is True:
         url_store = UrlStore()
@@ -418,40 +446,68 @@ def url_processing_pipeline(args: argparse.Namespace, url_store: UrlStore) -> in
                 len(errors),
             )
             # pass information along if URLs are missing
-            return _define_exit_code(archived_errors, url_store.total_url_number())
+            exit_code = _define_exit_code(archived_errors, url_store.total_url_number())
 
-    return _define_exit_code(errors, url_count)
+    # what was learned during the run is kept for the next ones
+    if options.profiles is not None:
+        options.profiles.save()
+    if options.simhash_index is not None:
+        options.simhash_index.save()
+    return exit_code
 
 
 def file_processing_pipeline(args: argparse.Namespace) -> None:
     "Define batches for parallel file processing and perform the extraction."
     filecounter = -1
-    options = args_to_extractor(args)
+    options = args_to_extractor(args).freeze()
     timeout = options.config.getint("DEFAULT", "EXTRACTION_TIMEOUT")
 
     # max_tasks_per_child available in Python >= 3.11
-    with ProcessPoolExecutor(max_workers=args.parallel) as executor:
+    with TemporaryDirectory() as tmpdir, ProcessPoolExecutor(max_workers=args.parallel) as executor:
+        # the workers count the sections seen by the deduplication together, in a file for this run if none is given
+        if options.dedup and options.dedup_store is None and args.parallel > 1:
+            options = options.with_(dedup_store=SegmentStore(str(Path(tmpdir) / "segments.sqlite")))
         # chunk input: https://github.com/python/cpython/issues/74028
         for filebatch in make_chunks(generate_filelist(args.input_dir), MAX_FILES_PER_DIRECTORY):
             if filecounter < 0 and len(filebatch) >= MAX_FILES_PER_DIRECTORY:
                 filecounter = 0
             worker = partial(file_processing, args=args, counter=filecounter, options=options)
-            executor.map(worker, filebatch, chunksize=10, timeout=timeout)
+            # the simhash index is checked and extended in this process only (--parallel 1, see cli.py)
+            if options.simhash_index is not None:
+                for filename in filebatch:
+                    worker(filename)
+            elif options.profiles is not None:
+                # the workers learn on a copy of the profiles: what they recorded is added here
+                try:
+                    for recorded in executor.map(worker, filebatch, chunksize=10):
+                        options.profiles.merge(recorded or {})
+                except Exception as err:  # a failing file does not stop the run
+                    LOGGER.warning("site profiles not updated: %s", err)
+            else:
+                executor.map(worker, filebatch, chunksize=10, timeout=timeout)
             # update counter
             if filecounter >= 0:
                 filecounter += len(filebatch)
 
+    # what was learned during the run is kept for the next ones
+    if options.profiles is not None:
+        options.profiles.save()
+    if options.simhash_index is not None:
+        options.simhash_index.save()
+
 
 def examine(
     htmlstring: str | bytes | None,
     args: argparse.Namespace,
     url: str | None = None,
     options: Extractor | None = None,
+    context: DocumentContext | None = None,
 ) -> str | None:
     "Generic safeguards and triggers around extraction function."
     result = None
     if not options:
         options = args_to_extractor(args, url)
+    options = options.with_context(context)
     # safety check
     if htmlstring is None:
         sys.stderr.write("ERROR: empty document\n")
@@ -460,7 +516,21 @@ def examine(
     # proceed
     else:
         try:
-            result = extract(htmlstring, options=options)
+            if args.metadata_only:
+                metadata = extract_metadata(
+                    htmlstring,
+                    options.url,
+                    options.date_params,
+                    author_blacklist=options.author_blacklist,
+                    scope="head",
+                )
+                result = build_json_output(metadata)
+            elif args.trace:
+                document = _internal_extraction(htmlstring, options=options)
+                write_trace(document, options, args.trace)
+                result = document.text if document is not None else None
+            else:
+                result = extract(htmlstring, options=options)
         # ugly but efficient
         except Exception as err:
             sys.stderr.write(f"ERROR: {err!s}\n{traceback.format_exc()}\n")
@@ -7,26 +7,30 @@ import json
 import logging
 import re
 import warnings
+from collections.abc import Callable
 from configparser import ConfigParser
-from copy import copy
+from functools import partial
 from typing import Any
 
-from lxml.etree import Element, XPath, _Element, strip_tags
+from lxml.etree import Element, XPath, _Element, fromstring, strip_tags, tostring
 from lxml.html import HtmlElement
 
 # own
-from .baseline import baseline, html2txt
-from .deduplication import content_fingerprint, duplicate_test
-from .external import compare_extraction, justext_rescue
+from .baseline import baseline, html2txt_length
+from .cache import cache_key
+from .deduplication import Simhash, TextIndex, content_fingerprint, duplicate_test
+from .external import ExternalResults, compare_extraction, comparison_useless, justext_rescue
 from .htmlprocessing import (
+    AttributeIndex,
     build_html_output,
     convert_tags,
+    prune_matching_nodes,
     prune_unwanted_nodes,
     tree_cleaning,
 )
 from .main_extractor import _elem_text, extract_comments, extract_content
 from .metadata import Document, extract_metadata
-from .settings import DEFAULT_CONFIG, Extractor, use_config
+from .settings import DEFAULT_CONFIG, DocumentContext, ExtractionStats, Extractor, use_config
 from .utils import (
     LANGID_FLAG,
     HtmlInput,
@@ -36,7 +40,7 @@ from .utils import (
     normalize_unicode,
 )
 from .xml import build_json_output, control_xml_output, xmltocsv, xmltotxt
-from .xpaths import REMOVE_APPENDED_ARTICLES_XPATH, REMOVE_COMMENTS_XPATH
+from .xpaths import BODY_MATCHERS, REMOVE_APPENDED_ARTICLES_MATCHERS, REMOVE_COMMENTS_MATCHERS, AttributeMatchers
 
 LOGGER = logging.getLogger(__name__)
 
@@ -133,6 +137,49 @@ def determine_returnstring(document: Document, options: Extractor) -> str:
     return normalize_unicode(returnstring)
 
 
+def _dump_document(document: Document | None) -> bytes:
+    "Serialize an extraction result for the cache, trees as XML strings."
+    if document is None:
+        return b"null"
+    data = document.as_dict()
+    for field in ("body", "commentsbody"):
+        data[field] = tostring(data[field], encoding="unicode")
+    return json.dumps(data).encode("utf-8")
+
+
+def _load_document(data: bytes) -> Document | None:
+    "Restore an extraction result stored in the cache."
+    values = json.loads(data)
+    if values is None:
+        return None
+    for field in ("body", "commentsbody"):
+        values[field] = fromstring(values[field])
+    return Document.from_dict(values)
+
+
+def _with_cache(
+    filecontent: HtmlInput, options: Extractor, extraction: Callable[[], Document | None], *params: Any
+) -> Document | None:
+    """Return the result stored in the cache of the options if there is one for this input,
+    otherwise run the extraction and store its result, discarded documents included."""
+    cache = options.cache
+    key = cache_key(filecontent, options, *params) if cache is not None else None
+    if cache is None or key is None:
+        return extraction()
+    cached = cache.get(key)
+    if cached is not None:
+        return _load_document(cached)
+    document = extraction()
+    # a degraded result depends on the time available, not only on the input
+    # (unknown for discarded documents: only stored without time budget)
+    degraded = (
+        document.stats.degraded if document is not None and document.stats is not None else options.deadline_ms is not None
+    )
+    if not degraded:
+        cache.put(key, _dump_document(document))
+    return document
+
+
 # matches "@type": "DiscussionForumPosting" or an @type array containing it, anchored to the
 # key so it can't fire on the words appearing in ordinary prose (e.g. a description field)
 _DISCUSSION_FORUM_POSTING_RE = re.compile(
@@ -142,7 +189,7 @@ _DISCUSSION_FORUM_POSTING_RE = re.compile(
 
 def _forum_thread_page(tree: HtmlElement) -> bool:
     """Detect a thread-forum page where posts live in the same containers
-    REMOVE_COMMENTS_XPATH would otherwise prune -- comments are content here, unlike on
+    REMOVE_COMMENTS_MATCHERS would otherwise prune -- comments are content here, unlike on
     a blog or article. Seeded by schema.org DiscussionForumPosting alone. Q&A forums
     (StackExchange, schema.org QAPage) are deliberately not matched: their answers live
     outside comment containers. Misses forums that don't emit DiscussionForumPosting
@@ -155,29 +202,73 @@ def _forum_thread_page(tree: HtmlElement) -> bool:
     )
 
 
-def _prepare_tree(tree: HtmlElement, options: Extractor, url: str | None) -> tuple[HtmlElement, HtmlElement]:
-    "Clean and convert a raw tree, returning (converted, pre-conversion backup)."
-    cleaned = tree_cleaning(copy(tree), options)
-    backup = copy(cleaned)
+def _page_text_length(index: AttributeIndex, stats: ExtractionStats) -> int:
+    """Length of the whole page text, used as a yardstick by the recall escalation.
+    Measured on the tree of the attribute index, without copying it."""
+    started = stats.start()
+    length = html2txt_length(index)
+    stats.stop("page_measure", started, len_out=length)
+    return length
+
+
+def _prune_raw(
+    index: AttributeIndex, matchers: AttributeMatchers, owned: bool, stats: ExtractionStats
+) -> tuple[AttributeIndex, bool]:
+    """Prune a raw tree, copying it only when necessary: in place if the cascade owns it,
+    on a copy if the matchers find anything, otherwise not at all.
+    Returns the attribute index of the tree and whether the cascade now owns it."""
+    if not owned:
+        if not any(index.select(alternatives) for alternatives in matchers):
+            return index, False
+        index = AttributeIndex(stats.copy_tree(index.tree))
+    prune_matching_nodes(index, matchers)
+    return index, True
+
+
+def _prepare_tree(
+    tree: HtmlElement, options: Extractor, url: str | None, stats: ExtractionStats, backup: bool = True
+) -> tuple[HtmlElement, HtmlElement | None]:
+    "Clean and convert a raw tree, returning (converted, pre-conversion backup if requested)."
+    cleaned = tree_cleaning(stats.copy_tree(tree), options)
+    backup_tree = stats.copy_tree(cleaned) if backup else None
     cleaned = convert_tags(cleaned, options, url)
-    return cleaned, backup
+    return cleaned, backup_tree
 
 
-def _recall_retry(esc_tree: HtmlElement, r_options: Extractor, url: str | None) -> tuple[_Element, str, int]:
+def _recall_retry(
+    esc_tree: HtmlElement,
+    r_options: Extractor,
+    url: str | None,
+    stats: ExtractionStats,
+    cleaned_backup: HtmlElement | None = None,
+    results: ExternalResults | None = None,
+) -> tuple[_Element, str, int]:
     """Stage-4 retry: re-run cascade stages 1-2 in recall mode on the escalation input
     (arrives comment-pruned, or intact on a thread-forum where posts are content).
     Deliberately no comment capture, no baseline (it already ran on the full page; on a
-    comment-pruned tree it only yields an indistinguishable boilerplate dump), no escalation."""
-    cleaned_tree, cleaned_tree_backup = _prepare_tree(esc_tree, r_options, url)
-    postbody, temp_text, len_text = extract_content(cleaned_tree, r_options)
-    if not r_options.fast:
+    comment-pruned tree it only yields an indistinguishable boilerplate dump), no escalation.
+    If stages 1-2 saw the same input, their cleaned tree and external results can be passed on:
+    only the focus-dependent steps are run again."""
+    # the recall cleaning only differs if the balanced one deleted all paragraphs
+    # (neither the form handling nor prune_html() add any)
+    if cleaned_backup is not None and cleaned_backup.find(".//p") is not None:
+        cleaned_tree = convert_tags(stats.copy_tree(cleaned_backup), r_options, url)
+        cleaned_tree_backup = None if r_options.fast else cleaned_backup
+    else:
+        cleaned_tree, cleaned_tree_backup = _prepare_tree(esc_tree, r_options, url, stats, backup=not r_options.fast)
+        if results is not None:
+            results.justext = None
+    postbody, temp_text, len_text = extract_content(cleaned_tree, r_options, stats)
+    if cleaned_tree_backup is not None and not stats.expired("escalation_external"):
         postbody, temp_text, len_text = compare_extraction(
             cleaned_tree_backup,
-            copy(esc_tree),
+            esc_tree,
             postbody,
             temp_text,
             len_text,
             r_options,
+            stats,
+            results,
         )
     return postbody, temp_text, len_text
 
@@ -186,6 +277,9 @@ def trafilatura_sequence(
     tree: HtmlElement,
     options: Extractor,
     url: str | None = None,
+    *,
+    owned: bool = False,
+    stats: ExtractionStats | None = None,
 ) -> tuple[_Element, str, int, _Element, str, int]:
     """Prepare the raw tree (cleaning, tag conversion, comment handling), then execute the
     standard cascade of extractors used by Trafilatura, each stage only engaging if the
@@ -198,80 +292,123 @@ def trafilatura_sequence(
        algorithm, not just stricter rules, so it reaches content the rule-based retry cannot)
     Returns the body triple and the comments triple.
 
+    The raw tree is left untouched unless ``owned`` is set (the caller parsed it and has no
+    further use for it). Whole-tree copies are only taken where a stage mutates its input
+    and are accounted for in ``stats``.
+
     Internal helper: its signature and 6-tuple return are not a stable API — call
     ``bare_extraction``/``extract`` instead.
     """
+    stats = stats or ExtractionStats(deadline_ms=options.deadline_ms)
+    started = stats.start()
     is_forum = _forum_thread_page(tree)
     # raw-tree prune so the external extractors inherit it too: readability would otherwise
     # pick the longest appended article over the real one
-    tree = prune_unwanted_nodes(copy(tree), REMOVE_APPENDED_ARTICLES_XPATH)
+    # the attribute index of the raw tree is kept for the escalation: it is only pruned from now on
+    raw_index, owned = _prune_raw(AttributeIndex(tree), REMOVE_APPENDED_ARTICLES_MATCHERS, owned, stats)
     # comments off: prune on the raw tree so all stages inherit it (only precision did before)
     if not options.comments and (options.focus == "precision" or not is_forum):
-        tree = prune_unwanted_nodes(copy(tree), REMOVE_COMMENTS_XPATH)
-    cleaned_tree, cleaned_tree_backup = _prepare_tree(tree, options, url)
+        raw_index, owned = _prune_raw(raw_index, REMOVE_COMMENTS_MATCHERS, owned, stats)
+    tree = raw_index.tree
+    # the backup feeds justext (stage 2) and the thread-forum re-conversion below
+    cleaned_tree, cleaned_tree_backup = _prepare_tree(
+        tree, options, url, stats, backup=not options.fast or (options.comments and is_forum)
+    )
+    stats.stop("cleaning", started)
+    # kept for the escalation, which can reuse them if its input is the same
+    ext_results: ExternalResults | None = ExternalResults()
 
     commentsbody, temp_comments, len_comments = Element("body"), "", 0
     forum_posts = None
     if options.comments:
+        started = stats.start()
         commentsbody, temp_comments, len_comments, cleaned_tree = extract_comments(cleaned_tree, options)
-        if len_comments > 0 and is_forum:
+        if len_comments > 0 and is_forum and cleaned_tree_backup is not None:
             # thread-forum: the "comments" are the posts -> route into the body (backup predates
             # capture); keep the capture aside, salvaged below if the cascade drops the posts
             forum_posts = commentsbody
             commentsbody, temp_comments, len_comments = Element("body"), "", 0
-            cleaned_tree = convert_tags(copy(cleaned_tree_backup), options, url)
+            cleaned_tree = convert_tags(stats.copy_tree(cleaned_tree_backup), options, url)
+        stats.stop("comments", started, len_out=len_comments)
     if options.focus == "precision" and not is_forum:
         # NOT redundant with the raw-tree prune above: this runs POST-conversion, where
         # <ul id="comments"> has become <list ...> and now matches the xpath's self::list
-        cleaned_tree = prune_unwanted_nodes(cleaned_tree, REMOVE_COMMENTS_XPATH)
-
-    # 1. Trafilatura's main extractor
-    postbody, temp_text, len_text = extract_content(cleaned_tree, options)
-
-    # 2. comparison with external extractors
-    if not options.fast:
-        postbody, temp_text, len_text = compare_extraction(
-            cleaned_tree_backup,
-            copy(tree),  # lxml copy() is already a deep, independent copy
-            postbody,
-            temp_text,
-            len_text,
-            options,
-        )
+        cleaned_tree = prune_matching_nodes(AttributeIndex(cleaned_tree), REMOVE_COMMENTS_MATCHERS)
+
+    # 1. Trafilatura's main extractor, starting with the expression learned for the website
+    started, stats.branch = stats.start(), "main"
+    profile = options.profiles.get(url) if options.profiles is not None else None
+    first = profile.learned_position("body", len(BODY_MATCHERS)) if profile is not None else None
+    postbody, temp_text, len_text = extract_content(cleaned_tree, options, stats, first)
+    if profile is not None and stats.body_xpath is not None:
+        profile.record("body", str(stats.body_xpath))
+    stats.stop("main", started, len_out=len_text)
+
+    # 2. comparison with external extractors (copies the raw tree only if readability runs)
+    # stages 2 to 4 are fallbacks: skipped once the time budget is spent, the result so far is kept
+    if cleaned_tree_backup is not None and not options.fast and not stats.expired("external"):
+        # auto fast mode: bypassed where the features of the main result predict it would be kept
+        if options.auto_fast and comparison_useless(cleaned_tree_backup, postbody, len_text, options, stats.body_xpath):
+            stats.bypassed.append("external")
+        else:
+            started, len_in = stats.start(), len_text
+            postbody, temp_text, len_text = compare_extraction(
+                cleaned_tree_backup,
+                tree,
+                postbody,
+                temp_text,
+                len_text,
+                options,
+                stats,
+                ext_results,
+            )
+            stats.stop("external", started, len_in, len_text)
 
     # 3. rescue: baseline on the original tree
-    if len_text < options.min_extracted_size and options.focus != "precision":
-        b_body, b_text, b_len = baseline(tree)  # baseline copies element inputs
+    if len_text < options.min_extracted_size and options.focus != "precision" and not stats.expired("baseline"):
+        started, len_in = stats.start(), len_text
+        stats.record(tree)  # baseline copies element inputs
+        b_body, b_text, b_len = baseline(tree)
         if b_len > len_text or not options.images or postbody.find(".//graphic") is None:
             postbody, temp_text, len_text = b_body, b_text, b_len
             forum_posts = None  # the dump saw the whole page: missing posts are boilerplate, not lost
+            stats.branch = "baseline"
+        stats.stop("baseline", started, len_in, len_text)
         LOGGER.debug("non-clean extracted length: %s (extraction)", b_len)
 
     # 4. recall escalation: a short extraction covering little of the page suggests
     # under-extraction (non-article layout) — retry in recall mode, keep if clearly bigger.
-    # NOTE: the page measure html2txt(tree) is coupled to BASIC_CLEAN_XPATH — see settings.py.
+    # NOTE: the page measure html2txt_length() is coupled to BASIC_CLEAN_MATCHERS — see settings.py.
     if (
         options.focus == "balanced"
         and 0 < len_text < ESCALATION_MAX_LENGTH
-        and len_text < ESCALATION_PAGE_SHARE * len(html2txt(tree))
+        and len_text < ESCALATION_PAGE_SHARE * _page_text_length(raw_index, stats)
+        # last: only a stage which would run counts as skipped
+        and not stats.expired("escalation")
     ):
-        # a copy so a shared Extractor never leaks the "recall" focus back to the caller
-        r_options = copy(options)
-        r_options.focus = "recall"
+        started, len_in, branch = stats.start(), len_text, stats.branch
+        # derived options so a shared Extractor never leaks the "recall" focus back to the caller
+        r_options = options.with_(focus="recall")
         # strip comments from the escalation input (dup risk if captured, reader comments if not);
         # keep them on a thread-forum, where the retry rescues the posts
-        esc_tree = tree if is_forum else prune_unwanted_nodes(copy(tree), REMOVE_COMMENTS_XPATH)
+        esc_tree, esc_owned = tree, owned
+        if not is_forum and any(raw_index.select(alternatives) for alternatives in REMOVE_COMMENTS_MATCHERS):
+            esc_index, esc_owned = _prune_raw(raw_index, REMOVE_COMMENTS_MATCHERS, owned, stats)
+            esc_tree = esc_index.tree
+            # stages 1-2 saw the comments: nothing to reuse
+            cleaned_tree_backup, ext_results = None, None
         r_len = 0
         try:
-            r_body, r_text, r_len = _recall_retry(esc_tree, r_options, url)
+            r_body, r_text, r_len = _recall_retry(esc_tree, r_options, url, stats, cleaned_tree_backup, ext_results)
         except Exception as err:  # pragma: no cover
             LOGGER.warning("recall retry failed: %s %s", err, url)
         # justext reaches div-buried content the rule retry misses (gated: ungated regressed
         # own-fallback). No region scoping of its own -> esc_tree is comment-pruned above
         j_len = 0
-        if not options.fast:
+        if not options.fast and not stats.expired("escalation_justext"):
             try:
-                j_body, j_text, j_len = justext_rescue(copy(esc_tree), options)
+                # last consumer of the escalation input: no copy needed if the cascade owns it
+                j_body, j_text, j_len = justext_rescue(esc_tree if esc_owned else stats.copy_tree(esc_tree), options)
             except Exception as err:  # pragma: no cover
                 LOGGER.warning("justext candidate failed: %s %s", err, url)
 
@@ -279,21 +416,31 @@ def trafilatura_sequence(
         # former internal baseline used to displace such outputs). cookie/consent banners justext
         # could pick up are pruned from its input in basic_cleaning. An accepted candidate saw the
         # full page, so its exclusions are deliberate -> drop the forum-post salvage.
+        # the retry runs stages 1-2 again: only an accepted candidate changes the branch
+        stats.branch = branch
         if j_len > r_len and j_len > ESCALATION_JUSTEXT_RATIO * len_text:
             postbody, temp_text, len_text, forum_posts = j_body, j_text, j_len, None
+            stats.branch = "escalation_justext"
         elif r_len >= options.min_extracted_size and r_len > ESCALATION_ACCEPT_RATIO * len_text:
             postbody, temp_text, len_text, forum_posts = r_body, r_text, r_len, None
+            stats.branch = "escalation_recall"
+        stats.stop("escalation", started, len_in, len_text)
 
     if forum_posts is not None:
         # a gate (escalation length, precision) blocked the cascade from restoring the posts:
         # append the ones missing from the body
-        existing = "\n".join(filter(None, (_elem_text(el) for el in postbody)))
+        started, len_in = stats.start(), len_text
+        existing = TextIndex(filter(None, (_elem_text(el) for el in postbody)))
         salvaged = [el for el in forum_posts if (t := _elem_text(el)) and t not in existing]
         if salvaged:
             LOGGER.debug("thread-forum salvage: %s captured posts appended to the body", len(salvaged))
             postbody.extend(salvaged)
             temp_text = " ".join(postbody.itertext()).strip()
             len_text = len(temp_text)
+        stats.stop("forum_salvage", started, len_in, len_text)
+
+    if stats.degraded:
+        LOGGER.warning("time budget spent, skipped %s: %s", ", ".join(stats.skipped), url)
 
     return postbody, temp_text, len_text, commentsbody, temp_comments, len_comments
 
@@ -301,7 +448,7 @@ def trafilatura_sequence(
 def bare_extraction(
     filecontent: HtmlInput,
     url: str | None = None,
-    fast: bool = False,
+    fast: bool | str = False,
     no_fallback: bool = False,
     favor_precision: bool = False,
     favor_recall: bool = False,
@@ -323,13 +470,15 @@ def bare_extraction(
     prune_xpath: str | list[str] | None = None,
     config: ConfigParser = DEFAULT_CONFIG,
     options: Extractor | None = None,
+    context: DocumentContext | None = None,
 ) -> Document | dict[str, Any] | None:
     """Internal function for text extraction returning bare Python variables.
 
     Args:
         filecontent: HTML code as string.
         url: URL of the webpage.
-        fast: Use faster heuristics and skip backup extraction.
+        fast: Use faster heuristics and skip backup extraction,
+            "auto" to skip it only where it is unlikely to change the result.
         no_fallback: Deprecated, use "fast" instead.
         favor_precision: prefer less text but correct extraction.
         favor_recall: prefer more text even when unsure.
@@ -355,6 +504,8 @@ def bare_extraction(
             can be str or list of str.
         config: Directly provide a configparser configuration.
         options: Directly provide a whole extractor configuration.
+        context: Per-document information (URL, source, reference date, declared encoding) completing
+            options shared between documents.
 
     Returns:
         A Python dict() containing all the extracted information or None.
@@ -399,12 +550,24 @@ def bare_extraction(
             date_params=date_extraction_params,
         )
 
+    options = options.with_context(context)
+    document = _with_cache(
+        filecontent, options, partial(_bare_extraction, filecontent, options, prune_xpath), "bare", prune_xpath
+    )
+    return document if document is None or not as_dict else document.as_dict()
+
+
+def _bare_extraction(filecontent: HtmlInput, options: Extractor, prune_xpath: str | list[str] | None) -> Document | None:
+    "Run the extraction on the input, see bare_extraction()."
+    stats = ExtractionStats(trace=options.trace, deadline_ms=options.deadline_ms)
     try:
         # load the HTML tree
-        tree = load_html(filecontent)
+        started = stats.start()
+        tree = load_html(filecontent, options.encoding)
         if tree is None:
-            LOGGER.error("empty HTML tree: %s", url)
+            LOGGER.error("empty HTML tree: %s", options.source)
             raise ValueError
+        stats.stop("load", started, len(filecontent) if isinstance(filecontent, (bytes, str)) else 0)
 
         # quick and dirty HTML lang check
         if options.lang and (options.fast or not LANGID_FLAG):
@@ -414,13 +577,18 @@ def bare_extraction(
 
         # extract metadata if necessary
         if options.with_metadata:
+            started = stats.start()
             document = extract_metadata(
                 tree,
                 options.url,
                 options.date_params,
                 options.fast,
                 options.author_blacklist,
+                stats=stats,
+                profile=options.profiles.get(options.url) if options.profiles is not None else None,
             )
+            stats.stop("metadata", started)
+            stats.date_source = document.date_source
 
             # cut short if extracted URL in blacklist
             if document.url in options.url_blacklist:
@@ -446,6 +614,9 @@ def bare_extraction(
             tree,
             options,
             options.url or document.url,
+            # trees passed as input or parsed during the download belong to the caller
+            owned=tree is not filecontent and tree is not getattr(filecontent, "tree", None),
+            stats=stats,
         )
 
         # tree size sanity check
@@ -486,6 +657,11 @@ def bare_extraction(
                 LOGGER.debug("wrong language: %s", options.source)
                 raise ValueError
 
+        # check near-duplicates of the documents seen before
+        if options.simhash_index is not None and not options.simhash_index.add_if_new(Simhash(temp_text).hash):
+            LOGGER.debug("discarding near-duplicate document: %s", options.source)
+            raise ValueError
+
     except (TypeError, ValueError):
         LOGGER.warning("discarding data: %s", options.source)
         return None
@@ -500,15 +676,16 @@ def bare_extraction(
     else:
         document.raw_text, document.commentsbody = temp_text, commentsbody
     document.body = postbody
+    document.stats = stats
 
-    return document if not as_dict else document.as_dict()
+    return document
 
 
 def extract(
     filecontent: HtmlInput,
     url: str | None = None,
     record_id: str | None = None,
-    fast: bool = False,
+    fast: bool | str = False,
     no_fallback: bool = False,
     favor_precision: bool = False,
     favor_recall: bool = False,
@@ -531,6 +708,7 @@ def extract(
     prune_xpath: str | list[str] | None = None,
     config: ConfigParser = DEFAULT_CONFIG,
     options: Extractor | None = None,
+    context: DocumentContext | None = None,
 ) -> str | None:
     """Main function exposed by the package:
        Wrapper for text extraction and conversion to chosen output format.
@@ -539,7 +717,8 @@ def extract(
         filecontent: HTML code as string.
         url: URL of the webpage.
         record_id: Add an ID to the metadata.
-        fast: Use faster heuristics and skip backup extraction.
+        fast: Use faster heuristics and skip backup extraction,
+            "auto" to skip it only where it is unlikely to change the result.
         no_fallback: Deprecated, use "fast" instead.
         favor_precision: prefer less text but correct extraction.
         favor_recall: when unsure, prefer more text.
@@ -565,6 +744,8 @@ def extract(
             can be str or list of str.
         config: Directly provide a configparser configuration.
         options: Directly provide a whole extractor configuration.
+        context: Per-document information (URL, source, reference date, declared encoding) completing
+            options shared between documents.
 
     Returns:
         A string in the desired format or None.
@@ -597,6 +778,7 @@ def extract(
         prune_xpath=prune_xpath,
         config=config,
         options=options,
+        context=context,
     )
     return document.text if document is not None else None
 
@@ -605,7 +787,7 @@ def extract_with_metadata(
     filecontent: HtmlInput,
     url: str | None = None,
     record_id: str | None = None,
-    fast: bool = False,
+    fast: bool | str = False,
     favor_precision: bool = False,
     favor_recall: bool = False,
     include_comments: bool = True,
@@ -624,6 +806,7 @@ def extract_with_metadata(
     prune_xpath: str | list[str] | None = None,
     config: ConfigParser = DEFAULT_CONFIG,
     options: Extractor | None = None,
+    context: DocumentContext | None = None,
 ) -> Document | None:
     """Main function exposed by the package:
        Wrapper for text extraction and conversion to chosen output format.
@@ -633,7 +816,8 @@ def extract_with_metadata(
         filecontent: HTML code as string.
         url: URL of the webpage.
         record_id: Add an ID to the metadata.
-        fast: Use faster heuristics and skip backup extraction.
+        fast: Use faster heuristics and skip backup extraction,
+            "auto" to skip it only where it is unlikely to change the result.
         favor_precision: prefer less text but correct extraction.
         favor_recall: when unsure, prefer more text.
         include_comments: Extract comments along with the main text.
@@ -655,6 +839,8 @@ def extract_with_metadata(
             can be str or list of str.
         config: Directly provide a configparser configuration.
         options: Directly provide a whole extractor configuration.
+        context: Per-document information (URL, source, reference date, declared encoding) completing
+            options shared between documents.
 
     Returns:
         Document metadata with content string in the desired format or None.
@@ -684,17 +870,24 @@ def extract_with_metadata(
         prune_xpath=prune_xpath,
         config=config,
         options=options,
+        context=context,
     )
 
 
+def extract_document(filecontent: HtmlInput, options: Extractor, context: DocumentContext | None = None) -> str | None:
+    """Extract a document with options shared between documents and its own context,
+    a task for thread and process pools (see batch.extract_many and aio.extract_async)."""
+    return extract(filecontent, options=options, context=context)
+
+
 def _check_deprecation(
-    fast: bool = False,
+    fast: bool | str = False,
     *,
     no_fallback: bool = False,
     as_dict: bool = False,
     max_tree_size: int | None = None,
     stacklevel: int = 2,
-) -> bool:
+) -> bool | str:
     """Check deprecated params and return the effective "fast" flag."""
     if no_fallback:
         warnings.warn(
@@ -717,7 +910,7 @@ def _internal_extraction(
     filecontent: HtmlInput,
     url: str | None = None,
     record_id: str | None = None,
-    fast: bool = False,
+    fast: bool | str = False,
     no_fallback: bool = False,
     favor_precision: bool = False,
     favor_recall: bool = False,
@@ -740,6 +933,7 @@ def _internal_extraction(
     prune_xpath: str | list[str] | None = None,
     config: ConfigParser = DEFAULT_CONFIG,
     options: Extractor | None = None,
+    context: DocumentContext | None = None,
 ) -> Document | None:
     """Internal method to do the extraction"""
     # stacklevel=4 → user → extract → _internal_extraction → _check_deprecation
@@ -775,14 +969,24 @@ def _internal_extraction(
             date_params=date_extraction_params,
         )
 
-    # extraction
-    document = bare_extraction(
+    # extraction, or cached result of the whole process
+    options = options.with_context(context)
+    return _with_cache(
         filecontent,
-        options=options,
-        as_dict=False,
-        prune_xpath=prune_xpath,
+        options,
+        partial(_extract_and_convert, filecontent, options, prune_xpath, record_id),
+        "extract",
+        prune_xpath,
+        record_id,
     )
 
+
+def _extract_and_convert(
+    filecontent: HtmlInput, options: Extractor, prune_xpath: str | list[str] | None, record_id: str | None
+) -> Document | None:
+    "Run the extraction and convert the result to the output format, see _internal_extraction()."
+    document = _bare_extraction(filecontent, options, prune_xpath)
+
     # post-processing
     if not document or not isinstance(document, Document):
         return None
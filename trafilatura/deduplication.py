@@ -3,16 +3,18 @@
 import re
 import string
 import unicodedata
+from collections import OrderedDict
+from collections.abc import Iterable
 from difflib import SequenceMatcher
 from functools import cache, lru_cache
 from hashlib import blake2b
-from operator import add
 from threading import RLock
 from typing import Any
 
 from lxml.etree import _Element
 
-from .settings import LRU_SIZE, Extractor
+from .cache import SegmentCounter, segment_digest
+from .settings import DEDUP_CACHE_SIZE, Extractor
 from .utils import trim
 
 STRIP_EXTENSION = re.compile(r"\.[^/?#]{2,63}$")
@@ -81,10 +83,40 @@ def generate_bow_hash(inputstring: str, length: int = 24) -> bytes:
 
 
 @lru_cache(maxsize=2**14)
-def _vector_to_add(token: str, length: int) -> list[int]:
-    "Token's contribution to a Simhash vector, cached across all instances."
-    token_hash = int.from_bytes(blake2b(token.encode(), digest_size=8).digest(), "big")
-    return [1 if token_hash & (1 << i) else -1 for i in range(length)]
+def _token_hash(token: str) -> int:
+    "64-bit hash of a token, cached across all instances."
+    return int.from_bytes(blake2b(token.encode(), digest_size=8).digest(), "big")
+
+
+def _simhash_bits(tokens: Iterable[str], length: int = 64) -> int:
+    """Charikar simhash of a list of tokens: a bit is set if the bit of the same rank
+    is set in at least half of the token hashes. The votes for all ranks are counted
+    at once with integers as bit-sliced counters: planes[k] holds the bit k of each count."""
+    planes: list[int] = []
+    total = 0
+    for token in tokens:
+        total += 1
+        # binary addition of the token hash to the counters, rank by rank in parallel
+        carry, k = _token_hash(token), 0
+        while carry:
+            if k == len(planes):
+                planes.append(carry)
+                break
+            plane = planes[k]
+            planes[k] = plane ^ carry
+            carry &= plane
+            k += 1
+    # compare the counts to half of the tokens, from the highest bit of the counts
+    threshold = (total + 1) // 2
+    greater, equal = 0, (1 << length) - 1
+    for k in range(max(len(planes), threshold.bit_length()) - 1, -1, -1):
+        plane = planes[k] if k < len(planes) else 0
+        if threshold >> k & 1:
+            equal &= plane
+        else:
+            greater |= equal & plane
+            equal &= ~plane
+    return greater | equal
 
 
 class Simhash:
@@ -108,12 +140,7 @@ class Simhash:
         https://github.com/sean-public/python-hashes/blob/master/hashes/simhash.py
         Optimized for Python by @adbar.
         """
-        vector = [0] * self.length
-
-        for token in sample_tokens(inputstring, self.length):
-            vector = list(map(add, vector, _vector_to_add(token, self.length)))
-
-        return sum(1 << i for i in range(self.length) if vector[i] >= 0)
+        return _simhash_bits(sample_tokens(inputstring, self.length), self.length)
 
     def to_hex(self) -> str:
         "Convert the numerical hash to a hexadecimal string."
@@ -153,6 +180,53 @@ def content_fingerprint(content: str) -> str:
     return Simhash(content).to_hex()
 
 
+def fingerprint_many(texts: Iterable[str]) -> list[str]:
+    "Calculate the simhash hex values of a series of texts, see content_fingerprint()."
+    return [f"{_simhash_bits(sample_tokens(text)):x}" for text in texts]
+
+
+# substrings following a non-word character, indexed by TextIndex
+ANCHOR_LENGTH = 16
+ANCHORS = re.compile(rf"\W(?=(.{{{ANCHOR_LENGTH}}}))", re.DOTALL)
+
+
+class TextIndex:
+    """Tell if a string is contained in one of the texts added so far without scanning
+    them all. The anchors of a text, the substrings of ANCHOR_LENGTH characters following
+    a non-word character, point to the texts they occur in: a contained string shares all
+    its anchors with the text containing it, so only the texts having its rarest anchor are
+    searched. Strings too short to have an anchor are searched in all texts."""
+
+    __slots__ = ["_anchors", "_texts"]
+
+    def __init__(self, texts: Iterable[str] = ()) -> None:
+        self._anchors: dict[str, list[int]] = {}
+        self._texts: list[str] = []
+        for text in texts:
+            self.add(text)
+
+    def add(self, text: str) -> None:
+        "Index a text."
+        number = len(self._texts)
+        self._texts.append(text)
+        anchors = self._anchors
+        for anchor in set(ANCHORS.findall(text)):
+            anchors.setdefault(anchor, []).append(number)
+
+    def __contains__(self, string: str) -> bool:
+        texts = self._texts
+        candidates: list[int] | range | None = None
+        for anchor in ANCHORS.findall(string):
+            numbers = self._anchors.get(anchor)
+            if numbers is None:
+                return False
+            if candidates is None or len(numbers) < len(candidates):
+                candidates = numbers
+        if candidates is None:
+            candidates = range(len(texts))
+        return any(string in texts[number] for number in candidates)
+
+
 PREV, NEXT, KEY, RESULT = 0, 1, 2, 3  # names for the link fields
 
 
@@ -231,6 +305,13 @@ class LRUCache:
                     # which could potentially be wrapped in an lru_cache itself.
                     self.full = len(self.cache) >= self.maxsize
 
+    def increment(self, key: str) -> int:
+        "Count one more occurrence of the key and return the number of previous ones."
+        with self.lock:
+            count = max(self.get(key), 0)
+            self.put(key, count + 1)
+        return count
+
     def clear(self) -> None:
         "Delete all cache content."
         with self.lock:
@@ -239,26 +320,87 @@ class LRUCache:
             self.full = False
 
 
-LRU_TEST = LRUCache(maxsize=LRU_SIZE)
+# memory taken by an entry of SegmentCache: digest and slot of the ordered dictionary (measured)
+SEGMENT_ENTRY_SIZE = 192
+
+
+class SegmentCache:
+    """Count the text segments seen by the deduplication in memory.
+    Segments are stored as digests so that all entries take the same space:
+    the least recently seen ones are evicted once the size limit in bytes
+    is reached. Safe to use from several threads, counts hits, misses and evictions."""
+
+    __slots__ = ["cache", "evictions", "hits", "lock", "maxbytes", "misses"]
+
+    def __init__(self, maxbytes: int = DEDUP_CACHE_SIZE) -> None:
+        self.maxbytes: int = maxbytes
+        self.cache: OrderedDict[bytes, int] = OrderedDict()
+        self.lock = RLock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def __len__(self) -> int:
+        return len(self.cache)
+
+    def get(self, key: str) -> int:
+        "Return the number of occurrences of the key, -1 if it is unknown."
+        digest = segment_digest(key)
+        with self.lock:
+            count = self.cache.get(digest)
+            if count is None:
+                self.misses += 1
+                return -1
+            self.cache.move_to_end(digest)
+            self.hits += 1
+            return count
+
+    def put(self, key: str, value: int) -> None:
+        "Set the number of occurrences of the key."
+        with self.lock:
+            self._store(segment_digest(key), value)
+
+    def increment(self, key: str) -> int:
+        "Count one more occurrence of the key and return the number of previous ones."
+        digest = segment_digest(key)
+        with self.lock:
+            count = self.cache.get(digest)
+            if count is None:
+                self.misses += 1
+                count = 0
+            else:
+                self.hits += 1
+            self._store(digest, count + 1)
+        return count
+
+    def _store(self, digest: bytes, value: int) -> None:
+        "Store the count, mark it as most recently used and evict the oldest entries if necessary."
+        self.cache[digest] = value
+        self.cache.move_to_end(digest)
+        while len(self.cache) * SEGMENT_ENTRY_SIZE > self.maxbytes:
+            self.cache.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        "Delete all entries and reset the counters."
+        with self.lock:
+            self.cache.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+LRU_TEST = SegmentCache()
 
 
-def put_in_cache(teststring: str) -> None:
-    "Implement LRU cache."
-    cacheval = LRU_TEST.get(teststring)
-    # if the value is already defined
-    value = cacheval + 1 if cacheval != -1 else 1
-    LRU_TEST.put(teststring, value)
+def put_in_cache(teststring: str, store: SegmentCounter | None = None) -> None:
+    "Count an occurrence of the string, by default in the segment cache."
+    (store if store is not None else LRU_TEST).increment(teststring)
 
 
 def duplicate_test(element: _Element, options: Extractor) -> bool:
-    "Check for duplicate text with LRU cache."
+    """Check for duplicate text, the segments are counted in the store set in the options
+    (e.g. a SegmentStore shared by several processes) or by default in the segment cache."""
     teststring = trim(" ".join(element.itertext()))
-    # teststring = element.text
-    if len(teststring) > options.min_duplcheck_size:
-        # retrieve value from cache
-        cacheval = LRU_TEST.get(teststring)
-        if cacheval > options.max_repetitions:  # non-existent key will return -1
-            LRU_TEST.put(teststring, cacheval + 1)
-            return True
-    put_in_cache(teststring)
-    return False
+    store = options.dedup_store if options.dedup_store is not None else LRU_TEST
+    # the count is updated in one step so that concurrent workers do not lose occurrences
+    previous = store.increment(teststring)
+    return len(teststring) > options.min_duplcheck_size and previous > options.max_repetitions
@@ -27,8 +27,10 @@ from .settings import DEFAULT_CONFIG, Extractor
 from .utils import (
     HAS_ZSTD,
     URL_BLACKLIST_REGEX,
+    HTMLFeed,
     Response,
     is_acceptable_length,
+    load_html,
     make_chunks,
 )
 
@@ -167,7 +169,9 @@ def _initiate_pool(config: ConfigParser, no_ssl: bool = False) -> urllib3.PoolMa
     return pool
 
 
-def _send_urllib_request(url: str, no_ssl: bool, with_headers: bool, config: ConfigParser) -> Response | None:
+def _send_urllib_request(
+    url: str, no_ssl: bool, with_headers: bool, config: ConfigParser, parse: bool = False
+) -> Response | None:
     "Internal function to robustly send a request (SSL or not) and return its result."
     try:
         pool_manager = _initiate_pool(config, no_ssl=no_ssl)
@@ -182,11 +186,19 @@ def _send_urllib_request(url: str, no_ssl: bool, with_headers: bool, config: Con
         )
         data = bytearray()
         max_file_size = config.getint("DEFAULT", "MAX_FILE_SIZE")
+        # parse the chunks as they arrive
+        feed = HTMLFeed() if parse else None
         try:
+            # announced size: no need to start downloading
+            length = response.headers.get("content-length")
+            if length and length.isdigit() and int(length) > max_file_size:
+                raise ValueError("MAX_FILE_SIZE exceeded")
             for chunk in response.stream(2**17):
                 data.extend(chunk)
                 if len(data) > max_file_size:
                     raise ValueError("MAX_FILE_SIZE exceeded")
+                if feed is not None:
+                    feed.feed(chunk)
         finally:
             response.release_conn()
 
@@ -194,13 +206,18 @@ def _send_urllib_request(url: str, no_ssl: bool, with_headers: bool, config: Con
         # geturl() returns the raw Location header after a redirect and the request
         # URI otherwise, both of which can be relative
         resp = Response(bytes(data), response.status, urljoin(url, response.geturl() or url))
+        if feed is not None:
+            resp.tree = feed.close()
         if with_headers:
             resp.store_headers(response.headers)
+        elif content_type := response.headers.get("content-type"):
+            # kept in any case: the charset spares the detection of the encoding
+            resp.store_headers({"content-type": content_type})
         return resp
 
     except urllib3.exceptions.SSLError:
         LOGGER.warning("retrying after SSLError: %s", url)
-        return _send_urllib_request(url, True, with_headers, config)
+        return _send_urllib_request(url, True, with_headers, config, parse)
     except Exception as err:
         LOGGER.error("download error: %s %s", url, err)  # sys.exc_info()[0]
 
@@ -254,6 +271,7 @@ def fetch_response(
     no_ssl: bool = False,
     with_headers: bool = False,
     config: ConfigParser = DEFAULT_CONFIG,
+    parse: bool = False,
 ) -> Response | None:
     """Downloads a web page and returns a full response object.
 
@@ -263,6 +281,8 @@ def fetch_response(
         no_ssl: Don't try to establish a secure connection (to prevent SSLError).
         with_headers: Keep track of the response headers.
         config: Pass configuration values for output control.
+        parse: Parse the document while it is being downloaded
+            and store the HTML tree in the tree attribute.
 
     Returns:
         Response object or None in case of failed downloads and invalid results.
@@ -270,11 +290,14 @@ def fetch_response(
     """
     dl_function = _send_urllib_request if not HAS_PYCURL else _send_pycurl_request
     LOGGER.debug("sending request: %s", url)
-    response = dl_function(url, no_ssl, with_headers, config)  # Response
+    response = dl_function(url, no_ssl, with_headers, config, parse)  # Response
     if not response:  # None or ""
         LOGGER.debug("request failed: %s", url)
         return None
     response.decode_data(decode)
+    # documents which could not be parsed on the fly
+    if parse and response.tree is None:
+        response.tree = load_html(response)
     return response
 
 
@@ -393,12 +416,29 @@ def buffered_response_downloads(
     return _buffered_downloads(bufferlist, download_threads, worker)
 
 
-def _send_pycurl_request(url: str, no_ssl: bool, with_headers: bool, config: ConfigParser) -> Response | None:
+def _write_and_feed(received: bytearray, feed: HTMLFeed, max_file_size: int, chunk: bytes) -> int | None:
+    "Store and parse a chunk received by pycurl, a return value other than None aborts the transfer."
+    received.extend(chunk)
+    if len(received) > max_file_size:
+        LOGGER.debug("MAX_FILE_SIZE exceeded")
+        return 0
+    feed.feed(chunk)
+    return None
+
+
+def _send_pycurl_request(
+    url: str, no_ssl: bool, with_headers: bool, config: ConfigParser, parse: bool = False
+) -> Response | None:
     """Experimental function using libcurl and pycurl to speed up downloads"""
     # https://github.com/pycurl/pycurl/blob/master/examples/retriever-multi.py
 
     # init
-    headerlist = [f"{header}: {content}" for header, content in _determine_headers(config).items()]
+    headerlist = [
+        f"{header}: {content}"
+        for header, content in _determine_headers(config).items()
+        # compression left to libcurl when parsing on the fly
+        if not parse or header.lower() != "accept-encoding"
+    ]
 
     # prepare curl request
     # https://curl.haxx.se/libcurl/c/curl_easy_setopt.html
@@ -429,11 +469,21 @@ def _send_pycurl_request(url: str, no_ssl: bool, with_headers: bool, config: Con
 
     # TCP_FASTOPEN
     # curl.setopt(pycurl.FAILONERROR, 1)
-    # curl.setopt(pycurl.ACCEPT_ENCODING, '')
+
+    # parse the chunks as they arrive, decompressed by libcurl
+    feed, received = None, bytearray()
+    if parse:
+        feed = HTMLFeed()
+        curl.setopt(pycurl.ACCEPT_ENCODING, "")
+        curl.setopt(pycurl.WRITEFUNCTION, partial(_write_and_feed, received, feed, config.getint("DEFAULT", "MAX_FILE_SIZE")))
 
     # send request
     try:
-        bufferbytes = curl.perform_rb()
+        if feed is not None:
+            curl.perform()
+            bufferbytes = bytes(received)
+        else:
+            bufferbytes = curl.perform_rb()
     except pycurl.error as err:
         LOGGER.error("pycurl error: %s %s", url, err)
         curl.close()
@@ -443,7 +493,7 @@ def _send_pycurl_request(url: str, no_ssl: bool, with_headers: bool, config: Con
         # additional error codes: 80, 90, 96, 98
         if no_ssl is False and err.args[0] in CURL_SSL_ERRORS:
             LOGGER.debug("retrying after SSL error: %s %s", url, err)
-            return _send_pycurl_request(url, True, with_headers, config)
+            return _send_pycurl_request(url, True, with_headers, config, parse)
         # traceback.print_exc(file=sys.stderr)
         # sys.stderr.flush()
         return None
@@ -452,7 +502,10 @@ def _send_pycurl_request(url: str, no_ssl: bool, with_headers: bool, config: Con
     # ip_info = curl.getinfo(curl.PRIMARY_IP)
 
     resp = Response(bufferbytes, curl.getinfo(pycurl.RESPONSE_CODE), curl.getinfo(pycurl.EFFECTIVE_URL))
+    content_type = curl.getinfo(pycurl.CONTENT_TYPE)
     curl.close()
+    if feed is not None:
+        resp.tree = feed.close()
 
     if with_headers:
         respheaders = {}
@@ -467,5 +520,8 @@ def _send_pycurl_request(url: str, no_ssl: bool, with_headers: bool, config: Con
             # Now we can actually record the header name and value.
             respheaders[name.strip()] = value.strip()  # name.strip().lower() ?
         resp.store_headers(respheaders)
+    elif content_type:
+        # kept in any case: the charset spares the detection of the encoding
+        resp.store_headers({"content-type": content_type})
 
     return resp
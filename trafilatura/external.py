@@ -4,6 +4,7 @@ Functions grounding on third-party software.
 """
 
 import logging
+from copy import copy
 from typing import Any
 
 # third-party
@@ -14,12 +15,12 @@ from lxml.html import HtmlElement
 
 # own
 from .baseline import basic_cleaning
-from .htmlprocessing import convert_tags, prune_unwanted_nodes, tree_cleaning
+from .htmlprocessing import AttributeIndex, convert_tags, prune_matching_nodes, tree_cleaning
 from .readability_lxml import Document as ReadabilityDocument  # fork
-from .settings import JUSTEXT_LANGUAGES, Extractor
+from .settings import JUSTEXT_LANGUAGES, ExtractionStats, Extractor
 from .utils import fromstring_bytes, trim
 from .xml import TEI_VALID_TAGS
-from .xpaths import OVERALL_DISCARD_XPATH
+from .xpaths import OVERALL_DISCARD_MATCHERS
 
 LOGGER = logging.getLogger(__name__)
 
@@ -31,6 +32,25 @@ SANITIZED_XPATH = ".//aside|.//audio|.//button|.//fencedframe|.//fieldset|.//fig
 # (3, 4]-band page was justext wrongly replacing a longer, closer-to-target extraction)
 JUSTEXT_OVERRIDE_RATIO = 3
 
+# auto fast mode: the comparison is skipped on well-structured results, thresholds measured on
+# tests/evaldata.json with tests/eval_auto.py (see there before changing them)
+AUTO_MIN_LENGTH_FACTOR = 4  # times min_extracted_size
+AUTO_MIN_PARAGRAPHS = 2
+AUTO_MIN_PARAGRAPH_SHARE = 0.5  # share of the extracted text in <p> elements
+AUTO_MIN_PAGE_SHARE = 0.1  # share of the page text covered by the extraction
+AUTO_MAX_LINK_DENSITY = 0.4  # share of the page text in links
+
+
+class ExternalResults:
+    """Results of the external extractors on the input of compare_extraction(),
+    kept so that a later comparison on the same input (recall escalation) can reuse them."""
+
+    __slots__ = ["justext", "readability"]
+
+    def __init__(self) -> None:
+        self.readability: tuple[HtmlElement, str, int] | None = None
+        self.justext: tuple[_Element, str, int] | None = None
+
 
 def try_readability(htmlinput: HtmlElement) -> HtmlElement:
     """Safety net: try with the generic algorithm readability"""
@@ -82,6 +102,30 @@ def _prefer_readability(
     )
 
 
+def comparison_useless(
+    cleaned_tree: HtmlElement, body: _Element, len_text: int, options: Extractor, body_xpath: int | None
+) -> bool:
+    """Predict from cheap features whether compare_extraction() would keep the own extraction:
+    a main content area found by one of the BODY_MATCHERS expressions (not recovered wild text),
+    substantial text mostly in paragraphs, no elements triggering justext, and a page
+    which is neither link-heavy nor much bigger than the extraction."""
+    if options.focus == "recall" or body_xpath is None:
+        return False
+    if len_text < AUTO_MIN_LENGTH_FACTOR * options.min_extracted_size:
+        return False
+    paragraphs = body.findall(".//p")
+    if len(paragraphs) < AUTO_MIN_PARAGRAPHS or len(body.findall(".//table")) > len(paragraphs):
+        return False
+    if sum(len(t) for t in body.xpath(".//p//text()")) < AUTO_MIN_PARAGRAPH_SHARE * len_text:
+        return False
+    if body.xpath(SANITIZED_XPATH):
+        return False
+    # cleaned tree, before tag conversion: links are still <a> elements
+    len_page = sum(len(t.strip()) for t in cleaned_tree.itertext())
+    len_links = sum(len(t.strip()) for link in cleaned_tree.iter("a") for t in link.itertext())
+    return len_text >= AUTO_MIN_PAGE_SHARE * len_page and len_links <= AUTO_MAX_LINK_DENSITY * len_page
+
+
 def compare_extraction(
     cleaned_tree: HtmlElement,
     raw_tree: HtmlElement,
@@ -89,35 +133,58 @@ def compare_extraction(
     text: str,
     len_text: int,
     options: Extractor,
+    stats: ExtractionStats | None = None,
+    results: ExternalResults | None = None,
 ) -> tuple[_Element, str, int]:
     """Decide whether to choose own or external extraction based on a series of heuristics.
-    ``raw_tree`` (uncleaned) feeds readability; ``cleaned_tree`` (tree_cleaning'd, unconverted)
-    feeds justext."""
+    ``raw_tree`` (uncleaned) feeds readability and is left untouched, a copy is taken only if
+    readability runs; ``cleaned_tree`` (tree_cleaning'd, unconverted) feeds justext.
+    With ``results`` the external extractions are taken from there if available and stored
+    otherwise, ``cleaned_tree`` is then left untouched too."""
     # bypass for recall
     if options.focus == "recall" and len_text > options.min_extracted_size * 10:
         return body, text, len_text
 
     jt_result = False
-    # prior cleaning
+    # the precision pruning changes the input of readability: nothing to share
     if options.focus == "precision":
-        raw_tree = prune_unwanted_nodes(raw_tree, OVERALL_DISCARD_XPATH)
+        results = None
 
     # try with readability
-    temppost_algo = try_readability(raw_tree)
-    # unicode fix necessary on certain systems (#331)
-    algo_text = trim(tostring(temppost_algo, method="text", encoding="utf-8").decode("utf-8"))
-    len_algo = len(algo_text)
+    if results is not None and results.readability is not None:
+        temppost_algo, algo_text, len_algo = results.readability
+    else:
+        raw_tree = stats.copy_tree(raw_tree) if stats is not None else copy(raw_tree)
+        # prior cleaning
+        if options.focus == "precision":
+            raw_tree = prune_matching_nodes(AttributeIndex(raw_tree), OVERALL_DISCARD_MATCHERS)
+        temppost_algo = try_readability(raw_tree)
+        # unicode fix necessary on certain systems (#331)
+        algo_text = trim(tostring(temppost_algo, method="text", encoding="utf-8").decode("utf-8"))
+        len_algo = len(algo_text)
     LOGGER.debug("extracted length: %s (algorithm) %s (extraction)", len_algo, len_text)
 
     use_readability = _prefer_readability(body, temppost_algo, algo_text, len_text, len_algo, options)
+    if results is not None and results.readability is None:
+        # sanitize_tree() below modifies the output
+        results.readability = (copy(temppost_algo) if use_readability else temppost_algo), algo_text, len_algo
     if use_readability:
         body, text, len_text = temppost_algo, algo_text, len_algo
+        if stats is not None:
+            stats.branch = "readability"
     LOGGER.debug("using %s extraction: %s", "generic" if use_readability else "custom", options.source)
 
     # override faulty extraction: try with justext
     if body.xpath(SANITIZED_XPATH) or len_text < options.min_extracted_size:
         LOGGER.debug("unclean document triggering justext examination: %s", options.source)
-        body2, text2, len_text2 = justext_rescue(cleaned_tree, options)
+        if results is None:
+            body2, text2, len_text2 = justext_rescue(cleaned_tree, options)
+        else:
+            if results.justext is None:
+                # basic_cleaning() modifies its input
+                jt_tree = stats.copy_tree(cleaned_tree) if stats is not None else copy(cleaned_tree)
+                results.justext = justext_rescue(jt_tree, options)
+            body2, text2, len_text2 = results.justext
         # prevent too short documents from replacing the main text
         if (
             text2
@@ -127,6 +194,8 @@ def compare_extraction(
             LOGGER.debug("using justext, length: %s", len_text2)
             body, text, len_text = body2, text2, len_text2
             jt_result = True
+            if stats is not None:
+                stats.branch = "justext"
 
     # post-processing: remove unwanted sections
     if use_readability and not jt_result:
@@ -4,6 +4,7 @@ Functions to process nodes in HTML code.
 """
 
 import logging
+from collections.abc import Iterator, Sequence
 from copy import deepcopy
 
 from courlan.urlutils import fix_relative_urls, get_base_url
@@ -20,6 +21,7 @@ from .settings import (
 )
 from .utils import LINK_FARM_RATIO, is_image_element, textfilter, trim
 from .xml import META_ATTRIBUTES, delete_element
+from .xpaths import AttributeAlternatives, AttributeMatchers
 
 LOGGER = logging.getLogger(__name__)
 
@@ -142,14 +144,85 @@ def prune_html(tree: HtmlElement, focus: str = "balanced") -> HtmlElement:
     return tree
 
 
+class AttributeIndex:
+    """Elements of a tree grouped by attribute name and value, built on the first lookup.
+    Each distinct value is tested once per pattern, so several sets of matchers
+    (see xpaths.AttributeMatchers) cost one tree walk instead of an XPath evaluation
+    per expression. The index stays valid as long as elements are only deleted."""
+
+    __slots__ = ["_order", "_values", "tree"]
+
+    def __init__(self, tree: HtmlElement) -> None:
+        self.tree = tree
+        self._order: dict[HtmlElement, int] | None = None
+        self._values: dict[str, dict[str, list[HtmlElement]]] = {}
+
+    def _build(self) -> dict[HtmlElement, int]:
+        "Walk the tree once: document order of the elements and values of their attributes."
+        order: dict[HtmlElement, int] = {}
+        values = self._values
+        for position, elem in enumerate(self.tree.iter(Element)):
+            order[elem] = position
+            for name, value in elem.items():
+                values.setdefault(name, {}).setdefault(value, []).append(elem)
+        self._order = order
+        return order
+
+    def _attached(self, elem: HtmlElement) -> bool:
+        "Tell if the element has not been deleted from the tree in the meantime."
+        tree = self.tree
+        node: HtmlElement | None = elem
+        while node is not tree:
+            if node is None:
+                return False
+            node = node.getparent()
+        return True
+
+    def select(self, alternatives: AttributeAlternatives, include_root: bool = False) -> list[HtmlElement]:
+        """Find the elements matching one expression, in document order. As with .//* only
+        the descendants are searched, the root is included with include_root, as with //*."""
+        order = self._order if self._order is not None else self._build()
+        found: set[HtmlElement] = set()
+        for tags, patterns in alternatives:
+            if patterns is None:
+                if tags:
+                    found.update(self.tree.iter(*tags))
+                continue
+            for key, pattern in patterns.items():
+                names = key.split("|")
+                for name in names:
+                    for value, elements in self._values.get(name, {}).items():
+                        if pattern.search(value):
+                            found.update(
+                                elem
+                                for elem in elements
+                                if (tags is None or elem.tag in tags)
+                                and (len(names) == 1 or next(k for k in elem.keys() if k in names) == name)
+                            )
+        if not include_root:
+            found.discard(self.tree)
+        return sorted((elem for elem in found if self._attached(elem)), key=order.__getitem__)
+
+
+def prune_matching_nodes(index: AttributeIndex, matchers: AttributeMatchers, with_backup: bool = False) -> HtmlElement:
+    """Prune the tree of the index by removing the sections found by the matchers.
+    Returns the tree, or a copy of it as it was if the pruning went too far with with_backup."""
+    return _delete_selected(index.tree, (index.select(alternatives) for alternatives in matchers), with_backup)
+
+
 def prune_unwanted_nodes(tree: HtmlElement, nodelist: list[XPath], with_backup: bool = False) -> HtmlElement:
     "Prune the HTML tree by removing unwanted sections."
+    return _delete_selected(tree, (expression(tree) for expression in nodelist), with_backup)
+
+
+def _delete_selected(tree: HtmlElement, selections: Iterator[list[HtmlElement]], with_backup: bool) -> HtmlElement:
+    "Delete the elements of each selection, evaluated in turn, optionally reverting if too much text is gone."
     if with_backup:
         old_len = len(tree.text_content())  # ' '.join(tree.itertext())
         backup = deepcopy(tree)
 
-    for expression in nodelist:
-        for subtree in expression(tree):
+    for selection in selections:
+        for subtree in selection:
             # preserve tail text from deletion
             # tail is by default preserved by delete_element()
             # remove the node
@@ -162,6 +235,122 @@ def prune_unwanted_nodes(tree: HtmlElement, nodelist: list[XPath], with_backup:
     return tree
 
 
+# trimmed text as a monoid: (non-space chars, words, starts with non-space, ends with non-space),
+# None for the empty string, so that len(trim(a + b)) can be derived from the parts of a and b
+TextSpan = tuple[int, int, bool, bool] | None
+
+
+BLANK_SPAN = (0, 0, False, False)
+
+
+def _text_span(text: str | None) -> TextSpan:
+    "Describe a piece of text for the trimmed length."
+    if not text:
+        return None
+    if text.isspace():  # frequent case: indentation
+        return BLANK_SPAN
+    words = text.split()
+    return sum(map(len, words)), len(words), not text[0].isspace(), not text[-1].isspace()
+
+
+def _join_spans(first: TextSpan, second: TextSpan) -> TextSpan:
+    "Describe the concatenation of two pieces of text: words merge across the boundary."
+    if first is None:
+        return second
+    if second is None:
+        return first
+    merged = first[3] and second[2]
+    return first[0] + second[0], first[1] + second[1] - merged, first[2], second[3]
+
+
+def _trimmed_length(span: TextSpan) -> int:
+    "Length of the trimmed text: words joined by single spaces."
+    return span[0] + span[1] - 1 if span is not None and span[1] else 0
+
+
+NO_LINKS = (0, 0, 0, 0, 0)
+
+
+def _add_counts(
+    counts: tuple[int, int, int, int, int], child_counts: tuple[int, int, int, int, int], tag: str, child_span: TextSpan
+) -> tuple[int, int, int, int, int]:
+    "Add the link and image counts of a child, and the child itself if it is a link or an image."
+    refs, links, linklen, shortelems, graphics = (a + b for a, b in zip(counts, child_counts, strict=True))
+    if tag == "ref":
+        refs += 1
+        length = _trimmed_length(child_span)
+        if length:
+            links, linklen, shortelems = links + 1, linklen + length, shortelems + (length < 10)
+    elif tag == "graphic":
+        graphics += 1
+    return refs, links, linklen, shortelems, graphics
+
+
+class SubtreeStats:
+    """Text and link statistics of every element of a tree, gathered in one bottom-up pass:
+    trimmed length of the text content, number of <ref> descendants, of those with text,
+    of short ones and length of their text, number of <graphic> descendants.
+    Deletions made with delete() keep the statistics of the ancestors up to date."""
+
+    __slots__ = ["_stats"]
+
+    def __init__(self, tree: _Element) -> None:
+        # per element: text span and counts (refs, links with text, link text length, short links, graphics)
+        self._stats: dict[_Element, tuple[TextSpan, tuple[int, int, int, int, int]]] = {}
+        # reversed document order: descendants come before their ancestors
+        for elem in reversed(list(tree.iter())):
+            if isinstance(elem.tag, str):
+                self._collect(elem)
+
+    def _collect(self, elem: _Element) -> None:
+        "Derive the statistics of an element from the ones of its children."
+        stats = self._stats
+        span = _text_span(elem.text)
+        counts = NO_LINKS
+        for child in elem:
+            tag = child.tag
+            # comments and processing instructions only contribute their tail
+            if isinstance(tag, str):
+                child_span, child_counts = stats[child]
+                if child_span is not None:
+                    span = _join_spans(span, child_span)
+                if child_counts is not NO_LINKS or tag in ("ref", "graphic"):
+                    counts = _add_counts(counts, child_counts, tag, child_span)
+            if child.tail:
+                span = _join_spans(span, _text_span(child.tail))
+        stats[elem] = (span, counts)
+
+    def text_length(self, elem: _Element) -> int:
+        "Length of the trimmed text content, i.e. len(trim(elem.text_content()))."
+        return _trimmed_length(self._stats[elem][0])
+
+    def refs(self, elem: _Element) -> int:
+        "Number of <ref> descendants."
+        return self._stats[elem][1][0]
+
+    def has_graphic(self, elem: _Element) -> bool:
+        "Whether there is a <graphic> descendant."
+        return self._stats[elem][1][4] > 0
+
+    def link_info(self, elem: _Element) -> tuple[int, int, int]:
+        "Length of the link text, number of links with text and of short ones, as in collect_link_info()."
+        _, links, linklen, shortelems, _ = self._stats[elem][1]
+        return linklen, links, shortelems
+
+    def delete(self, elements: Sequence[_Element], keep_tail: bool = True) -> None:
+        "Delete the elements from the tree and update the statistics of their ancestors."
+        outdated: dict[_Element, None] = {}
+        for elem in elements:
+            for ancestor in elem.iterancestors():
+                if ancestor not in self._stats:
+                    break
+                outdated[ancestor] = None
+            delete_element(elem, keep_tail=keep_tail)
+        # deepest first, so that the children of an element are up to date
+        for elem in sorted(outdated, key=lambda e: sum(1 for _ in e.iterancestors()), reverse=True):
+            self._collect(elem)
+
+
 def collect_link_info(
     links_xpath: list[HtmlElement],
 ) -> tuple[int, int, int, list[str]]:
@@ -184,18 +373,25 @@ def is_paragraph_listing(links_xpath: list[HtmlElement]) -> bool:
 
 def link_density_test(element: HtmlElement, text: str, favor_precision: bool = False) -> tuple[bool, list[str]]:
     "Remove sections which are rich in links (probably boilerplate)"
-    links_xpath = element.findall(".//ref")
-    if not links_xpath:
+    return _link_density_test(element, len(text), favor_precision, SubtreeStats(element))
+
+
+def _link_density_test(
+    element: HtmlElement, elemlen: int, favor_precision: bool, stats: SubtreeStats
+) -> tuple[bool, list[str]]:
+    "Link density test on the statistics of the tree, the length of the trimmed text is given."
+    num_refs = stats.refs(element)
+    if not num_refs:
         return False, []
     # preserve image containers
-    if element.find(".//graphic") is not None:
+    if stats.has_graphic(element):
         return False, []
     mylist: list[str] = []
     # shortcut
-    if len(links_xpath) == 1:
+    if num_refs == 1:
         len_threshold = 10 if favor_precision else 100
-        link_text = trim(links_xpath[0].text_content())
-        if len(link_text) > len_threshold and len(link_text) > len(text) * 0.9:
+        link_len = stats.link_info(element)[0]
+        if link_len > len_threshold and link_len > elemlen * 0.9:
             return True, []
     if element.tag == "p":
         limitlen = 60 if element.getnext() is None else 30
@@ -205,9 +401,10 @@ def link_density_test(element: HtmlElement, text: str, favor_precision: bool = F
     #    limitlen, threshold = 150, 0.66
     else:
         limitlen = 100
-    elemlen = len(text)
     if elemlen < limitlen:
-        linklen, elemnum, shortelems, mylist = collect_link_info(links_xpath)
+        linklen, elemnum, shortelems = stats.link_info(element)
+        # short element: the link texts are cheap to collect
+        mylist = collect_link_info(element.findall(".//ref"))[3]
         if elemnum == 0:
             return True, mylist
         LOGGER.debug(
@@ -222,28 +419,33 @@ def link_density_test(element: HtmlElement, text: str, favor_precision: bool = F
     # large near-total-link farms ("latest news" sidebars) at/above limitlen, which the size gate
     # above never tests (#584); small farms are already caught there at the plain 0.8 ratio.
     # >4: a farm is MANY links -- a handful of long sentence-links is editorial (knowtechie realworld test)
-    elif len(links_xpath) > 4:
+    elif num_refs > 4:
         # local vars: leave mylist [] on fall-through so the caller's backtracking gate is unaffected
-        linklen, elemnum, _, farmlist = collect_link_info(links_xpath)
+        linklen, elemnum, _ = stats.link_info(element)
         # avg link len >= 100 => catalog/listing content (one link per card), not a farm: keep it
-        if linklen > len(text) * LINK_FARM_RATIO and linklen < 100 * elemnum and not is_paragraph_listing(links_xpath):
-            return True, farmlist
+        if (
+            linklen > elemlen * LINK_FARM_RATIO
+            and linklen < 100 * elemnum
+            and not is_paragraph_listing(element.findall(".//ref"))
+        ):
+            return True, collect_link_info(element.findall(".//ref"))[3]
     return False, mylist
 
 
-def link_density_test_tables(element: HtmlElement) -> bool:
+def link_density_test_tables(element: HtmlElement, stats: SubtreeStats | None = None) -> bool:
     "Remove tables which are rich in links (probably boilerplate)."
-    links_xpath = element.findall(".//ref")
+    if stats is None:
+        stats = SubtreeStats(element)
 
-    if not links_xpath:
+    if not stats.refs(element):
         return False
 
-    elemlen = len(trim(element.text_content()))
+    elemlen = stats.text_length(element)
     if elemlen < 200:
         return False
 
     # links with no text (e.g. icon/flag links wrapping images) yield linklen 0 -> not boilerplate
-    linklen, _, _, _ = collect_link_info(links_xpath)
+    linklen = stats.link_info(element)[0]
     LOGGER.debug("table link text: %s / total: %s", linklen, elemlen)
     return linklen > 0.8 * elemlen if elemlen < 1000 else linklen > 0.5 * elemlen
 
@@ -253,17 +455,21 @@ def delete_by_link_density(
     tagname: str,
     backtracking: bool = False,
     favor_precision: bool = False,
+    stats: SubtreeStats | None = None,
 ) -> HtmlElement:
     """Determine the link density of elements with respect to their length,
-    and remove the elements identified as boilerplate."""
+    and remove the elements identified as boilerplate.
+    Statistics of the subtree can be shared between several calls, deletions keep them up to date."""
+    if stats is None:
+        stats = SubtreeStats(subtree)
     deletions = []
     len_threshold = 200 if favor_precision else 100
     depth_threshold = 1 if favor_precision else 3
 
     for elem in subtree.iter(tagname):
-        elemtext = trim(elem.text_content())
-        result, templist = link_density_test(elem, elemtext, favor_precision)
-        if result or (backtracking and templist and 0 < len(elemtext) < len_threshold and len(elem) >= depth_threshold):
+        elemlen = stats.text_length(elem)
+        result, templist = _link_density_test(elem, elemlen, favor_precision, stats)
+        if result or (backtracking and templist and 0 < elemlen < len_threshold and len(elem) >= depth_threshold):
             # a paragraph that holds the content of a list item is kept: the
             # link density of the whole list is checked separately, and
             # removing it here would leave the item empty (GH #788)
@@ -274,8 +480,7 @@ def delete_by_link_density(
             # else: # and not re.search(r'[?!.]', text):
             # print(elem.tag, templist)
 
-    for elem in dict.fromkeys(deletions):
-        delete_element(elem)
+    stats.delete(list(dict.fromkeys(deletions)))
 
     return subtree
 
@@ -13,6 +13,13 @@ from typing import Any
 from .settings import Document
 from .utils import HTML_STRIP_TAGS, as_list, trim
 
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 LOGGER = logging.getLogger(__name__)
 
 
@@ -74,6 +81,7 @@ JSON_TYPE = re.compile(r'"@type"\s*:\s*"([^"]*)"', re.DOTALL)
 JSON_CATEGORY = re.compile(r'"articleSection": ?"([^"\\]+)', re.DOTALL)
 JSON_SCHEMA_ORG = re.compile(r"^https?://schema\.org", flags=re.IGNORECASE)
 JSON_UNICODE_REPLACE = re.compile(r"\\u([0-9a-fA-F]{4})")
+SURROGATES = re.compile("[\ud800-\udfff]")
 
 AUTHOR_ATTRS = ("givenName", "additionalName", "familyName")
 
@@ -180,6 +188,10 @@ def process_parent(parent: Any, metadata: Document) -> Document:
                 else:
                     metadata.categories = list(filter(None, content["articleSection"]))
 
+            # publication date, checked along with htmldate's result
+            if isinstance(content.get("datePublished"), str):
+                metadata.date_candidates = [*(metadata.date_candidates or []), ("json-ld", content["datePublished"])]
+
             # try to extract title
             if not metadata.title:
                 if "name" in content and content_type == "article":
@@ -276,12 +288,23 @@ def extract_json_parse_error(elem: str, metadata: Document) -> Document:
     return metadata
 
 
+def load_json(string: str) -> Any:
+    """Parse JSON data, with orjson if it is installed. The standard library is used as a fallback,
+    it accepts the control characters which trim() does not handle (strict=False)."""
+    if HAS_ORJSON:
+        try:
+            return orjson.loads(string)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(string, strict=False)
+
+
 def normalize_json(string: str) -> str:
     "Normalize unicode strings and trim the output"
     if "\\" in string:
         string = string.replace("\\n", "").replace("\\r", "").replace("\\t", "")
         string = JSON_UNICODE_REPLACE.sub(lambda match: chr(int(match[1], 16)), string)
-        string = "".join(c for c in string if ord(c) < 0xD800 or ord(c) > 0xDFFF)
+        string = SURROGATES.sub("", string)
         string = unescape(string)
     return trim(HTML_STRIP_TAGS.sub("", string))
 
@@ -12,24 +12,28 @@ from lxml.etree import Element, SubElement, _Element, strip_elements, strip_tags
 from lxml.html import HtmlElement
 
 # own
+from .deduplication import TextIndex
 from .htmlprocessing import (
+    AttributeIndex,
+    SubtreeStats,
     delete_by_link_density,
     handle_textnode,
     link_density_test_tables,
     process_node,
-    prune_unwanted_nodes,
+    prune_matching_nodes,
 )
-from .settings import DEDUPE_SCAN_CAP, INLINE_CARRIED, MIN_DUPLICATE_LENGTH, TAG_CATALOG, Extractor
+from .profiles import expression_order
+from .settings import INLINE_CARRIED, MIN_DUPLICATE_LENGTH, TAG_CATALOG, ExtractionStats, Extractor
 from .utils import FORMATTING_PROTECTED, SPACING_PROTECTED, is_image_file, text_chars_test, trim
 from .xml import delete_element
 from .xpaths import (
-    BODY_XPATH,
-    COMMENTS_DISCARD_XPATH,
-    COMMENTS_XPATH,
-    DISCARD_IMAGE_ELEMENTS,
-    OVERALL_DISCARD_XPATH,
-    PRECISION_DISCARD_XPATH,
-    TEASER_DISCARD_XPATH,
+    BODY_MATCHERS,
+    COMMENTS_DISCARD_MATCHERS,
+    COMMENTS_MATCHERS,
+    DISCARD_IMAGE_MATCHERS,
+    OVERALL_DISCARD_MATCHERS,
+    PRECISION_DISCARD_MATCHERS,
+    TEASER_DISCARD_MATCHERS,
 )
 
 LOGGER = logging.getLogger(__name__)
@@ -46,6 +50,22 @@ NOT_AT_THE_END = {"head", "ref"}
 # tags allowed inside a blockquote paragraph
 _QUOTE_TAGS = set(TAG_CATALOG) | {"ref", "graphic"}
 
+# derived from BODY_MATCHERS for the single tree walk: tags to visit, tags selected without
+# condition by at least one expression, and the patterns of all expressions per attribute
+_BODY_TAGS = sorted({tag for matcher in BODY_MATCHERS for tags, _ in matcher for tag in tags})
+_UNCONDITIONAL_BODY_TAGS = {tag for matcher in BODY_MATCHERS for tags, patterns in matcher if patterns is None for tag in tags}
+_COMBINED_BODY_PATTERNS = {
+    attribute: re.compile(
+        "|".join(
+            f"(?:{patterns[attribute].pattern})"
+            for matcher in BODY_MATCHERS
+            for _, patterns in matcher
+            if patterns and attribute in patterns
+        )
+    )
+    for attribute in sorted({a for matcher in BODY_MATCHERS for _, patterns in matcher if patterns for a in patterns})
+}
+
 
 def _elem_text(element: _Element) -> str:
     """Text rendering for the recovery/adjacent dedup checks here: plain concatenation, so
@@ -685,23 +705,20 @@ def recover_wild_text(
     subelems = search_tree.xpath(search_expr)
     # dedup against the pre-main-pass snapshot: skip what the main pass already took -- exact
     # match (not length-gated, #634; accepted cost: identical-text elements collapse) or a
-    # length-gated substring (a <p> folded into its <list> container)
+    # length-gated substring of one element (a <p> folded into its <list> container)
     elem_texts = [_elem_text(el) for el in result_body]
-    # newline-joined (trimmed element text has no newline) so no substring match spans two elements
-    existing = "\n".join(filter(None, elem_texts))
+    existing = TextIndex(filter(None, elem_texts))
     existing_elems = set(elem_texts)
     for subelem in subelems:
         processed = handle_textelem(subelem, potential_tags, options)
         if processed is None:
             continue
         text = _elem_text(processed)
-        # past the cap, the substring scan is skipped and `existing` stops growing
-        under_cap = len(existing) <= DEDUPE_SCAN_CAP
-        if text and (text in existing_elems or (len(text) > MIN_DUPLICATE_LENGTH and under_cap and text in existing)):
+        if text and (text in existing_elems or (len(text) > MIN_DUPLICATE_LENGTH and text in existing)):
             continue
         result_body.append(processed)
-        if under_cap:
-            existing += "\n" + text
+        if text:
+            existing.add(text)
         existing_elems.add(text)
     return result_body
 
@@ -714,41 +731,78 @@ def prune_unwanted_sections(
 ) -> HtmlElement:
     "Rule-based deletion of targeted document sections"
     favor_precision = options.focus == "precision"
-    # prune the rest
-    tree = prune_unwanted_nodes(tree, OVERALL_DISCARD_XPATH, with_backup=True)
+    # prune the rest, the attribute index is shared by the rule sets
+    index = AttributeIndex(tree)
+    tree = prune_matching_nodes(index, OVERALL_DISCARD_MATCHERS, with_backup=True)
+    if tree is not index.tree:  # reverted to a copy
+        index = AttributeIndex(tree)
     # decide if images are preserved
     if "graphic" not in potential_tags:
-        tree = prune_unwanted_nodes(tree, DISCARD_IMAGE_ELEMENTS)
+        tree = prune_matching_nodes(index, DISCARD_IMAGE_MATCHERS)
     # balance precision/recall
     if options.focus != "recall":
         # teaser-class blocks are sometimes real content; keep them on the recovery path,
         # which only runs once the confident extractor has already come up short
         if not keep_teasers:
-            tree = prune_unwanted_nodes(tree, TEASER_DISCARD_XPATH)
+            tree = prune_matching_nodes(index, TEASER_DISCARD_MATCHERS)
         if favor_precision:
-            tree = prune_unwanted_nodes(tree, PRECISION_DISCARD_XPATH)
+            tree = prune_matching_nodes(index, PRECISION_DISCARD_MATCHERS)
     # remove elements by link density, several passes
+    # statistics gathered in one pass and updated on deletion
+    stats = SubtreeStats(tree)
     for _ in range(2):
-        tree = delete_by_link_density(tree, "div", backtracking=True, favor_precision=favor_precision)
-        tree = delete_by_link_density(tree, "list", backtracking=False, favor_precision=favor_precision)
-        tree = delete_by_link_density(tree, "p", backtracking=False, favor_precision=favor_precision)
+        tree = delete_by_link_density(tree, "div", backtracking=True, favor_precision=favor_precision, stats=stats)
+        tree = delete_by_link_density(tree, "list", backtracking=False, favor_precision=favor_precision, stats=stats)
+        tree = delete_by_link_density(tree, "p", backtracking=False, favor_precision=favor_precision, stats=stats)
     # tables
     if "table" in potential_tags or favor_precision:
         # collect before deleting: removing a table mid-iteration can make tree.iter() skip a table
         # that follows a deleted one containing a nested table (iterator descends into the detached subtree)
-        boilerplate_tables = [elem for elem in tree.iter("table") if link_density_test_tables(elem) is True]
-        for elem in boilerplate_tables:
-            delete_element(elem, keep_tail=False)
+        boilerplate_tables = [elem for elem in tree.iter("table") if link_density_test_tables(elem, stats) is True]
+        stats.delete(boilerplate_tables, keep_tail=False)
     if favor_precision:
         # delete trailing titles
         while len(tree) > 0 and (tree[-1].tag == "head"):
-            delete_element(tree[-1], keep_tail=False)
-        tree = delete_by_link_density(tree, "head", backtracking=False, favor_precision=True)
-        tree = delete_by_link_density(tree, "quote", backtracking=False, favor_precision=True)
+            stats.delete([tree[-1]], keep_tail=False)
+        tree = delete_by_link_density(tree, "head", backtracking=False, favor_precision=True, stats=stats)
+        tree = delete_by_link_density(tree, "quote", backtracking=False, favor_precision=True, stats=stats)
     return tree
 
 
-def _extract(tree: HtmlElement, options: Extractor) -> tuple[_Element, str, set[str]]:
+def _matches_body_expression(elem: _Element, index: int) -> bool:
+    "Test an element against the expression of BODY_MATCHERS at the given index."
+    return any(
+        elem.tag in tags and (patterns is None or any(p.search(elem.get(a, "")) for a, p in patterns.items()))
+        for tags, patterns in BODY_MATCHERS[index]
+    )
+
+
+def find_body_candidates(tree: HtmlElement) -> list[list[HtmlElement]]:
+    """Find the elements matching each expression of BODY_MATCHERS in a single tree walk,
+    in document order. The attribute patterns of all expressions are tested at once,
+    the expressions one by one only for the elements passing this test."""
+    candidates: list[list[HtmlElement]] = [[] for _ in BODY_MATCHERS]
+    for elem in tree.iter(*_BODY_TAGS):
+        # descendants only, as in .//*
+        if elem is tree:
+            continue
+        if elem.tag not in _UNCONDITIONAL_BODY_TAGS and not any(
+            p.search(elem.get(a, "")) for a, p in _COMBINED_BODY_PATTERNS.items()
+        ):
+            continue
+        for index, found in enumerate(candidates):
+            if _matches_body_expression(elem, index):
+                found.append(elem)
+    return candidates
+
+
+def _is_body_candidate(elem: _Element, tree: HtmlElement, index: int) -> bool:
+    """Check that a candidate found before the extraction started is still a match:
+    processing a previous candidate can move or rename elements."""
+    return any(ancestor is tree for ancestor in elem.iterancestors()) and _matches_body_expression(elem, index)
+
+
+def _extract(tree: HtmlElement, options: Extractor, first: int | None = None) -> tuple[_Element, str, set[str], int | None]:
     # init
     potential_tags = set(TAG_CATALOG)
     if options.tables is True:
@@ -758,10 +812,13 @@ def _extract(tree: HtmlElement, options: Extractor) -> tuple[_Element, str, set[
     if options.links is True:
         potential_tags.add("ref")
     result_body = Element("body")
-    # iterate
-    for expr in BODY_XPATH:
-        # select tree if the expression has been found
-        subtree = next((s for s in expr(tree) if s is not None), None)
+    matched = None
+    # iterate, starting with the expression learned for the website if any
+    body_candidates = find_body_candidates(tree)
+    for index in expression_order(len(body_candidates), first):
+        candidates = body_candidates[index]
+        # select tree if the expression has been found: the first candidate still there
+        subtree = next((c for c in candidates if _is_body_candidate(c, tree, index)), None)
         if subtree is None:
             continue
         # prune the subtree
@@ -802,26 +859,32 @@ def _extract(tree: HtmlElement, options: Extractor) -> tuple[_Element, str, set[
             delete_element(result_body[-1], keep_tail=False)
         # exit once there is real content, not just a lone image
         if sum(e.tag != "graphic" for e in result_body) > 1:
-            LOGGER.debug(trim(str(expr)))
+            LOGGER.debug("main content found by BODY_MATCHERS[%s]", index)
+            matched = index
             break
     temp_text = " ".join(result_body.itertext()).strip()
-    return result_body, temp_text, potential_tags
+    return result_body, temp_text, potential_tags, matched
 
 
-def extract_content(cleaned_tree: HtmlElement, options: Extractor) -> tuple[_Element, str, int]:
+def extract_content(
+    cleaned_tree: HtmlElement, options: Extractor, stats: ExtractionStats | None = None, first: int | None = None
+) -> tuple[_Element, str, int]:
     """Find the main content of a page using a set of XPath expressions,
     then extract relevant elements, strip them of unwanted subparts and
-    convert them"""
+    convert them. The expression at the position `first` is tried before the other ones."""
     # backup
-    backup_tree = deepcopy(cleaned_tree)
+    backup_tree = stats.copy_tree(cleaned_tree) if stats is not None else deepcopy(cleaned_tree)
 
-    result_body, temp_text, potential_tags = _extract(cleaned_tree, options)
+    result_body, temp_text, potential_tags, matched = _extract(cleaned_tree, options, first)
 
     # try parsing wild <p> elements if nothing found or text too short
     # todo: test precision and recall settings here
     if len(result_body) == 0 or len(temp_text) < options.min_extracted_size:
         result_body = recover_wild_text(backup_tree, result_body, options, potential_tags)
         temp_text = " ".join(result_body.itertext()).strip()
+        matched = None
+    if stats is not None:
+        stats.body_xpath = matched
     # drop substantial elements repeating the previous one (overlapping-candidate / recovery artifact);
     # length-gated so short genuine repeats stay for the dedup (#778) and tree-size guards
     previous = None
@@ -866,13 +929,14 @@ def extract_comments(tree: HtmlElement, options: Extractor) -> tuple[_Element, s
     # define iteration strategy
     potential_tags = set(TAG_CATALOG)  # 'span'
     # potential_tags.add('div') trouble with <div class="comment-author meta">
-    for expr in COMMENTS_XPATH:
+    index = AttributeIndex(tree)
+    for position, alternatives in enumerate(COMMENTS_MATCHERS):
         # select tree if the expression has been found
-        subtree = next((s for s in expr(tree) if s is not None), None)
+        subtree = next(iter(index.select(alternatives)), None)
         if subtree is None:
             continue
         # prune
-        subtree = prune_unwanted_nodes(subtree, COMMENTS_DISCARD_XPATH)
+        subtree = prune_matching_nodes(AttributeIndex(subtree), COMMENTS_DISCARD_MATCHERS)
         # todo: unified stripping function, taking include_links into account
         strip_tags(subtree, "a", "ref", "span")
         # extract content
@@ -890,7 +954,7 @@ def extract_comments(tree: HtmlElement, options: Extractor) -> tuple[_Element, s
         )
         # control
         if len(comments_body) > 0:  # if it has children
-            LOGGER.debug(expr)
+            LOGGER.debug("comments found by COMMENTS_MATCHERS[%s]", position)
             # remove corresponding subtree
             delete_element(subtree, keep_tail=False)
             break
@@ -8,7 +8,7 @@ from courlan.meta import clear_caches as reset_caches_courlan
 from htmldate.meta import reset_caches as reset_caches_htmldate
 from justext.core import define_stoplist
 
-from .deduplication import LRU_TEST, _vector_to_add, is_similar_domain
+from .deduplication import LRU_TEST, _token_hash, is_similar_domain
 from .utils import line_processing, return_printables_and_spaces, trim
 
 
@@ -27,6 +27,6 @@ def reset_caches() -> None:
     return_printables_and_spaces.cache_clear()
     trim.cache_clear()
     LRU_TEST.clear()
-    _vector_to_add.cache_clear()
+    _token_hash.cache_clear()
     # garbage collection
     gc.collect()
@@ -5,9 +5,9 @@ Module bundling all functions needed to scrape metadata from webpages.
 import json
 import logging
 import re
-from copy import deepcopy
+from collections.abc import Iterable, Iterator
 from html import unescape
-from typing import Any
+from typing import Any, Literal
 
 from courlan import (
     extract_domain,
@@ -17,24 +17,29 @@ from courlan import (
     validate_url,
 )
 from htmldate import find_date
+from htmldate.extractors import try_date_expr
+from htmldate.validators import get_max_date, get_min_date
 from lxml.etree import XPath
-from lxml.html import HtmlElement, tostring
+from lxml.html import HtmlElement
 
-from .htmlprocessing import prune_unwanted_nodes
+from .htmlprocessing import AttributeIndex
 from .json_metadata import (
     extract_json,
     extract_json_parse_error,
+    load_json,
     normalize_authors,
     normalize_json,
 )
-from .settings import Document, set_date_params
-from .utils import HTML_STRIP_TAGS, line_processing, load_html, trim
+from .profiles import SiteProfile, expression_order
+from .settings import Document, ExtractionStats, set_date_params
+from .utils import HTML_STRIP_TAGS, line_processing, load_html, load_html_head, trim
 from .xpaths import (
-    AUTHOR_DISCARD_XPATHS,
-    AUTHOR_XPATHS,
-    CATEGORIES_XPATHS,
-    TAGS_XPATHS,
-    TITLE_XPATHS,
+    AUTHOR_DISCARD_MATCHERS,
+    AUTHOR_MATCHERS,
+    CATEGORIES_MATCHERS,
+    LICENSE_MATCHERS,
+    TAGS_MATCHERS,
+    TITLE_MATCHERS,
 )
 
 __all__ = ["Document"]
@@ -125,6 +130,15 @@ METANAME_IMAGE = {
     "twitter:image",
     "twitter:image:src",
 }
+METANAME_DATE = {
+    "article:published_time",
+    "datepublished",
+    "dc.date.issued",
+    "dcterms.issued",
+    "og:article:published_time",
+    "og:published_time",
+    "publication_date",
+}
 PROPERTY_AUTHOR = {"author", "article:author"}
 TWITTER_ATTRS = {"twitter:site", "application-name"}
 
@@ -144,7 +158,52 @@ OG_PROPERTIES = {
 
 OG_AUTHOR = {"og:author", "og:article:author"}
 
-URL_SELECTORS = ['.//head//link[@rel="canonical"]', ".//head//base", './/head//link[@rel="alternate"][@hreflang="x-default"]']
+JSON_SCRIPT_TYPES = {"application/ld+json", "application/settings+json"}
+METADATA_TAGS = {"base", "link", "meta", "script", "title"}
+
+
+class MetaIndex(AttributeIndex):
+    """Attribute index of a tree, built on first lookup, which also gathers the meta,
+    link, base and title elements of the head as well as the JSON-LD scripts
+    in a single pass. The field extractors read them from there."""
+
+    __slots__ = ["bases", "links", "meta", "scripts", "title"]
+
+    def __init__(self, tree: HtmlElement) -> None:
+        super().__init__(tree)
+        # attributes of the meta elements with a content, direct children of the head flagged
+        self.meta: list[tuple[dict[str, str], bool]] = []
+        self.links: dict[str, list[dict[str, str]]] = {}
+        self.bases: list[dict[str, str]] = []
+        self.scripts: list[str] = []
+        self.title: HtmlElement | None = None
+        for elem in tree.iter(*METADATA_TAGS):
+            if elem is not tree:
+                self._collect(elem)
+
+    def _collect(self, elem: HtmlElement) -> None:
+        "Store the element if it is a JSON-LD script or a relevant element of the head."
+        if elem.tag == "script":
+            if elem.text and elem.get("type") in JSON_SCRIPT_TYPES:
+                self.scripts.append(elem.text)
+            return
+        parent = elem.getparent()
+        node = parent
+        while node is not None and node is not self.tree and node.tag != "head":
+            node = node.getparent()
+        if node is None or node is self.tree:
+            return
+        attributes = dict(elem.attrib)
+        if elem.tag == "meta":
+            if "content" in attributes:
+                self.meta.append((attributes, parent is node))
+        elif elem.tag == "link":
+            if "rel" in attributes:
+                self.links.setdefault(attributes["rel"], []).append(attributes)
+        elif elem.tag == "base":
+            self.bases.append(attributes)
+        elif self.title is None:
+            self.title = elem
 
 
 def normalize_tags(tags: str) -> str:
@@ -165,31 +224,44 @@ def check_authors(authors: str, author_blacklist: set[str]) -> str | None:
     return None
 
 
-def extract_meta_json(tree: HtmlElement, metadata: Document) -> Document:
-    """Parse and extract metadata from JSON-LD data"""
-    for elem in tree.xpath('.//script[@type="application/ld+json" or @type="application/settings+json"]'):
-        if not elem.text:
-            continue
-        element_text = normalize_json(JSON_MINIFY.sub(r"\1", elem.text))
+def extract_meta_json(tree: HtmlElement, metadata: Document, index: MetaIndex | None = None) -> Document:
+    """Parse and extract metadata from JSON-LD data, the index of the tree can be shared"""
+    if index is None:
+        index = MetaIndex(tree)
+    for text in index.scripts:
+        # no need to minify valid JSON, only the regular expressions of the fallback expect it
         try:
-            # strict=False: trim() handles \n\r\t, but strict JSON rejects the full 0x00-0x1F
-            # range; rarer control chars (from encoding issues) would otherwise raise here
-            schema = json.loads(element_text, strict=False)
-            metadata = extract_json(schema, metadata)
+            schema = load_json(normalize_json(text))
         except json.JSONDecodeError:
-            metadata = extract_json_parse_error(element_text, metadata)
+            metadata = extract_json_parse_error(normalize_json(JSON_MINIFY.sub(r"\1", text)), metadata)
+            continue
+        metadata = extract_json(schema, metadata)
     return metadata
 
 
-def extract_opengraph(tree: HtmlElement) -> dict[str, str | None]:
+def extract_meta_dates(tree: HtmlElement, index: MetaIndex | None = None) -> list[tuple[str, str]]:
+    """Gather the publication dates declared in the meta elements of the head"""
+    if index is None:
+        index = MetaIndex(tree)
+    dates = []
+    for attributes, _ in index.meta:
+        name = attributes.get("property") or attributes.get("name") or attributes.get("itemprop") or ""
+        if name.lower() in METANAME_DATE and attributes["content"].strip():
+            dates.append(("meta", attributes["content"]))
+    return dates
+
+
+def extract_opengraph(tree: HtmlElement, index: MetaIndex | None = None) -> dict[str, str | None]:
     """Search meta tags following the OpenGraph guidelines (https://ogp.me/)"""
     result = dict.fromkeys(("title", "author", "url", "description", "sitename", "image", "pagetype"))
+    if index is None:
+        index = MetaIndex(tree)
 
     # detect OpenGraph schema
-    for elem in tree.xpath('.//head/meta[starts-with(@property, "og:")]'):
-        property_name, content = elem.get("property"), elem.get("content")
+    for attributes, direct in index.meta:
+        property_name, content = attributes.get("property", ""), attributes["content"]
         # safeguard
-        if content and not content.isspace():
+        if direct and property_name.startswith("og:") and content and not content.isspace():
             if property_name in OG_PROPERTIES:
                 result[OG_PROPERTIES[property_name]] = content
             elif property_name == "og:url" and is_valid_url(content):
@@ -202,10 +274,12 @@ def extract_opengraph(tree: HtmlElement) -> dict[str, str | None]:
     return result
 
 
-def examine_meta(tree: HtmlElement) -> Document:
+def examine_meta(tree: HtmlElement, index: MetaIndex | None = None) -> Document:
     """Search meta tags for relevant information"""
+    if index is None:
+        index = MetaIndex(tree)
     # bootstrap from potential OpenGraph tags
-    metadata = Document().from_dict(extract_opengraph(tree))
+    metadata = Document().from_dict(extract_opengraph(tree, index))
 
     # test if all values not assigned in the following have already been assigned
     if all(
@@ -223,16 +297,18 @@ def examine_meta(tree: HtmlElement) -> Document:
     tags, backup_sitename = [], None
 
     # iterate through meta tags
-    for elem in tree.iterfind(".//head/meta[@content]"):
+    for attributes, direct in index.meta:
+        if not direct:
+            continue
         # content
-        content_attr = HTML_STRIP_TAGS.sub("", elem.get("content", "")).strip()
+        content_attr = HTML_STRIP_TAGS.sub("", attributes["content"]).strip()
         if not content_attr:
             continue
         # todo: image info
         # ...
         # property
-        if "property" in elem.attrib:
-            property_attr = elem.get("property", "").lower()
+        if "property" in attributes:
+            property_attr = attributes["property"].lower()
             # no opengraph a second time
             if property_attr.startswith("og:"):
                 continue
@@ -245,8 +321,8 @@ def examine_meta(tree: HtmlElement) -> Document:
             elif property_attr in METANAME_IMAGE:
                 metadata.image = metadata.image or content_attr
         # name attribute
-        elif "name" in elem.attrib:
-            name_attr = elem.get("name", "").lower()
+        elif "name" in attributes:
+            name_attr = attributes["name"].lower()
             # author
             if name_attr in METANAME_AUTHOR:
                 metadata.author = normalize_authors(metadata.author, content_attr)
@@ -271,8 +347,8 @@ def examine_meta(tree: HtmlElement) -> Document:
             # keywords
             elif name_attr in METANAME_TAG:  # 'page-topic'
                 tags.append(normalize_tags(content_attr))
-        elif "itemprop" in elem.attrib:
-            itemprop_attr = elem.get("itemprop", "").lower()
+        elif "itemprop" in attributes:
+            itemprop_attr = attributes["itemprop"].lower()
             if itemprop_attr == "author":
                 metadata.author = normalize_authors(metadata.author, content_attr)
             elif itemprop_attr == "description":
@@ -284,11 +360,8 @@ def examine_meta(tree: HtmlElement) -> Document:
             #    if title is None:
             #        title = elem.get('content')
         # other types
-        elif all(key not in elem.attrib for key in EXTRA_META):
-            LOGGER.debug(
-                "unknown attribute: %s",
-                tostring(elem, pretty_print=False, encoding="unicode").strip(),
-            )
+        elif all(key not in attributes for key in EXTRA_META):
+            LOGGER.debug("unknown attribute: %s", attributes)
 
     # backups
     metadata.sitename = metadata.sitename or backup_sitename
@@ -301,87 +374,149 @@ def examine_meta(tree: HtmlElement) -> Document:
 def extract_metainfo(tree: HtmlElement, expressions: list[XPath], len_limit: int = 200) -> str | None:
     """Extract meta information"""
     # try all XPath expressions
-    for expression in expressions:
+    return _first_metainfo((expression(tree) for expression in expressions), len_limit)
+
+
+def _first_metainfo(
+    selections: Iterator[list[HtmlElement]], len_limit: int, pruned: set[HtmlElement] | None = None
+) -> str | None:
+    "Return the first text of suitable length, trying the selections in turn, without the pruned subtrees."
+    for results in selections:
         # examine all results
-        results = expression(tree)
         for elem in results:
-            content = trim(" ".join(elem.itertext()))
+            content = trim(" ".join(_pruned_text(elem, pruned) if pruned else elem.itertext()))
             if content and 2 < len(content) < len_limit:
                 return content
         if len(results) > 1:
-            LOGGER.debug("more than one invalid result: %s %s", expression, len(results))
+            LOGGER.debug("more than one invalid result: %s", len(results))
     return None
 
 
-def examine_title_element(
-    tree: HtmlElement,
-) -> tuple[str, str | None, str | None]:
+def _pruned_text(elem: HtmlElement, pruned: set[HtmlElement]) -> Iterator[str]:
+    """Yield the text segments as itertext() would once the pruned subtrees are deleted,
+    their tail being joined to the previous segment as with xml.delete_element()."""
+    text = (elem.text or "") if isinstance(elem.tag, str) else ""
+    for child in elem:
+        if child in pruned:
+            text += child.tail or ""
+            continue
+        if text:
+            yield text
+        yield from _pruned_text(child, pruned)
+        text = child.tail or ""
+    if text:
+        yield text
+
+
+def _is_pruned(elem: HtmlElement, pruned: set[HtmlElement], tree: HtmlElement) -> bool:
+    "Tell if the element or one of its ancestors up to the root of the tree is pruned."
+    node: HtmlElement | None = elem
+    while node is not None:
+        if node in pruned:
+            return True
+        if node is tree:
+            break
+        node = node.getparent()
+    return False
+
+
+def examine_title_element(tree: HtmlElement, index: MetaIndex | None = None) -> tuple[str, str | None, str | None]:
     """Extract text segments out of main <title> element."""
     title = ""
-    title_element = tree.find(".//head//title")
-    if title_element is not None:
-        title = trim(title_element.text_content())
+    if index is None:
+        index = MetaIndex(tree)
+    if index.title is not None:
+        title = trim(index.title.text_content())
         if match := HTMLTITLE_REGEX.match(title):
             return title, match[1], match[2]
     LOGGER.debug("no main title found")
     return title, None, None
 
 
-def extract_title(tree: HtmlElement) -> str | None:
-    """Extract the document title"""
+def extract_title(tree: HtmlElement, index: MetaIndex | None = None) -> str | None:
+    """Extract the document title, the index of the tree can be shared"""
+    return _extract_title(tree, index)[0]
+
+
+def _extract_title(
+    tree: HtmlElement, index: MetaIndex | None = None, first: int | None = None
+) -> tuple[str | None, str | None]:
+    """Extract the document title and tell where it was found, see SiteProfile.
+    The expression at the position `first` is tried before the other ones."""
     # only one h1-element: take it
     h1_results = tree.findall(".//h1")
     if len(h1_results) == 1:
         title = trim(h1_results[0].text_content())
         if title:
-            return title
-    # extract using x-paths
-    title = extract_metainfo(tree, TITLE_XPATHS) or ""
-    if title:
-        return title
+            return title, "h1"
+    # extract using the attribute expressions
+    if index is None:
+        index = MetaIndex(tree)
+    for position in expression_order(len(TITLE_MATCHERS), first):
+        title = _first_metainfo(iter([index.select(TITLE_MATCHERS[position], include_root=True)]), 200) or ""
+        if title:
+            return title, str(position)
     # extract using title tag
-    title, first, second = examine_title_element(tree)
-    for t in (first, second, title):
+    title, first_part, second_part = examine_title_element(tree, index)
+    for t in (first_part, second_part, title):
         if t and "." not in t:
-            return t
+            return t, "title"
     # take first non-empty h1-title
     if h1_results:
         for h1_result in h1_results:
             title = trim(h1_result.text_content())
             if title:
-                return title
+                return title, "h1"
     # take first h2-title
     try:
         title = trim(tree.xpath(".//h2")[0].text_content())
     except IndexError:
         LOGGER.debug("no h2 title found")
-    return title or None
-
-
-def extract_author(tree: HtmlElement) -> str | None:
-    """Extract the document author(s)"""
-    subtree = prune_unwanted_nodes(deepcopy(tree), AUTHOR_DISCARD_XPATHS)
-    author = extract_metainfo(subtree, AUTHOR_XPATHS, len_limit=120)
-    if author:
-        author = normalize_authors(None, author)
-    # copyright?
-    return author
-
-
-def extract_url(tree: HtmlElement, default_url: str | None = None) -> str | None:
+    return (title, "h2") if title else (None, None)
+
+
+def extract_author(tree: HtmlElement, index: MetaIndex | None = None) -> str | None:
+    """Extract the document author(s), the index of the tree can be shared.
+    The discarded sections are left out instead of being deleted from a copy."""
+    return _extract_author(tree, index)[0]
+
+
+def _extract_author(
+    tree: HtmlElement, index: MetaIndex | None = None, first: int | None = None
+) -> tuple[str | None, str | None]:
+    """Extract the document author(s) and the position of the expression which found them,
+    the one at the position `first` is tried before the other ones."""
+    if index is None:
+        index = MetaIndex(tree)
+    pruned = {elem for alternatives in AUTHOR_DISCARD_MATCHERS for elem in index.select(alternatives)}
+    for position in expression_order(len(AUTHOR_MATCHERS), first):
+        selection = [
+            elem for elem in index.select(AUTHOR_MATCHERS[position], include_root=True) if not _is_pruned(elem, pruned, tree)
+        ]
+        author = _first_metainfo(iter([selection]), 120, pruned)
+        if author:
+            # copyright?
+            return normalize_authors(None, author), str(position)
+    return None, None
+
+
+def extract_url(tree: HtmlElement, default_url: str | None = None, index: MetaIndex | None = None) -> str | None:
     """Extract the URL from the canonical link"""
-    for selector in URL_SELECTORS:
-        element = tree.find(selector)
-        url = element.attrib.get("href") if element is not None else None
+    if index is None:
+        index = MetaIndex(tree)
+    # canonical link, base element and default alternate link
+    alternates = [link for link in index.links.get("alternate", []) if link.get("hreflang") == "x-default"]
+    for candidates in (index.links.get("canonical", []), index.bases, alternates):
+        url = candidates[0].get("href") if candidates else None
         if url:
             break
 
     # fix relative URLs
     if url and url.startswith("/"):
-        for element in tree.iterfind(".//head//meta[@content]"):
-            attrtype = element.get("name") or element.get("property") or ""
+        for attributes, _ in index.meta:
+            attrtype = attributes.get("name") or attributes.get("property") or ""
             if attrtype.startswith(("og:", "twitter:")):
-                base_url = get_base_url(element.attrib["content"])
+                base_url = get_base_url(attributes["content"])
                 if base_url:
                     # prepend URL
                     url = base_url + url
@@ -395,27 +530,40 @@ def extract_url(tree: HtmlElement, default_url: str | None = None) -> str | None
     return url or default_url
 
 
-def extract_sitename(tree: HtmlElement) -> str | None:
+def extract_sitename(tree: HtmlElement, index: MetaIndex | None = None) -> str | None:
     """Extract the name of a site from the main title (if it exists)"""
-    _, *parts = examine_title_element(tree)
+    _, *parts = examine_title_element(tree, index)
     return next((part for part in parts if part and "." in part), None)
 
 
-def extract_catstags(metatype: str, tree: HtmlElement) -> list[str]:
-    """Find category and tag information"""
+def _links_within(containers: Iterable[HtmlElement]) -> list[HtmlElement]:
+    "Links with a target below the containers, in document order."
+    return list(
+        dict.fromkeys(
+            link for container in containers for link in container.iterdescendants("a") if link.get("href") is not None
+        )
+    )
+
+
+def extract_catstags(metatype: str, tree: HtmlElement, index: MetaIndex | None = None) -> list[str]:
+    """Find category and tag information, the attribute index of the tree can be shared"""
     results: list[str] = []
     regexpr = "/" + metatype.rstrip("y") + "(?:y|ies|s)?/"
-    xpath_expression = CATEGORIES_XPATHS if metatype == "category" else TAGS_XPATHS
+    matchers = CATEGORIES_MATCHERS if metatype == "category" else TAGS_MATCHERS
+    if index is None:
+        index = MetaIndex(tree)
     # search using custom expressions
-    for catexpr in xpath_expression:
-        results.extend(elem.text_content() for elem in catexpr(tree) if re.search(regexpr, elem.attrib["href"]))
+    for alternatives in matchers:
+        links = _links_within(index.select(alternatives, include_root=True))
+        results.extend(elem.text_content() for elem in links if re.search(regexpr, elem.attrib["href"]))
         if results:
             break
     # category fallback
     if metatype == "category" and not results:
         results.extend(
-            element.attrib["content"]
-            for element in tree.xpath('.//head//meta[@property="article:section" or contains(@name, "subject")][@content]')
+            attributes["content"]
+            for attributes, _ in index.meta
+            if attributes.get("property") == "article:section" or "subject" in attributes.get("name", "")
         )
         # optional: search through links
         # if not results:
@@ -442,36 +590,96 @@ def parse_license_element(element: HtmlElement, strict: bool = False) -> str | N
     return None
 
 
-def extract_license(tree: HtmlElement) -> str | None:
+def extract_license(tree: HtmlElement, index: MetaIndex | None = None) -> str | None:
     """Search the HTML code for license information and parse it."""
+    if index is None:
+        index = MetaIndex(tree)
     # look for links labeled as license
-    for element in tree.findall('.//a[@rel="license"][@href]'):
+    for element in index.select(LICENSE_MATCHERS[0]):
+        if element.get("href") is None:
+            continue
         result = parse_license_element(element, strict=False)
         if result is not None:
             return result
     # probe footer elements for CC links
-    for element in tree.xpath('.//footer//a[@href]|.//div[contains(@class, "footer") or contains(@id, "footer")]//a[@href]'):
+    for element in _links_within(index.select(LICENSE_MATCHERS[1])):
         result = parse_license_element(element, strict=True)
         if result is not None:
             return result
     return None
 
 
+def validate_date_candidates(candidates: list[tuple[str, str]] | None, date_config: dict[str, Any]) -> list[tuple[str, str]]:
+    "Convert the date candidates with htmldate's settings and keep the valid ones."
+    if not candidates:
+        return []
+    outputformat = date_config.get("outputformat", "%Y-%m-%d")
+    min_date, max_date = get_min_date(date_config.get("min_date")), get_max_date(date_config.get("max_date"))
+    converted = ((source, try_date_expr(value, outputformat, False, min_date, max_date)) for source, value in candidates)
+    return [(source, date) for source, date in converted if date]
+
+
+def extract_date(
+    tree: HtmlElement,
+    metadata: Document,
+    date_config: dict[str, Any],
+    stats: ExtractionStats | None = None,
+    profile: SiteProfile | None = None,
+) -> Document:
+    """Find the date with htmldate and record its source. The publication dates declared in the
+    markup are used if htmldate finds none. With a time budget, or if the profile of the website
+    shows that the fast search is enough, they are tried before htmldate's extensive search,
+    the costly part of the process, which is skipped once the budget is spent."""
+    date_config = {**date_config, "url": metadata.url}
+    extensive = date_config.get("extensive_search", True)
+    learned = profile.learned("date") if profile is not None and extensive else None
+    deferred = extensive and (learned == "fast" or (stats is not None and stats.deadline is not None))
+    metadata.date = find_date(tree, **({**date_config, "extensive_search": False} if deferred else date_config))
+    search = "fast" if deferred else "extensive"
+
+    candidates = validate_date_candidates(metadata.date_candidates, date_config)
+    # the candidates are publication dates, they do not stand in for the last update
+    if metadata.date is None and candidates and date_config.get("original_date"):
+        metadata.date_source, metadata.date = candidates[0]
+        return metadata
+    if metadata.date is None and deferred and (stats is None or not stats.expired("date_search")):
+        metadata.date = find_date(tree, **date_config)
+        search = "extensive"
+
+    if metadata.date:
+        metadata.date_source = next((source for source, date in candidates if date == metadata.date), "htmldate")
+
+    if profile is not None and extensive:
+        # the fast search reads the dates declared in the markup: no need to run it to know that it is enough
+        if not deferred and metadata.date_source in ("meta", "json-ld"):
+            search = "fast"
+        profile.record("date", search)
+    return metadata
+
+
 def extract_metadata(
-    filecontent: HtmlElement | str,
+    filecontent: HtmlElement | str | bytes,
     default_url: str | None = None,
     date_config: dict[str, Any] | None = None,
     extensive: bool = True,
     author_blacklist: set[str] | None = None,
+    scope: Literal["full", "head"] = "full",
+    stats: ExtractionStats | None = None,
+    profile: SiteProfile | None = None,
 ) -> Document:
     """Main process for metadata extraction.
 
     Args:
-        filecontent: HTML code as string or parsed tree.
+        filecontent: HTML code as string, bytes or parsed tree.
         default_url: Previously known URL of the downloaded document.
         date_config: Provide extraction parameters to htmldate as dict().
         extensive: Use extensive search for date extraction.
         author_blacklist: Provide a blacklist of Author Names as set() to filter out authors.
+        scope: "head" to only parse the head and the JSON-LD blocks of the document,
+            the whole document is used if the title, the author or the date are not found there.
+        stats: Bookkeeping of the extraction, its time budget also applies to the date search.
+        profile: Profile of the website, records how the title, the author and the date were found
+            and tells which expression to try first and if htmldate's fast search is enough.
 
     Returns:
         A trafilatura.settings.Document containing the extracted metadata information.
@@ -481,53 +689,90 @@ def extract_metadata(
     author_blacklist = author_blacklist or set()
     date_config = {**date_config} if date_config else set_date_params(extensive)
 
+    if scope == "head":
+        tree = load_html_head(filecontent)
+        if tree is None:
+            return Document()
+        # the extensive date search is meant for the body, the profile is only updated with complete results
+        metadata = _extract_metadata(tree, default_url, {**date_config, "extensive_search": False}, author_blacklist, stats)
+        if metadata.title and metadata.author and (metadata.date or not date_config.get("extensive_search")):
+            return metadata
+        LOGGER.debug("metadata not found in the head: %s", default_url)
+
     # load contents
     tree = load_html(filecontent)
     if tree is None:
         return Document()
+    return _extract_metadata(tree, default_url, date_config, author_blacklist, stats, profile)
+
+
+def _extract_metadata(
+    tree: HtmlElement,
+    default_url: str | None,
+    date_config: dict[str, Any],
+    author_blacklist: set[str],
+    stats: ExtractionStats | None = None,
+    profile: SiteProfile | None = None,
+) -> Document:
+    "Extract the metadata fields from the tree, see extract_metadata()."
+    # the elements and attributes used by the extractors are gathered at once
+    index = MetaIndex(tree)
 
     # initialize dict and try to strip meta tags
-    metadata = examine_meta(tree)
+    metadata = examine_meta(tree, index)
+    metadata.date_candidates = extract_meta_dates(tree, index)
 
     # to check: remove it and replace with author_blacklist in test case
     if metadata.author and " " not in metadata.author:
         metadata.author = None
+    meta_title, meta_author = metadata.title, metadata.author
 
     # fix: try json-ld metadata and override
     try:
-        metadata = extract_meta_json(tree, metadata)
+        metadata = extract_meta_json(tree, metadata, index)
     except Exception as err:  # bugs in json_metadata.py
         LOGGER.warning("error in JSON metadata extraction: %s", err)
 
-    # title
+    # where the title and the author come from, for the profile of the website
+    title_source = ("meta" if metadata.title == meta_title else "json-ld") if metadata.title else None
+    author_source = ("meta" if metadata.author == meta_author else "json-ld") if metadata.author else None
+
+    # title, the expression learned for the website is tried first
     if not metadata.title:
-        metadata.title = extract_title(tree)
+        first = profile.learned_position("title", len(TITLE_MATCHERS)) if profile is not None else None
+        metadata.title, title_source = _extract_title(tree, index, first)
 
     # check author in blacklist
     if metadata.author and author_blacklist:
         metadata.author = check_authors(metadata.author, author_blacklist)
     # author
     if not metadata.author:
-        metadata.author = extract_author(tree)
+        first = profile.learned_position("author", len(AUTHOR_MATCHERS)) if profile is not None else None
+        metadata.author, author_source = _extract_author(tree, index, first)
     # recheck author in blacklist
     if metadata.author and author_blacklist:
         metadata.author = check_authors(metadata.author, author_blacklist)
 
+    if profile is not None:
+        if metadata.title and title_source:
+            profile.record("title", title_source)
+        if metadata.author and author_source:
+            profile.record("author", author_source)
+
     # url
     if not metadata.url:
-        metadata.url = extract_url(tree, default_url)
+        metadata.url = extract_url(tree, default_url, index)
 
     # hostname
     if metadata.url:
         metadata.hostname = extract_domain(metadata.url, fast=True)
 
     # extract date with external module htmldate
-    date_config["url"] = metadata.url
-    metadata.date = find_date(tree, **date_config)
+    metadata = extract_date(tree, metadata, date_config, stats, profile)
 
     # sitename
     if not metadata.sitename:
-        metadata.sitename = extract_sitename(tree)
+        metadata.sitename = extract_sitename(tree, index)
     if metadata.sitename:
         # scrap Twitter ID
         metadata.sitename = metadata.sitename.lstrip("@")
@@ -542,14 +787,14 @@ def extract_metadata(
 
     # categories
     if not metadata.categories:
-        metadata.categories = extract_catstags("category", tree)
+        metadata.categories = extract_catstags("category", tree, index)
 
     # tags
     if not metadata.tags:
-        metadata.tags = extract_catstags("tag", tree)
+        metadata.tags = extract_catstags("tag", tree, index)
 
     # license
-    metadata.license = extract_license(tree)
+    metadata.license = extract_license(tree, index)
 
     # safety checks
     metadata.filedate = date_config.get("max_date")
@@ -0,0 +1,161 @@
+"""
+Site profiles: per-website record of how the main content and the metadata were found,
+learned along the way so that the next pages of a website try the same way first
+and skip the costly part of the date search, and optionally stored between runs.
+"""
+
+import json
+import logging
+import os
+from operator import itemgetter
+from pathlib import Path
+from threading import Lock, RLock
+from typing import Any
+from urllib.parse import urlsplit
+
+LOGGER = logging.getLogger(__name__)
+
+# a source is learned once it supplied the field on enough pages of the website
+PROFILE_MIN_SAMPLES = 3
+PROFILE_MIN_SHARE = 0.8
+# the counts are halved beyond this number of pages, so that a new template is learned
+PROFILE_MAX_SAMPLES = 50
+
+
+def expression_order(count: int, first: int | None = None) -> list[int]:
+    "Return the positions of a list of expressions in the order they are tried, the learned one first."
+    order = list(range(count))
+    if first is not None:
+        order.insert(0, order.pop(first))
+    return order
+
+
+class SiteProfile:
+    """Count how often each source supplied a field on the pages of a website:
+    the date search of htmldate which was enough ("date": "fast" or "extensive"),
+    the expression of BODY_XPATH which found the main content ("body": its position),
+    the origin of the title and the author ("meta", "json-ld" or the position of the
+    expression in TITLE_XPATHS and AUTHOR_XPATHS, for the title also "h1", "title" and "h2").
+    A source is learned if it is by far the most frequent one. The counts can be
+    updated by several threads at once."""
+
+    __slots__ = ["_lock", "_recorded", "fields"]
+
+    def __init__(self, fields: dict[str, dict[str, int]] | None = None) -> None:
+        self.fields: dict[str, dict[str, int]] = fields or {}
+        # counts recorded since the last call to take_recorded()
+        self._recorded: dict[str, dict[str, int]] = {}
+        self._lock = Lock()
+
+    def record(self, field: str, source: str, count: int = 1) -> None:
+        "Count the source which supplied the field on a page, or on a number of pages."
+        with self._lock:
+            counts = self.fields.setdefault(field, {})
+            counts[source] = counts.get(source, 0) + count
+            if sum(counts.values()) > PROFILE_MAX_SAMPLES:
+                self.fields[field] = {key: value // 2 for key, value in counts.items() if value > 1}
+            recorded = self._recorded.setdefault(field, {})
+            recorded[source] = recorded.get(source, 0) + count
+
+    def take_recorded(self) -> dict[str, dict[str, int]]:
+        "Return the counts recorded since the last call and start again."
+        with self._lock:
+            recorded, self._recorded = self._recorded, {}
+        return recorded
+
+    def learned(self, field: str) -> str | None:
+        "Return the source to try first for the field, None if it is not known yet."
+        with self._lock:
+            counts = self.fields.get(field)
+            if not counts:
+                return None
+            source, count = max(counts.items(), key=itemgetter(1))
+            total = sum(counts.values())
+        if count >= PROFILE_MIN_SAMPLES and count >= PROFILE_MIN_SHARE * total:
+            return source
+        return None
+
+    def learned_position(self, field: str, count: int) -> int | None:
+        "Return the position of the expression learned for the field among `count` ones, None if there is none."
+        source = self.learned(field)
+        if source is None or not source.isdigit() or int(source) >= count:
+            return None
+        return int(source)
+
+    def as_dict(self) -> dict[str, dict[str, int]]:
+        "Return a copy of the counts."
+        with self._lock:
+            return {field: dict(counts) for field, counts in self.fields.items()}
+
+
+class SiteProfiles:
+    """Site profiles by host name, shared between documents by the extraction options
+    (Extractor(profiles=...)). They are loaded from a JSON file if a path is given
+    and written to it with save(). Worker processes get a copy of the profiles,
+    what they learn is sent back with take_recorded() and added with merge()."""
+
+    __slots__ = ["_lock", "path", "profiles"]
+
+    def __init__(self, path: str | None = None) -> None:
+        self.path: str | None = path
+        self.profiles: dict[str, SiteProfile] = {}
+        self._lock = RLock()
+        if path is not None and Path(path).expanduser().is_file():
+            self.load(path)
+
+    def __reduce__(self) -> tuple[type["SiteProfiles"], tuple[None], dict[str, Any]]:
+        # the lock stays in this process
+        return (self.__class__, (None,), {"path": self.path, "profiles": self.as_dict()})
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.path = state["path"]
+        self.profiles = {host: SiteProfile(fields) for host, fields in state["profiles"].items()}
+
+    def __len__(self) -> int:
+        return len(self.profiles)
+
+    def get(self, url: str | None) -> SiteProfile | None:
+        "Return the profile of the website the URL belongs to, None without URL."
+        host = urlsplit(url).hostname if url else None
+        if not host:
+            return None
+        with self._lock:
+            return self.profiles.setdefault(host, SiteProfile())
+
+    def as_dict(self) -> dict[str, dict[str, dict[str, int]]]:
+        "Convert the profiles to a dictionary, e.g. to export them as JSON."
+        with self._lock:
+            return {host: profile.as_dict() for host, profile in self.profiles.items()}
+
+    def take_recorded(self) -> dict[str, dict[str, dict[str, int]]]:
+        "Return the counts recorded since the last call by host name and start again."
+        with self._lock:
+            profiles = list(self.profiles.items())
+        return {host: recorded for host, profile in profiles if (recorded := profile.take_recorded())}
+
+    def merge(self, recorded: dict[str, dict[str, dict[str, int]]]) -> None:
+        "Add the counts recorded by another copy of the profiles, see take_recorded()."
+        for host, fields in recorded.items():
+            with self._lock:
+                profile = self.profiles.setdefault(host, SiteProfile())
+            for field, counts in fields.items():
+                for source, count in counts.items():
+                    profile.record(field, source, count)
+
+    def load(self, path: str) -> None:
+        "Add the profiles stored in a JSON file, replacing the known ones."
+        data = json.loads(Path(path).expanduser().read_text(encoding="utf-8"))
+        with self._lock:
+            self.profiles.update({host: SiteProfile(fields) for host, fields in data.items()})
+
+    def save(self, path: str | None = None) -> None:
+        "Write the profiles to a JSON file, by default the one they were loaded from."
+        path = path or self.path
+        if path is None:
+            raise ValueError("no file to save the site profiles to")
+        target = Path(path).expanduser()
+        temporary = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        temporary.write_text(json.dumps(self.as_dict()), encoding="utf-8")
+        # atomic replacement, the previous file stays complete in case of failure
+        temporary.replace(target)
+        LOGGER.debug("%s site profiles written to %s", len(self), target)
@@ -20,6 +20,7 @@ License of forked code: Apache-2.0.
 import logging
 import re
 from dataclasses import dataclass
+from functools import lru_cache
 from math import sqrt
 from operator import attrgetter
 from typing import Any
@@ -68,6 +69,24 @@ FRAME_TAGS = {"body", "html"}
 LIST_TAGS = {"ol", "ul"}
 
 
+# class and id values recur throughout a document: each distinct one is tested once
+@lru_cache(maxsize=2**12)
+def attribute_weight(value: str) -> int:
+    "Score a class or id value on negative and positive hints."
+    weight = 0
+    if REGEXES["negativeRe"].search(value):
+        weight -= 25
+    if REGEXES["positiveRe"].search(value):
+        weight += 25
+    return weight
+
+
+@lru_cache(maxsize=2**12)
+def is_unlikely_candidate(attrs: str) -> bool:
+    "Tell if class and id values hint at boilerplate and not at content."
+    return bool(REGEXES["unlikelyCandidatesRe"].search(attrs)) and not REGEXES["okMaybeItsACandidateRe"].search(attrs)
+
+
 def text_length(elem: HtmlElement) -> int:
     "Return the length of the element with all its contents."
     return len(trim(elem.text_content()))
@@ -228,13 +247,7 @@ class Document:
         return candidates
 
     def class_weight(self, elem: HtmlElement) -> float:
-        weight = 0
-        for attribute in filter(None, (elem.get("class"), elem.get("id"))):
-            if REGEXES["negativeRe"].search(attribute):
-                weight -= 25
-            if REGEXES["positiveRe"].search(attribute):
-                weight += 25
-        return weight
+        return sum(map(attribute_weight, filter(None, (elem.get("class"), elem.get("id")))))
 
     def score_node(self, elem: HtmlElement) -> Candidate:
         score = self.class_weight(elem)
@@ -255,11 +268,7 @@ class Document:
             attrs = " ".join(filter(None, (elem.get("class"), elem.get("id"))))
             if len(attrs) < 2:
                 continue
-            if (
-                elem.tag not in FRAME_TAGS
-                and REGEXES["unlikelyCandidatesRe"].search(attrs)
-                and (not REGEXES["okMaybeItsACandidateRe"].search(attrs))
-            ):
+            if elem.tag not in FRAME_TAGS and is_unlikely_candidate(attrs):
                 # LOGGER.debug("Removing unlikely candidate: %s", elem.tag)
                 elem.drop_tree()
 
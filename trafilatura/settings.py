@@ -6,15 +6,25 @@ Listing a series of settings that are applied module-wide.
 import argparse
 import logging
 import os
+import re
+import warnings
 from configparser import ConfigParser
+from copy import copy
 from datetime import datetime
+from hashlib import blake2b
 from html import unescape
 from pathlib import Path
+from time import perf_counter, process_time
+from types import MappingProxyType
 from typing import Any
 
 from lxml.etree import Element, XPath, _Element
 
+from .cache import ResultCache, SegmentCounter, SegmentStore
+from .profiles import SiteProfiles
+from .simhash_index import SimhashIndex
 from .utils import line_processing
+from .xpaths import AttributeAlternatives
 
 LOGGER = logging.getLogger(__name__)
 
@@ -66,6 +76,25 @@ def _get_optional_int(config: ConfigParser, option: str) -> int | None:
     return int(value) if value.isdigit() else None
 
 
+# left out of the options fingerprint: per-document fields (see DocumentContext),
+# logging label and bookkeeping, which do not change the result for a given document,
+# and the site profiles and the stores of the deduplication, which hold what was seen before:
+# they change the results, which are then not cached (see cache.cache_key)
+FINGERPRINT_EXCLUDED = frozenset({"cache", "dedup_store", "encoding", "profiles", "simhash_index", "source", "trace", "url"})
+
+
+def _stable_value(slot: str, value: Any) -> Any:
+    "Convert an option value to a representation which does not depend on the process."
+    if isinstance(value, ConfigParser):
+        return [(section, sorted(value.items(section, raw=True))) for section in ("DEFAULT", *value.sections())]
+    if isinstance(value, (set, frozenset)):
+        return sorted(value)
+    if slot == "date_params":
+        # the reference date is per document
+        return sorted((key, val) for key, val in value.items() if key != "max_date")
+    return value
+
+
 # not a dataclass: __init__ contains real logic
 class Extractor:
     "Defines a class to store all extraction options."
@@ -75,6 +104,7 @@ class Extractor:
         # general
         "format",
         "fast",
+        "auto_fast",
         "focus",
         "comments",
         "formatting",
@@ -91,13 +121,20 @@ class Extractor:
         # deduplication
         "min_duplcheck_size",
         "max_repetitions",
+        "dedup_store",
+        "simhash_index",
         # rest
         "max_file_size",
         "min_file_size",
         "max_tree_size",
+        "deadline_ms",
+        "trace",
+        "cache",
+        "profiles",
         # meta
         "source",
         "url",
+        "encoding",
         "with_metadata",
         "only_with_metadata",
         "tei_validation",
@@ -121,7 +158,7 @@ class Extractor:
         *,
         config: ConfigParser = DEFAULT_CONFIG,
         output_format: str = "txt",
-        fast: bool = False,
+        fast: bool | str = False,
         precision: bool = False,
         recall: bool = False,
         comments: bool = True,
@@ -133,12 +170,19 @@ class Extractor:
         lang: str | None = None,
         url: str | None = None,
         source: str | None = None,
+        encoding: str | None = None,
         with_metadata: bool = False,
         only_with_metadata: bool = False,
         tei_validation: bool = False,
         author_blacklist: set[str] | None = None,
         url_blacklist: set[str] | None = None,
         date_params: dict[str, str] | None = None,
+        trace: bool = False,
+        cache: ResultCache | None = None,
+        deadline_ms: int | None = None,
+        profiles: SiteProfiles | None = None,
+        dedup_store: SegmentCounter | None = None,
+        simhash_index: SimhashIndex | None = None,
     ) -> None:
         if precision and recall:
             LOGGER.warning("'precision' and 'recall' are mutually exclusive, 'recall' takes precedence")
@@ -150,7 +194,9 @@ class Extractor:
             LOGGER.warning("include_formatting has no effect on JSON output")
         # single normalization point: an explicit config=None falls back to defaults
         self._add_config(config or DEFAULT_CONFIG)
-        self.fast: bool = fast
+        # "auto": skip the comparison with external extractors where it is predicted to be useless
+        self.auto_fast: bool = fast == "auto"
+        self.fast: bool = bool(fast) and not self.auto_fast
         self.focus: str = "recall" if recall else "precision" if precision else "balanced"
         self.comments: bool = comments
         # markdown implies formatting by default, but an explicit formatting=False is honored
@@ -159,8 +205,14 @@ class Extractor:
         self.images: bool = images
         self.tables: bool = tables
         self.dedup: bool = dedup
+        # where the segments seen by the deduplication are counted, by default in memory
+        self.dedup_store: SegmentCounter | None = dedup_store
+        # documents within a few bits of one seen before are discarded
+        self.simhash_index: SimhashIndex | None = simhash_index
         self.lang: str | None = lang
         self.url: str | None = url
+        # declared encoding of the input, used if it fits (see utils.decode_file)
+        self.encoding: str | None = encoding
         self.only_with_metadata: bool = only_with_metadata
         self.tei_validation: bool = tei_validation
         self.author_blacklist: set[str] = author_blacklist or set()
@@ -172,6 +224,13 @@ class Extractor:
             self.config.getboolean("DEFAULT", "EXTENSIVE_DATE_SEARCH")
         )
         self.max_tree_size: int | None = _get_optional_int(self.config, "MAX_TREE_SIZE")
+        # 0 in the config file means no limit
+        self.deadline_ms: int | None = (
+            deadline_ms if deadline_ms is not None else _get_optional_int(self.config, "EXTRACTION_DEADLINE_MS") or None
+        )
+        self.trace: bool = trace
+        self.cache: ResultCache | None = cache
+        self.profiles: SiteProfiles | None = profiles
 
     def _set_source(self, url: str | None, source: str | None) -> None:
         "Set the source attribute in a robust way."
@@ -190,13 +249,136 @@ class Extractor:
             setattr(self, key, config.getint("DEFAULT", value))
         self.config = config
 
+    def fingerprint(self) -> str:
+        """Return a stable hash of the options which can change the result of an extraction.
+        Per-document fields (URL, source, reference date) are left out."""
+        # date parameters only matter for the metadata
+        excluded = FINGERPRINT_EXCLUDED if self.with_metadata else FINGERPRINT_EXCLUDED | {"date_params"}
+        values = [(slot, _stable_value(slot, getattr(self, slot))) for slot in Extractor.__slots__ if slot not in excluded]
+        return blake2b(repr(values).encode("utf-8"), digest_size=16).hexdigest()
+
+    def with_(self, **changes: Any) -> "Extractor":
+        """Derive options from these ones without running the initialization again,
+        e.g. options.with_(focus="recall"). Keywords are attribute names."""
+        derived = copy(self)
+        for key, value in changes.items():
+            object.__setattr__(derived, key, value)
+        return derived
+
+    def with_context(self, context: "DocumentContext | None") -> "Extractor":
+        "Derive options carrying the information on a particular document, the options themselves stay untouched."
+        if context is None:
+            return self
+        changes: dict[str, Any] = {"url": context.url or self.url, "source": context.source or context.url or self.source}
+        if context.encoding:
+            changes["encoding"] = context.encoding
+        if context.max_date:
+            changes["date_params"] = {**self.date_params, "max_date": context.max_date}
+        return self.with_(**changes)
+
+    def freeze(self) -> "FrozenExtractor":
+        "Return an immutable and hashable version of the options."
+        if isinstance(self, FrozenExtractor):
+            return self
+        frozen = FrozenExtractor.__new__(FrozenExtractor)
+        for slot in Extractor.__slots__:
+            object.__setattr__(frozen, slot, getattr(self, slot))
+        _freeze(frozen, Extractor.fingerprint(frozen))
+        return frozen
+
+
+class FrozenExtractor(Extractor):
+    """Immutable and hashable extraction options, see Extractor.freeze().
+    One instance can be shared between threads or sent once to worker processes,
+    per-document information being passed separately (DocumentContext)."""
+
+    __slots__ = ["_fingerprint"]
+
+    _fingerprint: str | None
+
+    def __init__(self, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        _freeze(self, Extractor.fingerprint(self))
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        # attributes are only set during initialization
+        if hasattr(self, "_fingerprint"):
+            raise AttributeError(f"frozen options, use with_({name}=...) to derive new ones")
+        object.__setattr__(self, name, value)
+
+    def __getstate__(self) -> dict[str, Any]:
+        state = {slot: getattr(self, slot) for slot in (*Extractor.__slots__, "_fingerprint")}
+        state["date_params"] = dict(state["date_params"])
+        return state
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        for key, value in state.items():
+            object.__setattr__(self, key, value)
+        object.__setattr__(self, "date_params", MappingProxyType(self.date_params))
+
+    def __hash__(self) -> int:
+        return hash(self.fingerprint())
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, FrozenExtractor)
+            and self.fingerprint() == other.fingerprint()
+            and all(getattr(self, slot) == getattr(other, slot) for slot in (*FINGERPRINT_EXCLUDED, "date_params"))
+        )
+
+    def fingerprint(self) -> str:
+        fingerprint = self._fingerprint
+        if fingerprint is None:
+            fingerprint = Extractor.fingerprint(self)
+            object.__setattr__(self, "_fingerprint", fingerprint)
+        return fingerprint
+
+    def with_(self, **changes: Any) -> "FrozenExtractor":
+        derived = copy(self)
+        for key, value in changes.items():
+            object.__setattr__(derived, key, value)
+        # per-document fields, the reference date included, leave the fingerprint unchanged,
+        # otherwise it is computed again on demand
+        per_document = changes.keys() <= FINGERPRINT_EXCLUDED | {"date_params"} and _stable_value(
+            "date_params", derived.date_params
+        ) == _stable_value("date_params", self.date_params)
+        _freeze(derived, self._fingerprint if per_document else None)
+        return derived
+
+
+def _freeze(options: FrozenExtractor, fingerprint: str | None) -> None:
+    "Make the container attributes immutable and store the fingerprint (None: computed on demand)."
+    object.__setattr__(options, "author_blacklist", frozenset(options.author_blacklist))
+    object.__setattr__(options, "url_blacklist", frozenset(options.url_blacklist))
+    object.__setattr__(options, "date_params", MappingProxyType(dict(options.date_params)))
+    object.__setattr__(options, "_fingerprint", fingerprint)
+
+
+class DocumentContext:
+    "Per-document information passed along with extraction options shared between documents."
+
+    __slots__ = ["encoding", "max_date", "source", "url"]
+
+    def __init__(
+        self, url: str | None = None, source: str | None = None, max_date: str | None = None, encoding: str | None = None
+    ) -> None:
+        self.url: str | None = url
+        self.source: str | None = source
+        # reference date for the metadata (YYYY-MM-DD), e.g. the date of a downloaded file
+        self.max_date: str | None = max_date
+        # declared encoding of the input, e.g. from the HTTP headers
+        self.encoding: str | None = encoding
+
+    def __repr__(self) -> str:
+        return f"DocumentContext(url={self.url!r}, source={self.source!r}, max_date={self.max_date!r}, encoding={self.encoding!r})"
+
 
 def args_to_extractor(args: argparse.Namespace, url: str | None = None) -> Extractor:
     "Derive extractor configuration from CLI args."
     return Extractor(
         config=use_config(filename=args.config_file),
         output_format=args.output_format,
-        fast=args.fast,
+        fast=args.fast or ("auto" if args.auto_fast else False),
         formatting=args.formatting,
         precision=args.precision,
         recall=args.recall,
@@ -210,6 +392,11 @@ def args_to_extractor(args: argparse.Namespace, url: str | None = None) -> Extra
         with_metadata=args.with_metadata,
         only_with_metadata=args.only_with_metadata,
         tei_validation=args.validate_tei,
+        trace=bool(args.trace),
+        cache=ResultCache(args.cache_dir) if args.cache_dir else None,
+        profiles=SiteProfiles(args.site_profiles) if args.site_profiles else None,
+        dedup_store=SegmentStore(args.dedup_store) if args.dedup_store else None,
+        simhash_index=SimhashIndex(args.simhash_index) if args.simhash_index else None,
     )
 
 
@@ -249,6 +436,9 @@ class Document:
         "pagetype",
         "filedate",
         # 'locale'?
+        "stats",  # extraction bookkeeping, not an output field (see OUTPUT_EXCLUDED)
+        "date_candidates",  # publication dates declared in the markup, as (source, value)
+        "date_source",  # where the date comes from: "meta", "json-ld" or "htmldate"
     ]
 
     def __init__(
@@ -297,6 +487,9 @@ class Document:
         self.image: str | None = image
         self.pagetype: str | None = pagetype
         self.filedate: str | None = filedate
+        self.stats: ExtractionStats | None = None
+        self.date_candidates: list[tuple[str, str]] | None = None
+        self.date_source: str | None = None
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "Document":
@@ -321,12 +514,104 @@ class Document:
     def as_dict(self) -> dict[str, Any]:
         "Convert the document to a dictionary."
         # heterogeneous value types (str, list, lxml _Element, None)
-        return {attr: getattr(self, attr, None) for attr in self.__slots__}
+        return {attr: getattr(self, attr, None) for attr in self.__slots__ if attr not in OUTPUT_EXCLUDED}
+
+
+# Document slots carrying bookkeeping rather than extracted data: left out of dict/JSON output
+OUTPUT_EXCLUDED = frozenset({"date_candidates", "date_source", "stats"})
+
+
+class ExtractionStats:
+    """Per-document bookkeeping of the extraction cascade, attached to the returned Document.
+    Whole-tree copies are the main memory cost of the cascade: they are counted, so that a copy
+    budget can be checked per document. The branch of the cascade which supplied the text is
+    always recorded; the number of nodes copied and per-stage timings are only collected
+    if tracing is enabled (Extractor(trace=True)).
+    With a time budget (Extractor(deadline_ms=...)), the fallback stages skipped
+    once it is spent are listed and the result is marked as degraded.
+    In auto fast mode (Extractor(fast="auto")), the stages bypassed as predicted useless are listed too.
+    The index of the BODY_MATCHERS expression which found the main content is kept, None if it was
+    recovered from wild text, as well as the source of the date if metadata are extracted."""
+
+    __slots__ = [
+        "body_xpath",
+        "branch",
+        "bypassed",
+        "copied_nodes",
+        "copies",
+        "date_source",
+        "deadline",
+        "skipped",
+        "stages",
+    ]
+
+    def __init__(self, trace: bool = False, deadline_ms: int | None = None) -> None:
+        self.copies: int = 0
+        self.copied_nodes: int = 0
+        self.branch: str | None = None
+        self.body_xpath: int | None = None
+        self.date_source: str | None = None
+        self.stages: list[dict[str, Any]] | None = [] if trace else None
+        self.deadline: float | None = perf_counter() + deadline_ms / 1000 if deadline_ms is not None else None
+        self.skipped: list[str] = []
+        self.bypassed: list[str] = []
+
+    @property
+    def degraded(self) -> bool:
+        "Whether stages were skipped because the time budget was spent."
+        return bool(self.skipped)
+
+    def expired(self, stage: str) -> bool:
+        "Check the time budget before an optional stage, record the stage as skipped if it is spent."
+        if self.deadline is None or perf_counter() < self.deadline:
+            return False
+        self.skipped.append(stage)
+        return True
+
+    def record(self, tree: _Element) -> None:
+        "Account for a whole-tree copy of the given element (made here or by a callee)."
+        self.copies += 1
+        # counting the nodes walks the whole tree: tracing only
+        if self.stages is not None:
+            self.copied_nodes += sum(1 for _ in tree.iter())
+
+    def copy_tree(self, tree: _Element) -> Any:
+        "Return an independent copy of the tree and account for it."
+        self.record(tree)
+        return copy(tree)
+
+    def start(self) -> tuple[float, float] | None:
+        "Start timing a stage, return None if tracing is disabled."
+        return (perf_counter(), process_time()) if self.stages is not None else None
+
+    def stop(self, stage: str, started: tuple[float, float] | None, len_in: int = 0, len_out: int = 0) -> None:
+        "Store wall and CPU time of a stage along with the text lengths before and after it."
+        if started is not None and self.stages is not None:
+            self.stages.append(
+                {
+                    "stage": stage,
+                    "wall_time": perf_counter() - started[0],
+                    "cpu_time": process_time() - started[1],
+                    "len_in": len_in,
+                    "len_out": len_out,
+                }
+            )
+
+    def as_dict(self) -> dict[str, Any]:
+        "Convert the bookkeeping to a dictionary, e.g. to export it as JSON."
+        # the deadline is a point in time of this process, only meaningful here
+        return {**{slot: getattr(self, slot) for slot in self.__slots__ if slot != "deadline"}, "degraded": self.degraded}
 
 
 # Safety checks
 PARALLEL_CORES = min(CPU_COUNT, 16)  # 16 processes at most
-LRU_SIZE = 4096
+DEDUP_CACHE_SIZE = 2**20  # bytes, about 5500 segments
+
+# former settings, still readable with a warning (see __getattr__ below): former value and replacement
+_DEPRECATED_SETTINGS = {
+    "LRU_SIZE": (4096, "the deduplication cache is bounded in bytes, see DEDUP_CACHE_SIZE"),
+    "DEDUPE_SCAN_CAP": (200_000, "the containment checks use an index of the texts and are not capped"),
+}
 
 # Files
 MAX_FILES_PER_DIRECTORY = 1000
@@ -452,9 +737,9 @@ MANUALLY_STRIPPED = [
 ]
 # 'center', 'rb', 'wbr'
 
-# baseline()/html2txt() only (not the main pipeline). NOTE: html2txt() also measures page length
-# for the recall-escalation gate (core.py) -- shrinking this set fires escalation less often, so
-# re-run the full benchmark suite before changing it.
+# baseline()/html2txt() only (not the main pipeline). NOTE: html2txt_length() also measures page length
+# for the recall-escalation gate (core.py) with BASIC_CLEAN_MATCHERS below, keep both in sync --
+# shrinking this set fires escalation less often, so re-run the full benchmark suite before changing it.
 # prune cookie/consent banners: fluent prose justext's density metric can't classify; class/id is
 # English even on localized templates. (role/aria-hidden/display:none tried too -- overfit WCXB dev.)
 # Anchored banner/CMP compounds, NOT bare 'cookie'/'consent' substrings: those matched WP Cookie
@@ -470,6 +755,12 @@ BASIC_CLEAN_XPATH = XPath(
     f"|.//*[re:test(@class, '{_COOKIE_CONSENT_RE}', 'i') or re:test(@id, '{_COOKIE_CONSENT_RE}', 'i')]",
     namespaces={"re": "http://exslt.org/regular-expressions"},
 )
+# counterpart looked up in the attribute index of the page (htmlprocessing.AttributeIndex), see xpaths.py
+BASIC_CLEAN_MATCHERS: AttributeAlternatives = [
+    (frozenset({"aside", "fencedframe", "footer", "script", "style", "svg", "template"}), None),
+    (frozenset({"div"}), {"class|id": re.compile("footer")}),
+    (None, {"class": re.compile(_COOKIE_CONSENT_RE, re.IGNORECASE), "id": re.compile(_COOKIE_CONSENT_RE, re.IGNORECASE)}),
+]
 
 TAG_CATALOG = frozenset(["blockquote", "code", "del", "head", "hi", "lb", "list", "p", "pre", "quote"])
 # + list(CUT_EMPTY_ELEMS)
@@ -478,10 +769,6 @@ TAG_CATALOG = frozenset(["blockquote", "code", "del", "head", "hi", "lb", "list"
 # Shared by main_extractor's recovery dedup and baseline's paragraph-strategy dedup
 MIN_DUPLICATE_LENGTH = 50
 
-# the substring-dedup scans are O(n^2) in accumulated text; skip beyond this size (guards a
-# pathological page -- no corpus page comes close, worst ~60KB)
-DEDUPE_SCAN_CAP = 200_000
-
 # inline-tag ladder (single source of truth shared by extractor and serializer):
 INLINE_CONSUMING = {"hi", "ref", "del"}  # element folds its children into its own text
 INLINE_FORMATTABLE = INLINE_CONSUMING | {"code"}  # + code: has text, rendered verbatim
@@ -568,3 +855,12 @@ JUSTEXT_LANGUAGES = {
     "wa": "Walloon",
     # no justext stoplist available: 'ja' (Japanese), 'zh' (Chinese)
 }
+
+
+def __getattr__(name: str) -> Any:
+    "Return the former value of a deprecated setting with a warning, see docs/deprecations.rst."
+    if name in _DEPRECATED_SETTINGS:
+        value, replacement = _DEPRECATED_SETTINGS[name]
+        warnings.warn(f"{name} is deprecated and has no effect anymore: {replacement}", DeprecationWarning, stacklevel=2)
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,184 @@
+"""
+Index of 64-bit simhashes to find near-duplicate documents in large collections,
+following the permuted tables of Manku, Jain & Das Sarma (2007), with the tables
+stored in a memory-mapped file.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+from collections.abc import Iterable, Sequence
+from heapq import merge
+from pathlib import Path
+from threading import RLock
+from typing import BinaryIO
+
+LOGGER = logging.getLogger(__name__)
+
+SIMHASH_BITS = 64
+SIMHASH_MASK = (1 << SIMHASH_BITS) - 1
+# maximal number of differing bits between near-duplicates
+SIMHASH_DISTANCE = 3
+
+# file layout: magic string, byte order, distance and number of hashes,
+# then one table of rotated hashes per block, each sorted
+INDEX_MAGIC = b"TRAFSIMH"
+INDEX_HEADER = struct.Struct("=8s8sQQ")
+
+
+def _rotate(value: int, bits: int) -> int:
+    "Rotate a 64-bit value to the left."
+    return ((value << bits) | (value >> (SIMHASH_BITS - bits))) & SIMHASH_MASK
+
+
+class SimhashIndex:
+    """Find the stored simhashes differing by at most `distance` bits from a given one
+    without comparing them all. The 64 bits are split into distance + 1 blocks: two
+    hashes within the distance have at least one block in common. For each block,
+    a table holds the hashes rotated so that the block comes first, in sorted order:
+    the hashes sharing the block form a range which is found by binary search.
+
+    The tables are read from a memory-mapped file if a path is given, new hashes are
+    kept in memory until save() merges them into the file. Worker processes get the
+    hashes stored in the file, not the ones added since."""
+
+    __slots__ = ["_added", "_blocks", "_buffer", "_lock", "_map", "_new", "_stored", "_tables", "distance", "path"]
+
+    def __init__(self, path: str | None = None, distance: int | None = None) -> None:
+        self.path: str | None = path
+        self.distance: int = SIMHASH_DISTANCE if distance is None else distance
+        self._stored, self._added = 0, 0
+        self._lock = RLock()
+        self._map: mmap.mmap | None = None
+        self._buffer: memoryview | None = None
+        self._tables: list[Sequence[int]] = []
+        if path is not None and Path(path).expanduser().is_file():
+            self._load(Path(path).expanduser(), distance)
+        if not 0 <= self.distance < SIMHASH_BITS:
+            raise ValueError(f"distance must be between 0 and {SIMHASH_BITS - 1}")
+        self._blocks = self._split(self.distance + 1)
+        if not self._tables:
+            self._tables = [array("Q") for _ in self._blocks]
+        # hashes added since loading, by block and value of the block
+        self._new: list[dict[int, list[int]]] = [{} for _ in self._blocks]
+
+    def __reduce__(self) -> tuple[type["SimhashIndex"], tuple[str | None, int]]:
+        # the file is mapped again by each process
+        return (self.__class__, (self.path, self.distance))
+
+    def __len__(self) -> int:
+        return self._stored + self._added
+
+    @staticmethod
+    def _split(number: int) -> list[tuple[int, int]]:
+        "Split the bits into blocks, return the rotation bringing each block to the front and its width."
+        width, rest = divmod(SIMHASH_BITS, number)
+        blocks, start = [], 0
+        for i in range(number):
+            size = width + (i < rest)
+            blocks.append((start, size))
+            start += size
+        return blocks
+
+    def _load(self, path: Path, distance: int | None) -> None:
+        "Map the tables stored in a file."
+        with path.open("rb") as filehandle:
+            header = filehandle.read(INDEX_HEADER.size)
+            magic, byteorder, stored_distance, count = INDEX_HEADER.unpack(header)
+            if magic != INDEX_MAGIC or byteorder.rstrip(b"\0").decode() != sys.byteorder:
+                raise ValueError(f"not a simhash index or written on another platform: {path}")
+            if distance is not None and distance != stored_distance:
+                LOGGER.warning("simhash index built for a distance of %s bits: %s", stored_distance, path)
+            self.distance, self._stored = stored_distance, count
+            if count == 0:
+                return
+            self._map = mmap.mmap(filehandle.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._map)
+        table_size = count * 8
+        self._tables = [
+            self._buffer[INDEX_HEADER.size + i * table_size : INDEX_HEADER.size + (i + 1) * table_size].cast("Q")
+            for i in range(stored_distance + 1)
+        ]
+
+    def _candidates(self, value: int) -> Iterable[int]:
+        "Yield the stored hashes sharing a block with the value."
+        for (rotation, width), table, new in zip(self._blocks, self._tables, self._new, strict=True):
+            rotated = _rotate(value, rotation)
+            shift = SIMHASH_BITS - width
+            prefix = rotated >> shift
+            start = bisect_left(table, prefix << shift)
+            end = bisect_left(table, (prefix + 1) << shift, start)
+            for i in range(start, end):
+                yield _rotate(table[i], SIMHASH_BITS - rotation)
+            yield from new.get(prefix, ())
+
+    def query(self, value: int) -> list[int]:
+        "Return the stored hashes differing by at most `distance` bits from the value."
+        with self._lock:
+            return sorted({other for other in self._candidates(value) if (value ^ other).bit_count() <= self.distance})
+
+    def add(self, value: int) -> None:
+        "Store a hash, it is written to the file with save()."
+        with self._lock:
+            for (rotation, width), new in zip(self._blocks, self._new, strict=True):
+                new.setdefault(_rotate(value, rotation) >> (SIMHASH_BITS - width), []).append(value)
+            self._added += 1
+
+    def add_if_new(self, value: int) -> bool:
+        "Store the hash unless a near-duplicate is already there, tell if it was stored."
+        with self._lock:
+            distance = self.distance
+            if any((value ^ other).bit_count() <= distance for other in self._candidates(value)):
+                return False
+            self.add(value)
+            return True
+
+    def save(self, path: str | None = None) -> None:
+        "Merge the new hashes into the tables and write them to a file, by default the one they were read from."
+        path = path or self.path
+        if path is None:
+            raise ValueError("no file to save the simhash index to")
+        target = Path(path).expanduser()
+        temporary = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        with self._lock:
+            with temporary.open("wb") as filehandle:
+                filehandle.write(INDEX_HEADER.pack(INDEX_MAGIC, sys.byteorder.encode(), self.distance, len(self)))
+                for (rotation, _), table, new in zip(self._blocks, self._tables, self._new, strict=True):
+                    added = sorted(_rotate(value, rotation) for values in new.values() for value in values)
+                    self._write_table(filehandle, merge(table, added))
+            # the mapped file may be replaced: release it first
+            self.close()
+            # atomic replacement, the previous file stays complete in case of failure
+            temporary.replace(target)
+            self.path = str(target)
+            self._load(target, self.distance)
+            self._new, self._added = [{} for _ in self._blocks], 0
+        LOGGER.debug("%s simhashes written to %s", len(self), target)
+
+    @staticmethod
+    def _write_table(filehandle: BinaryIO, values: Iterable[int]) -> None:
+        "Write values to a file in chunks."
+        chunk = array("Q")
+        for value in values:
+            chunk.append(value)
+            if len(chunk) >= 2**16:
+                chunk.tofile(filehandle)
+                del chunk[:]
+        chunk.tofile(filehandle)
+
+    def close(self) -> None:
+        "Release the memory-mapped file, the hashes stored in it are not available anymore."
+        with self._lock:
+            if self._map is not None:
+                for table in self._tables:
+                    if isinstance(table, memoryview):
+                        table.release()
+                if self._buffer is not None:
+                    self._buffer.release()
+                self._map.close()
+                self._map, self._buffer = None, None
+            self._tables, self._stored = [array("Q") for _ in self._blocks], 0
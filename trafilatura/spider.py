@@ -42,7 +42,7 @@ MAX_KNOWN_URLS = 100000
 class CrawlParameters:
     "Store necessary information to manage a focused crawl."
 
-    __slots__ = ["base", "i", "is_on", "known_num", "lang", "prune_xpath", "ref", "rules", "start"]
+    __slots__ = ["base", "charsets", "i", "is_on", "known_num", "lang", "prune_xpath", "ref", "rules", "start"]
 
     def __init__(
         self,
@@ -60,6 +60,8 @@ class CrawlParameters:
         self.known_num: int = 0
         self.is_on: bool = True
         self.prune_xpath: str | None = prune_xpath
+        # last encoding which worked per host, a hint for the pages lacking a declaration
+        self.charsets: dict[str, str] = {}
 
     def _get_base_url(self, start: str) -> str:
         "Set reference domain for the crawl."
@@ -136,7 +138,7 @@ def probe_alternative_homepage(
         homepage = response.url
 
     # decode response
-    htmlstring = decode_file(response.data)
+    htmlstring = decode_file(response.data, response.charset(), response.url)
 
     # is there a meta-refresh on the page?
     new_htmlstring, new_homepage = refresh_detection(htmlstring, homepage)
@@ -232,7 +234,7 @@ def process_response(
     URL_STORE.add_urls([response.url], visited=True)
 
     # convert urllib3 response to string and proceed to link extraction
-    process_links(decode_file(response.data), params, params.base)
+    process_links(decode_file(response.data, response.charset(), response.url, params.charsets), params, params.base)
 
 
 def init_crawl(
@@ -11,6 +11,7 @@ try:
 except ImportError:
     HAS_GZIP = False
 
+import codecs
 import logging
 import re
 
@@ -26,6 +27,7 @@ from functools import lru_cache
 from itertools import islice
 from typing import TYPE_CHECKING, Any, Literal, TypeAlias, cast
 from unicodedata import normalize
+from urllib.parse import urlsplit
 
 # response compression
 try:
@@ -70,30 +72,35 @@ if TYPE_CHECKING:  # pragma: no cover
 class Response:
     "Store information gathered in a HTTP response object."
 
-    __slots__ = ["data", "headers", "html", "status", "url"]
+    __slots__ = ["data", "headers", "html", "status", "tree", "url"]
 
     def __init__(self, data: bytes, status: int, url: str) -> None:
         self.data = data
         self.headers: dict[str, str] | None = None
         self.html: str | None = None
         self.status = status
+        self.tree: HtmlElement | None = None
         self.url = url
 
     def __bool__(self) -> bool:
         return self.data is not None
 
     def __repr__(self) -> str:
-        return self.html or decode_file(self.data)
+        return self.html or decode_file(self.data, self.charset(), self.url)
 
     def store_headers(self, headerdict: Mapping[str, str]) -> None:
         "Store response headers if required."
         # further control steps here
         self.headers = {k.lower(): v for k, v in headerdict.items()}
 
+    def charset(self) -> str | None:
+        "Return the charset declared in the Content-Type header, if any."
+        return content_charset(self.headers)
+
     def decode_data(self, decode: bool) -> None:
         "Decode the bytestring in data and store a string in html."
         if decode and self.data:
-            self.html = decode_file(self.data)
+            self.html = decode_file(self.data, self.charset(), self.url)
 
     def as_dict(self) -> dict[str, Any]:
         "Convert the response object to a dictionary."
@@ -108,15 +115,53 @@ LOGGER = logging.getLogger(__name__)
 
 UNICODE_ALIASES = {"utf-8", "utf_8"}
 
+# charset declared in a Content-Type header or, at the beginning of a document, in a <meta> element
+CHARSET_DECLARATION = re.compile(r"""charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+META_CHARSET = re.compile(rb"""<meta[^>]+charset\s*=\s*["']?\s*([\w.:-]+)""", re.IGNORECASE)
+CHARSET_SCAN_SIZE = 4096
+# declared encodings read as their superset, like browsers do (WHATWG Encoding Standard)
+CHARSET_SUPERSETS = {
+    "ascii": "cp1252",
+    "euc_kr": "cp949",
+    "gb2312": "gb18030",
+    "gbk": "gb18030",
+    "iso8859-1": "cp1252",
+    "iso8859-9": "cp1254",
+    "shift_jis": "cp932",
+    "tis-620": "cp874",
+}
+# maximal number of hosts in a memo of the last encoding which worked for them, see decode_file()
+CHARSET_MEMO_SIZE = 2**14
+
 DOCTYPE_TAG = re.compile("^< ?! ?DOCTYPE[^>]*/[^<>]*>", re.IGNORECASE)
 FAULTY_HTML = re.compile(r"(<html.*?)\s*/>", re.IGNORECASE)
 HTML_STRIP_TAGS = re.compile(r"(<!--.*?-->|<[^>]*>)")
 # control characters
 INVALID_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+# byte-level counterparts for UTF-8 input (see normalize_html())
+DOCTYPE_TAG_BYTES = re.compile(rb"^< ?! ?DOCTYPE[^>]*/[^<>]*>", re.IGNORECASE)
+FAULTY_HTML_BYTES = re.compile(rb"(<html.*?)\s*/>", re.IGNORECASE)
+INVALID_XML_BYTES = bytes([*range(0x09), 0x0B, 0x0C, *range(0x0E, 0x20)])
+INVALID_XML_NONCHARS = re.compile(rb"\xef\xbf[\xbe\xbf]")  # U+FFFE and U+FFFF
+LINE_BREAKS = re.compile(rb"\r\n?|\n")
+# size of the slices decoded at once when validating UTF-8
+UTF8_CHUNK_SIZE = 2**16
 
 # note: htmldate could use HTML comments
 # huge_tree=True, remove_blank_text=True
-HTML_PARSER = HTMLParser(collect_ids=False, default_doctype=False, encoding="utf-8", remove_comments=True, remove_pis=True)
+HTML_PARSER_OPTIONS: dict[str, Any] = {
+    "collect_ids": False,
+    "default_doctype": False,
+    "encoding": "utf-8",
+    "remove_comments": True,
+    "remove_pis": True,
+}
+HTML_PARSER = HTMLParser(**HTML_PARSER_OPTIONS)
+# input parsed as a whole document by lxml.html.fromstring(), other input is treated as a fragment
+FULL_HTML_DOCUMENT = re.compile(rb"^\s*<(?:html|!doctype)", re.IGNORECASE)
+# parts of the document kept by load_html_head()
+HEAD_END = re.compile(rb"</head\s*>", re.IGNORECASE)
+JSON_LD_SCRIPT = re.compile(rb"<script[^>]+application/ld\+json[^>]*>.*?</script\s*>", re.IGNORECASE | re.DOTALL)
 
 LINES_TRIMMING = re.compile(r"(?<![p{P}>])\n", flags=re.UNICODE | re.MULTILINE)
 
@@ -181,9 +226,16 @@ def handle_compressed_file(filecontent: bytes) -> bytes:
 
 
 def isutf8(data: bytes) -> bool:
-    """Simple heuristic to determine if a bytestring uses standard unicode encoding"""
+    """Simple heuristic to determine if a bytestring uses standard unicode encoding.
+    The data is decoded slice by slice so that no full copy is made."""
+    if data.isascii():
+        return True
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    view = memoryview(data)
     try:
-        data.decode("UTF-8")
+        for start in range(0, len(view), UTF8_CHUNK_SIZE):
+            decoder.decode(view[start : start + UTF8_CHUNK_SIZE])
+        decoder.decode(b"", final=True)
     except UnicodeDecodeError:
         return False
     return True
@@ -195,6 +247,11 @@ def detect_encoding(bytesobject: bytes) -> list[str]:
     # unicode-test
     if isutf8(bytesobject):
         return ["utf-8"]
+    return _guess_encodings(bytesobject)
+
+
+def _guess_encodings(bytesobject: bytes) -> list[str]:
+    "Return a list of encodings for a bytestring which is not valid UTF-8."
     guesses = []
     # additional module
     if cchardet_detect is not None:
@@ -213,29 +270,103 @@ def detect_encoding(bytesobject: bytes) -> list[str]:
     return [g for g in guesses if g not in UNICODE_ALIASES]
 
 
-def decode_file(filecontent: bytes | str) -> str:
-    """Check if the bytestring could be GZip and eventually decompress it,
-    guess bytestring encoding and try to decode to Unicode string.
-    Resort to destructive conversion otherwise."""
-    if isinstance(filecontent, str):
-        return filecontent
+def content_charset(headers: Mapping[str, str] | None) -> str | None:
+    "Return the charset declared in the Content-Type of the given headers, if any."
+    if not headers:
+        return None
+    # lowercase keys (Response) or case-insensitive mapping (urllib3)
+    match = CHARSET_DECLARATION.search(headers.get("content-type") or "")
+    return match[1] if match else None
 
-    htmltext = None
 
-    # GZip and Brotli test
-    filecontent = handle_compressed_file(filecontent)
+def sniff_charset(bytesobject: bytes) -> str | None:
+    "Look for a charset declared in a <meta> element at the beginning of the document."
+    match = META_CHARSET.search(bytesobject, 0, CHARSET_SCAN_SIZE)
+    if match is None:
+        return None
+    charset = match[1].decode("ascii")
+    # bytes matched as ASCII: a declared UTF-16 cannot be right (the HTML standard reads UTF-8 instead)
+    return "utf-8" if charset.lower().startswith("utf-16") else charset
+
+
+def _codec_name(charset: str) -> str | None:
+    "Normalize an encoding name, None if Python does not know it."
+    try:
+        name = codecs.lookup(charset).name
+    except LookupError:
+        return None
+    return CHARSET_SUPERSETS.get(name, name)
+
+
+def _hostname(url: str | None) -> str | None:
+    "Return the host of an URL for the charset memo, if any."
+    try:
+        return urlsplit(url).hostname if url else None
+    except ValueError:
+        return None
+
+
+def _remember_charset(memo: dict[str, str] | None, host: str | None, encoding: str) -> None:
+    "Store the encoding used for a page of the host."
+    if memo is None or host is None or memo.get(host) == encoding:
+        return
+    if len(memo) >= CHARSET_MEMO_SIZE:
+        memo.clear()
+    memo[host] = encoding
+
+
+def _decode_legacy(
+    filecontent: bytes, encoding: str | None, host: str | None = None, memo: dict[str, str] | None = None
+) -> str:
+    """Decode a bytestring which is not valid UTF-8: with the first declared
+    encoding which fits (see decode_file()), with a detected one otherwise."""
+    tried = {"utf-8"}
+    for hint in (encoding, sniff_charset(filecontent), memo.get(host) if memo is not None and host else None):
+        codec = _codec_name(hint) if hint else None
+        if codec is None or codec in tried:
+            continue
+        tried.add(codec)
+        try:
+            htmltext = filecontent.decode(codec)
+        except UnicodeDecodeError:
+            LOGGER.debug("declared encoding does not fit: %s", codec)
+        else:
+            _remember_charset(memo, host, codec)
+            return htmltext
     # encoding
-    for guessed_encoding in detect_encoding(filecontent):
+    for guessed_encoding in _guess_encodings(filecontent):
         try:
             htmltext = filecontent.decode(guessed_encoding)
         except (LookupError, UnicodeDecodeError):  # noqa: PERF203 -- VISCII: lookup
             LOGGER.warning("wrong encoding detected: %s", guessed_encoding)
-            htmltext = None
         else:
-            break
-
+            _remember_charset(memo, host, guessed_encoding)
+            return htmltext
     # return original content if nothing else succeeded
-    return htmltext or str(filecontent, encoding="utf-8", errors="replace")
+    return str(filecontent, encoding="utf-8", errors="replace")
+
+
+def decode_file(
+    filecontent: bytes | str, encoding: str | None = None, url: str | None = None, memo: dict[str, str] | None = None
+) -> str:
+    """Check if the bytestring could be GZip and eventually decompress it,
+    guess bytestring encoding and try to decode to Unicode string.
+    Resort to destructive conversion otherwise.
+
+    Valid UTF-8 is read as such, whatever the declarations (mislabelings are frequent).
+    Otherwise encoding detection is skipped if a declared encoding fits: the one given
+    (e.g. from the HTTP headers), the one in a <meta> element, or the one last
+    used for the host of the URL if a memo of the encodings per host is given,
+    e.g. for the pages of a crawl."""
+    if isinstance(filecontent, str):
+        return filecontent
+
+    # GZip and Brotli test
+    filecontent = handle_compressed_file(filecontent)
+    try:
+        return filecontent.decode("utf-8")
+    except UnicodeDecodeError:
+        return _decode_legacy(filecontent, encoding, _hostname(url), memo)
 
 
 def is_dubious_html(beginning: str) -> bool:
@@ -270,9 +401,144 @@ def fromstring_bytes(htmlobject: str) -> HtmlElement | None:
     return tree
 
 
-def load_html(htmlobject: HtmlInput) -> HtmlElement | None:
+def _beginning(data: bytes) -> str:
+    "Return the first characters of a UTF-8 document in lowercase, for the checks of normalize_html()."
+    return data[:200].decode("utf-8", "ignore")[:50].lower()
+
+
+def _head_length(data: bytes) -> int | None:
+    "Return the length of the first four lines, None if there are fewer line breaks."
+    for i, match in enumerate(LINE_BREAKS.finditer(data)):
+        if i == 3:
+            return match.end()
+    return None
+
+
+def _repair_head(data: bytes, beginning: str) -> bytes:
+    "Byte-level repair_faulty_html(): only the first lines are concerned, the rest is left as is."
+    end = _head_length(data) or len(data)
+    head = data[:end]
+    fixed = head
+    # libxml2/LXML issue: https://bugs.launchpad.net/lxml/+bug/1955915
+    if "doctype" in beginning:
+        firstline, newline, rest = head.partition(b"\n")
+        fixed = DOCTYPE_TAG_BYTES.sub(b"", firstline, count=1) + newline + rest
+    # other issue with malformed documents: check first three lines
+    for line in fixed.splitlines():
+        if b"<html" in line and line.endswith(b"/>"):
+            fixed = FAULTY_HTML_BYTES.sub(rb"\1>", fixed, count=1)
+            break
+    return data if fixed == head else fixed + data[end:]
+
+
+def normalize_html(htmlobject: bytes | str, encoding: str | None = None) -> tuple[bytes, bool]:
+    """Prepare a document for the parser: decompress it and transcode it to UTF-8 if needed
+    (see decode_file()), strip control characters and apply the fixes of repair_faulty_html().
+    Valid UTF-8 input is never decoded to a string, it is stripped with a single copy.
+    Return the bytes to parse and whether the document is dubious (see is_dubious_html())."""
+    if isinstance(htmlobject, str):
+        data = htmlobject.encode("utf-8", "replace")
+    else:
+        data = handle_compressed_file(htmlobject)
+        if not isutf8(data):
+            data = _decode_legacy(data, encoding).encode("utf-8", "replace")
+    beginning = _beginning(data)
+    data = INVALID_XML_NONCHARS.sub(b"", data.translate(None, INVALID_XML_BYTES))
+    return _repair_head(data, beginning), is_dubious_html(beginning)
+
+
+class HTMLFeed:
+    """Parse a document chunk by chunk, e.g. while it is being downloaded.
+    The chunks are prepared like in normalize_html() and the tree is the one
+    load_html() would return. Only well-formed UTF-8 documents starting
+    with <html> or a DOCTYPE qualify, close() returns None for the others
+    so that they can be loaded as a whole."""
+
+    __slots__ = ["_breaks", "_decoder", "_head", "_parser", "_scanned", "_start", "_tail"]
+
+    def __init__(self) -> None:
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        # first lines, held back until they can be repaired
+        self._head: bytearray | None = bytearray()
+        self._breaks = 0
+        self._scanned = 0
+        self._parser: HTMLParser | None = HTMLParser(**HTML_PARSER_OPTIONS)
+        # raw beginning of the document
+        self._start = b""
+        # start of a possible U+FFFE/U+FFFF sequence cut by the end of the chunk
+        self._tail = b""
+
+    def feed(self, chunk: bytes) -> None:
+        "Validate, clean and parse a chunk of the document."
+        if self._parser is None:
+            return
+        try:
+            self._decoder.decode(chunk)
+        except UnicodeDecodeError:
+            self._parser = None
+            return
+        if len(self._start) < 200:
+            self._start += chunk[: 200 - len(self._start)]
+        data = self._tail + chunk.translate(None, INVALID_XML_BYTES)
+        cut = 2 if data.endswith(b"\xef\xbf") else 1 if data.endswith(b"\xef") else 0
+        self._tail = data[len(data) - cut :]
+        data = INVALID_XML_NONCHARS.sub(b"", data[: len(data) - cut])
+        if self._head is not None:
+            self._head += data
+            if not self._head_complete():
+                return
+            data = self._flush_head()
+        if self._parser is not None:
+            self._parser.feed(data)
+
+    def _head_complete(self) -> bool:
+        "Count the line breaks in the new data until the first four lines are complete."
+        for match in LINE_BREAKS.finditer(self._head or b"", self._scanned):
+            # "\r" could be followed by "\n" in the next chunk
+            if match.end() == len(self._head or b""):
+                break
+            self._scanned = match.end()
+            self._breaks += 1
+            if self._breaks == 4:
+                return True
+        return False
+
+    def _flush_head(self) -> bytes:
+        "Repair the first lines and decide if the document qualifies."
+        beginning = _beginning(self._start)
+        head = _repair_head(bytes(self._head or b""), beginning)
+        self._head = None
+        if is_dubious_html(beginning) or not FULL_HTML_DOCUMENT.match(head):
+            self._parser = None
+        return head
+
+    def close(self) -> HtmlElement | None:
+        "Finish parsing and return the tree, None if the document has to be loaded as a whole."
+        if self._parser is None:
+            return None
+        try:
+            self._decoder.decode(b"", final=True)
+        except UnicodeDecodeError:
+            return None
+        # the data is complete and valid: nothing is left in self._tail
+        if self._head is not None:
+            head = self._flush_head()
+            if self._parser is None:
+                return None
+            self._parser.feed(head)
+        try:
+            return self._parser.close()
+        except Exception as err:  # XMLSyntaxError: empty document
+            LOGGER.debug("lxml feed parser: %s", err)
+            return None
+
+
+def load_html(htmlobject: HtmlInput, encoding: str | None = None) -> HtmlElement | None:
     """Load object given as input and validate its type
     (accepted: lxml.html tree, trafilatura/urllib3 response, bytestring and string).
+    Bytestrings are decoded with the encoding given as hint if it fits, the charset
+    in the headers of a response is used otherwise, see decode_file().
+    The input is prepared by normalize_html() and parsed once, as UTF-8 bytes.
 
     Expects a full document: the dubious-HTML check below rejects a single-block
     fragment (e.g. "<p>x</p>" alone has one child and is treated as not-quite-HTML).
@@ -283,32 +549,23 @@ def load_html(htmlobject: HtmlInput) -> HtmlElement | None:
         return htmlobject
     # use trafilatura or urllib3 responses directly
     if isinstance(htmlobject, HTTPResponse) or hasattr(htmlobject, "data"):
+        # tree parsed during the download, see fetch_response()
+        parsed = getattr(htmlobject, "tree", None)
+        if parsed is not None:
+            return cast("HtmlElement", parsed)
+        encoding = encoding or content_charset(getattr(htmlobject, "headers", None))
         htmlobject = htmlobject.data
     # do not accept any other type after this point
     if not isinstance(htmlobject, (bytes, str)):
         raise TypeError("incompatible input type", type(htmlobject))
-    # start processing
+    # decode, clean and repair
+    data, check_flag = normalize_html(htmlobject, encoding)
+    # single pass: UTF-8 bytes
     tree = None
-    # try to guess encoding and decode file: if None then keep original
-    htmlobject = decode_file(htmlobject)
-    # sanity checks
-    beginning = htmlobject[:50].lower()
-    check_flag = is_dubious_html(beginning)
-    # repair first
-    htmlobject = repair_faulty_html(htmlobject, beginning)
-    # first pass: use Unicode string
-    fallback_parse = False
     try:
-        tree = fromstring(htmlobject, parser=HTML_PARSER)
-    except ValueError:
-        # "Unicode strings with encoding declaration are not supported."
-        tree = fromstring_bytes(htmlobject)
-        fallback_parse = True
+        tree = fromstring(data, parser=HTML_PARSER)
     except Exception as err:  # pragma: no cover
         LOGGER.error("lxml parsing failed: %s", err)
-    # second pass: try passing bytes to LXML
-    if (tree is None or len(tree) < 1) and not fallback_parse:
-        tree = fromstring_bytes(htmlobject)
     # rejection test: is it (well-formed) HTML at all?
     # log parsing errors
     if tree is not None and check_flag is True and len(tree) < 2:
@@ -317,6 +574,25 @@ def load_html(htmlobject: HtmlInput) -> HtmlElement | None:
     return tree
 
 
+def load_html_head(htmlobject: HtmlInput, encoding: str | None = None) -> HtmlElement | None:
+    """Load the head of a document and the JSON-LD blocks of its body, the rest
+    of the body is not parsed. Trees are used as they are and documents without
+    an explicit end of head are loaded as a whole, see load_html()."""
+    if (isinstance(htmlobject, HTTPResponse) or hasattr(htmlobject, "data")) and getattr(htmlobject, "tree", None) is None:
+        encoding = encoding or content_charset(getattr(htmlobject, "headers", None))
+        htmlobject = htmlobject.data
+    if isinstance(htmlobject, str):
+        htmlobject = htmlobject.encode("utf-8", "replace")
+    if not isinstance(htmlobject, bytes):
+        return load_html(htmlobject, encoding)
+    data = handle_compressed_file(htmlobject)
+    match = HEAD_END.search(data)
+    if match is None:
+        return load_html(data, encoding)
+    scripts = b"".join(JSON_LD_SCRIPT.findall(data, match.end()))
+    return load_html(data[: match.end()] + b"<body>" + scripts + b"</body></html>", encoding)
+
+
 @lru_cache(maxsize=2**14)  # sys.maxunicode = 1114111
 def return_printables_and_spaces(char: str) -> str:
     "Return a character if it belongs to certain classes"
@@ -15,7 +15,7 @@ from pathlib import Path
 
 from lxml.etree import DTD, Element, SubElement, XMLParser, _Element, fromstring, tostring
 
-from .settings import INLINE_CONSUMING, INLINE_FORMATTABLE, Document, Extractor
+from .settings import INLINE_CONSUMING, INLINE_FORMATTABLE, OUTPUT_EXCLUDED, Document, Extractor
 from .utils import (
     is_element_in_item,
     is_in_table_cell,
@@ -159,7 +159,7 @@ def strip_double_tags(tree: _Element) -> _Element:
 def build_json_output(docmeta: Document, with_metadata: bool = True) -> str:
     """Build JSON output based on extracted information"""
     if with_metadata:
-        outputdict = {slot: getattr(docmeta, slot, None) for slot in docmeta.__slots__}
+        outputdict = {slot: getattr(docmeta, slot, None) for slot in docmeta.__slots__ if slot not in OUTPUT_EXCLUDED}
         outputdict.update(
             {
                 "source": outputdict.pop("url"),
@@ -4,6 +4,8 @@ X-Path expressions used to extract or filter the main text content,
 and to extract metadata.
 """
 
+import re
+
 from lxml.etree import XPath
 
 REGEXP_NS = "http://exslt.org/regular-expressions"
@@ -105,6 +107,54 @@ BODY_XPATH = [
         """
     ),
 ]
+# Python counterpart of BODY_XPATH: the candidates of all expressions are found in a single
+# tree walk (main_extractor.find_body_candidates), BODY_XPATH stays the reference in the tests.
+# Per expression: alternatives of (tags, {attribute: pattern}) where an element with one of the
+# tags is selected if one of the patterns is found in the attribute value, or in any case
+# if there are no patterns. Equalities are anchored with \Z, translate() becomes a character class.
+_CONTENT_TAGS = frozenset({"article", "div", "main", "section"})
+BODY_MATCHERS: list[list[tuple[frozenset[str], dict[str, re.Pattern[str]] | None]]] = [
+    [
+        (
+            _CONTENT_TAGS,
+            {
+                "class": re.compile(rf"^(?:post|entry)\Z|{_alt(_ARTICLE_CONTENT_CLASS_TOKENS)}"),
+                "id": re.compile(rf"^articleContent\Z|{_alt(_ARTICLE_CONTENT_ID_TOKENS)}"),
+                "itemprop": re.compile(r"^articleBody\Z"),
+            },
+        )
+    ],
+    [(frozenset({"article"}), None)],
+    [
+        (
+            _CONTENT_TAGS,
+            {
+                "class": re.compile(
+                    rf"^(?:postarea|art-postcontent|text|cell|story)\Z|(?i:fulltext)|{_alt(_STORY_CLASS_TOKENS)}"
+                ),
+                "id": re.compile(rf"^(?:article|story)\Z|{_alt(_STORY_ID_TOKENS)}"),
+                "role": re.compile(r"^article\Z"),
+            },
+        )
+    ],
+    [
+        (
+            _CONTENT_TAGS,
+            {
+                "class": re.compile(rf"^content\Z|{_alt(_MAIN_CONTENT_CLASS_TOKENS)}|[mM]ain-[cC]ontent|[pP]age-[cC]ontent"),
+                "id": re.compile(rf"^content\Z|{_alt(_MAIN_CONTENT_ID_TOKENS)}|[mM]ain-[cC]ontent"),
+            },
+        )
+    ],
+    [
+        (
+            frozenset({"article", "div", "section"}),
+            {"class": re.compile("^main"), "id": re.compile("^main"), "role": re.compile("^main")},
+        ),
+        (frozenset({"main"}), None),
+    ],
+]
+
 # starts-with(@id, "article") or
 # or starts-with(@id, "story") or contains(@class, "story")
 # starts-with(@class, "content ") or contains(@class, " content")
@@ -116,6 +166,18 @@ BODY_XPATH = [
 # './/span[@class=""]', # instagram?
 
 
+# Python counterparts of the pruning and metadata expressions below, in the format of BODY_MATCHERS,
+# looked up in the attribute index of a tree (htmlprocessing.AttributeIndex): no tags stand for
+# any element, "id|class" for the first of both attributes in source order (as XPath's
+# string(@id|@class)) and ANY_VALUE for the presence of an attribute.
+# The expressions stay the reference in the tests.
+AttributeAlternatives = list[tuple[frozenset[str] | None, dict[str, re.Pattern[str]] | None]]
+AttributeMatchers = list[AttributeAlternatives]
+ANY_VALUE = re.compile("")
+_BLOCK_TAGS = frozenset({"div", "item", "list", "p", "section", "span"})
+_SECTION_TAGS = frozenset({"div", "list", "section"})
+
+
 COMMENTS_XPATH = [
     XPath(
         """
@@ -147,6 +209,20 @@ COMMENTS_XPATH = [
         """
     ),
 ]
+COMMENTS_MATCHERS: AttributeMatchers = [
+    [
+        (
+            _SECTION_TAGS,
+            {
+                "id|class": re.compile("comment-?list"),
+                "class": re.compile("comment-page|comments-content|post-comments"),
+            },
+        )
+    ],
+    [(_SECTION_TAGS, {"id|class": re.compile("^comment[s-]"), "class": re.compile("^Comments|article-comments")})],
+    [(_SECTION_TAGS, {"id": re.compile("^(?:comol|disqus_thread|dsq-comments)")})],
+    [(frozenset({"div", "section"}), {"id": re.compile("^social"), "class": re.compile("comment")})],
+]
 # or contains(@class, 'Comments')
 
 REMOVE_COMMENTS_XPATH = [
@@ -159,6 +235,17 @@ REMOVE_COMMENTS_XPATH = [
         namespaces={"re": REGEXP_NS},
     )
 ]
+REMOVE_COMMENTS_MATCHERS: AttributeMatchers = [
+    [
+        (
+            _SECTION_TAGS | {"details"},
+            {
+                "id": re.compile("^(?:[Cc]omment|comol|disqus_thread|dsq-comments)"),
+                "class": re.compile("^[Cc]omment|(?:article|post)-comments"),
+            },
+        )
+    ]
+]
 # or self::span
 # or contains(@class, 'comment') or contains(@id, 'comment')
 
@@ -175,6 +262,17 @@ REMOVE_APPENDED_ARTICLES_XPATH = [
         namespaces={"re": REGEXP_NS},
     )
 ]
+REMOVE_APPENDED_ARTICLES_MATCHERS: AttributeMatchers = [
+    [
+        (
+            frozenset({"aside", "div", "section"}),
+            {
+                "id": re.compile("mvp-post-add-(?:box|wrap)|infinite-?scroll"),
+                "class": re.compile("mvp-post-add-(?:box|wrap)|infinite-?scroll"),
+            },
+        )
+    ]
+]
 
 
 # OVERALL_DISCARD_XPATH boilerplate token vocabulary, grouped by concept, composed via _alt()
@@ -278,6 +376,37 @@ OVERALL_DISCARD_XPATH = [
         namespaces={"re": REGEXP_NS},
     ),
 ]
+OVERALL_DISCARD_MATCHERS: AttributeMatchers = [
+    [
+        (
+            _BLOCK_TAGS,
+            {
+                "data-lp-replacement-content": ANY_VALUE,
+                "role": re.compile("[nN]av"),
+                "data-component": re.compile("MostPopularStories"),
+                "id|class": re.compile(_alt(_CONSENT_ID_CLASS_TOKENS)),
+                "id": re.compile(_alt(_OVERALL_DISCARD_BOTH_TOKENS + _OVERALL_DISCARD_ID_TOKENS)),
+                "class": re.compile(_alt(_OVERALL_DISCARD_BOTH_TOKENS + _OVERALL_DISCARD_CLASS_TOKENS)),
+            },
+        )
+    ],
+    [
+        (
+            None,
+            {
+                # the equality with 'comments-title' is covered by the pattern
+                "class": re.compile(
+                    "^hide-|comments-title|nocomments|-reply-|message|akismet|suggest-links|-hide-|hide-print| hidden| hide|noprint|notloaded"
+                ),
+                "id|class": re.compile("^reply-"),
+                "id|style": re.compile("hidden"),
+                "style": re.compile("display:none|display: none"),
+                "id": re.compile("reader-comments|akismet"),
+                "aria-hidden": re.compile(r"^true\Z"),
+            },
+        )
+    ],
+]
 
 # conflicts:
 # contains(@id, "header") or contains(@class, "header") or
@@ -299,6 +428,9 @@ TEASER_DISCARD_XPATH = [
     """
     )
 ]
+TEASER_DISCARD_MATCHERS: AttributeMatchers = [
+    [(_BLOCK_TAGS, {"id": re.compile("[tT]easer"), "class": re.compile("[tT]easer")})]
+]
 
 
 PRECISION_DISCARD_XPATH = [
@@ -317,6 +449,18 @@ PRECISION_DISCARD_XPATH = [
         namespaces={"re": REGEXP_NS},
     ),
 ]
+PRECISION_DISCARD_MATCHERS: AttributeMatchers = [
+    [(frozenset({"header"}), None)],
+    [
+        (
+            _BLOCK_TAGS,
+            {
+                "id|class": re.compile(r"(?:^|\s)bottom|bottom(?:\s|$)|(?:^|\s)link(?:\s|$)"),
+                "style": re.compile("border"),
+            },
+        )
+    ],
+]
 # or contains(@id, "-comments") or contains(@class, "-comments")
 
 
@@ -328,6 +472,7 @@ DISCARD_IMAGE_ELEMENTS = [
     """
     )
 ]
+DISCARD_IMAGE_MATCHERS: AttributeMatchers = [[(_BLOCK_TAGS, {"id": re.compile("caption"), "class": re.compile("caption")})]]
 
 
 COMMENTS_DISCARD_XPATH = [
@@ -344,6 +489,20 @@ COMMENTS_DISCARD_XPATH = [
         namespaces={"re": REGEXP_NS},
     ),
 ]
+COMMENTS_DISCARD_MATCHERS: AttributeMatchers = [
+    [(frozenset({"div", "section"}), {"id": re.compile("^respond")})],
+    [(frozenset({"cite", "quote"}), None)],
+    [
+        (
+            None,
+            {
+                "class": re.compile("comments-title|nocomments|-reply-|message|signin"),
+                "style": re.compile("display:none"),
+                "id|class": re.compile("^reply-|akismet"),
+            },
+        )
+    ],
+]
 
 
 ### 2. METADATA
@@ -383,6 +542,45 @@ AUTHOR_XPATHS = [
         namespaces={"re": REGEXP_NS},
     ),
 ]
+# rel='me' (a child element, not the attribute) is left out
+AUTHOR_MATCHERS: AttributeMatchers = [
+    [
+        (
+            frozenset({"a", "address", "div", "link", "p", "span", "strong"}),
+            {
+                "rel": re.compile(r"^author\Z"),
+                "id": re.compile(r"^author\Z"),
+                "class": re.compile(r"^author\Z|author-?name|AuthorName|authorName"),
+                "itemprop": re.compile(r"^author name\Z"),
+                "data-testid": re.compile(r"^(?:AuthorCard|AuthorURL)\Z"),
+            },
+        ),
+        (frozenset({"author"}), None),
+    ],
+    [
+        (
+            frozenset({"a", "div", "h3", "h4", "p", "span"}),
+            {
+                "class": re.compile(
+                    r"^(?:byline|username|byl|BBL)\Z|author|channel-name|zuozhe|bianji|xiaobian|submitted-by|posted-by|journalist-name"
+                ),
+                "itemprop": re.compile("author"),
+                "id": re.compile("author|zuozhe|bianji|xiaobian"),
+            },
+        )
+    ],
+    [
+        (
+            None,
+            {
+                "data-component": re.compile("Byline"),
+                "itemprop": re.compile("author"),
+                "id": re.compile("[Aa]uthor"),
+                "class": re.compile("[Aa]uthor|screenname|writer|[Bb]yline"),
+            },
+        )
+    ],
+]
 
 
 AUTHOR_DISCARD_XPATHS = [
@@ -398,6 +596,21 @@ AUTHOR_DISCARD_XPATHS = [
     ),
     XPath("//time|//figure"),
 ]
+AUTHOR_DISCARD_MATCHERS: AttributeMatchers = [
+    [
+        (
+            frozenset({"a", "div", "section", "span"}),
+            {
+                "id": re.compile("^comments|comment-?list|ProductReviews"),
+                "class": re.compile(
+                    r"^(?:comments|title|date)\Z|^[Cc]omments|commentlist|comments-list|sidebar|is-hidden|quote|embedly-instagram|article-(?:share|support)|print|category|meta-date|meta-reviewer"
+                ),
+                "data-component": re.compile("Figure"),
+            },
+        )
+    ],
+    [(frozenset({"figure", "time"}), None)],
+]
 
 
 CATEGORIES_XPATHS = [
@@ -417,6 +630,33 @@ CATEGORIES_XPATHS = [
     XPath("""//header[@class='entry-header']//a[@href]"""),
     XPath("""//div[@class='row' or @class='tags']//a[@href]"""),
 ]
+# the containers of the links: the expressions select their <a href> descendants
+CATEGORIES_MATCHERS: AttributeMatchers = [
+    [
+        (
+            frozenset({"div"}),
+            {
+                "class": re.compile("^(?:post-?info|post-?meta|meta|entry-meta|entry-info|entry-utility)"),
+                "id": re.compile("^postpath"),
+            },
+        )
+    ],
+    [
+        (
+            frozenset({"p"}),
+            {"class": re.compile(r"^(?:postmeta|entry-categories)|^postinfo\Z"), "id": re.compile(r"^filedunder\Z")},
+        )
+    ],
+    [(frozenset({"footer"}), {"class": re.compile("^(?:entry-meta|entry-footer)")})],
+    [
+        (
+            frozenset({"li", "span"}),
+            {"class": re.compile(r"^(?:post-category|postcategory|entry-category)\Z|cat-links")},
+        )
+    ],
+    [(frozenset({"header"}), {"class": re.compile(r"^entry-header\Z")})],
+    [(frozenset({"div"}), {"class": re.compile(r"^(?:row|tags)\Z")})],
+]
 # "//*[self::div or self::p][contains(@class, 'byline')]",
 
 
@@ -431,6 +671,17 @@ TAGS_XPATHS = [
     XPath("""//*[@class='entry-meta' or contains(@class, 'topics') or
      contains(@class, 'tags-links')]//a[@href]"""),
 ]
+TAGS_MATCHERS: AttributeMatchers = [
+    [(frozenset({"div"}), {"class": re.compile(r"^tags\Z")})],
+    [(frozenset({"p"}), {"class": re.compile("^entry-tags")})],
+    [
+        (
+            frozenset({"div"}),
+            {"class": re.compile(r"^(?:row|jp-relatedposts|entry-utility)\Z|^(?:tag|postmeta|meta)")},
+        )
+    ],
+    [(None, {"class": re.compile(r"^entry-meta\Z|topics|tags-links")})],
+]
 # "related-topics"
 # https://github.com/grangier/python-goose/blob/develop/goose/extractors/tags.py
 
@@ -448,5 +699,26 @@ TITLE_XPATHS = [
     XPath("""//*[self::h1 or self::h2 or self::h3][
     contains(@class, 'title') or contains(@id, 'title')]"""),
 ]
+TITLE_MATCHERS: AttributeMatchers = [
+    [
+        (
+            frozenset({"h1", "h2"}),
+            {
+                "class": re.compile("(?:post-|entry-|article-|post__)title|headline"),
+                "id": re.compile("headline"),
+                "itemprop": re.compile("headline"),
+            },
+        )
+    ],
+    [(None, {"class": re.compile(r"^(?:entry-title|post-title)\Z")})],
+    [(frozenset({"h1", "h2", "h3"}), {"class": re.compile("title"), "id": re.compile("title")})],
+]
 # json-ld headline
 # '//header/h1',
+
+
+# license links, then the containers of the footer links probed for CC licenses
+LICENSE_MATCHERS: AttributeMatchers = [
+    [(frozenset({"a"}), {"rel": re.compile(r"^license\Z")})],
+    [(frozenset({"footer"}), None), (frozenset({"div"}), {"class": re.compile("footer"), "id": re.compile("footer")})],
+]